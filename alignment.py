@@ -0,0 +1,143 @@
+import re
+import subprocess
+
+try:
+    import numpy as np
+except ImportError:  # optional: without NumPy callers fall back to Whisper
+    np = None
+
+# ─── Offline script alignment ─────────────────────────────────────────────────
+# We already know the exact text that was sent to TTS, so subtitle timing only
+# needs to know *when* it is spoken. The audio is decoded to 16 kHz mono PCM,
+# framed into short-time energy, and silent stretches become candidate pauses.
+# Phrase boundaries (punctuation in the script) are snapped to the nearest pause
+# in order; words inside a phrase are spread by character length. The output has
+# the same shape as Whisper's verbose_json segments, plus per-word timings.
+
+SAMPLE_RATE = 16000
+HOP_S = 0.010
+WIN_S = 0.025
+MIN_PAUSE_S = 0.12
+SNAP_TOLERANCE_S = 1.0
+_PHRASE_END = re.compile(r"[.!?;:,—…]$|--$")
+
+
+class AlignmentError(Exception):
+    pass
+
+
+def decode_pcm(audio_file, sample_rate: int = SAMPLE_RATE):
+    """Decode any audio file to mono float32 samples in [-1, 1]."""
+    if np is None:
+        raise AlignmentError("numpy is not installed")
+    raw = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", str(audio_file), "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"],
+        check=True, stdout=subprocess.PIPE
+    ).stdout
+    return np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def _voiced_frames(samples, sample_rate: int):
+    hop, win = int(HOP_S * sample_rate), int(WIN_S * sample_rate)
+    if len(samples) < win:
+        raise AlignmentError("audio too short to align")
+    n = 1 + (len(samples) - win) // hop
+    idx = np.arange(win)[None, :] + hop * np.arange(n)[:, None]
+    rms = np.sqrt(np.mean(samples[idx] ** 2, axis=1) + 1e-12)
+    db = 20 * np.log10(rms)
+    floor, peak = np.percentile(db, 10), np.percentile(db, 95)
+    if peak - floor < 6:
+        raise AlignmentError("no clear speech/silence contrast")
+    return db > floor + 0.35 * (peak - floor)
+
+
+def _pauses(voiced):
+    """Speech start, speech end and the (start, end) unvoiced runs between them, in seconds."""
+    on = np.flatnonzero(voiced)
+    if not len(on):
+        raise AlignmentError("no speech detected")
+    first, last = on[0], on[-1]
+    pauses, run_start = [], None
+    for i in range(first, last + 1):
+        if not voiced[i] and run_start is None:
+            run_start = i
+        elif voiced[i] and run_start is not None:
+            if (i - run_start) * HOP_S >= MIN_PAUSE_S:
+                pauses.append((run_start * HOP_S, i * HOP_S))
+            run_start = None
+    return first * HOP_S, (last + 1) * HOP_S + WIN_S - HOP_S, pauses
+
+
+def _split_phrases(text: str) -> list:
+    phrases, current = [], []
+    for word in text.split():
+        current.append(word)
+        if _PHRASE_END.search(word):
+            phrases.append(current)
+            current = []
+    if current:
+        phrases.append(current)
+    return phrases
+
+
+def _weight(word: str) -> float:
+    return len(re.sub(r"\W", "", word)) + 1.0
+
+
+def align_samples(text: str, samples, sample_rate: int = SAMPLE_RATE) -> list:
+    """Whisper-shaped segments (one per phrase) for `text` spoken in `samples`."""
+    phrases = _split_phrases(text)
+    if not phrases:
+        return []
+    speech_start, speech_end, pauses = _pauses(_voiced_frames(samples, sample_rate))
+
+    # Expected boundary times from character counts, with pause time removed.
+    weights = [sum(_weight(w) for w in p) for p in phrases]
+    total_w = sum(weights)
+    speaking = (speech_end - speech_start) - sum(e - s for s, e in pauses)
+    boundaries, acc, elapsed_pause = [], 0.0, 0.0
+    remaining = list(pauses)
+    for w in weights[:-1]:
+        acc += w
+        expected = speech_start + speaking * acc / total_w + elapsed_pause
+        # Snap to the nearest unused pause after the previous boundary.
+        best = None
+        for j, (ps, pe) in enumerate(remaining):
+            mid = (ps + pe) / 2
+            if abs(mid - expected) <= SNAP_TOLERANCE_S and (best is None or abs(mid - expected) < abs(best[1] - expected)):
+                best = (j, mid, ps, pe)
+        if best:
+            j, _, ps, pe = best
+            elapsed_pause += sum(e - s for s, e in remaining[:j + 1])
+            remaining = remaining[j + 1:]
+            boundaries.append((ps, pe))
+        else:
+            elapsed_pause += sum(pe - ps for ps, pe in remaining if pe <= expected)
+            remaining = [(ps, pe) for ps, pe in remaining if pe > expected]
+            boundaries.append((expected, expected))
+
+    segments = []
+    starts = [speech_start] + [pe for _, pe in boundaries]
+    ends = [ps for ps, _ in boundaries] + [speech_end]
+    for words, start, end in zip(phrases, starts, ends):
+        end = max(end, start + 0.05 * len(words))
+        span, ws = end - start, [_weight(w) for w in words]
+        t, timed = start, []
+        for word, w in zip(words, ws):
+            d = span * w / sum(ws)
+            timed.append({"word": word, "start": t, "end": t + d})
+            t += d
+        segments.append({"start": start, "end": end, "text": " ".join(words), "words": timed})
+    return segments
+
+
+def align_file(text: str, audio_file) -> list:
+    return align_samples(text, decode_pcm(audio_file), SAMPLE_RATE)
+
+
+def align_pcm(text: str, pcm: bytes, sample_rate: int) -> list:
+    """Align against raw 16-bit mono PCM already in memory (no ffmpeg decode)."""
+    if np is None:
+        raise AlignmentError("numpy is not installed")
+    samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+    return align_samples(text, samples, sample_rate)
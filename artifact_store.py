@@ -0,0 +1,211 @@
+import os
+import time
+import argparse
+import threading
+from pathlib import Path
+from job_store import default_store
+
+# ─── Artifact layout, disk budget & retention ──────────────────────────────────
+# Every run gets its own directory under each output root:
+#
+#   audio_and_subtitles/<base>/<base>_part1.mp3, .srt, <base>_metadata.json
+#   videos/<base>/<base>_part1.mp4
+#
+# (file names keep the "_part<N>" suffix the uploaders read the part number from).
+# The job store already knows every artifact and every upload, so retention is
+# driven by upload state rather than by scanning directories:
+#   • intermediates (MP3 + SRT) are deleted KEEP_INTERMEDIATES_HOURS after the last
+#     part of a run is uploaded everywhere (default: right away);
+#   • finals (MP4 + metadata) are kept KEEP_FINALS_DAYS after that (0 = forever);
+#   • above ARTIFACT_DISK_BUDGET_GB, uploaded runs are evicted oldest-first early.
+# Nothing that still needs uploading is ever deleted; if the budget can't be met
+# without that, `over_budget()` stays true and the daemon pauses production.
+# A background thread runs the collection every ARTIFACT_GC_INTERVAL seconds and
+# immediately whenever a run finishes uploading (`notify_uploaded()`).
+
+AUDIO_SUBDIR = Path("audio_and_subtitles")
+VIDEO_SUBDIR = Path("videos")
+DISK_BUDGET = float(os.getenv("ARTIFACT_DISK_BUDGET_GB", 0)) * 1024 ** 3   # 0 = no budget
+INTERMEDIATE_RETENTION = float(os.getenv("KEEP_INTERMEDIATES_HOURS", 0)) * 3600
+FINAL_RETENTION = float(os.getenv("KEEP_FINALS_DAYS", 7)) * 86400          # 0 = keep forever
+GC_INTERVAL = float(os.getenv("ARTIFACT_GC_INTERVAL", 600))
+
+INTERMEDIATE_KINDS = ("audio", "srt")
+
+
+# ─── Layout ────────────────────────────────────────────────────────────────────
+def run_dirs(base: str):
+    """(audio dir, video dir) for one run, created on first use."""
+    audio_dir, video_dir = AUDIO_SUBDIR / base, VIDEO_SUBDIR / base
+    audio_dir.mkdir(parents=True, exist_ok=True)
+    video_dir.mkdir(parents=True, exist_ok=True)
+    return audio_dir, video_dir
+
+
+def part_files(base: str, idx: int, variant_suffix: str = "") -> dict:
+    audio_dir, video_dir = run_dirs(base)
+    stem = f"{base}_part{idx}"
+    return {"audio_file": audio_dir / f"{stem}.mp3", "srt_file": audio_dir / f"{stem}.srt",
+            "video_file": video_dir / f"{stem}{variant_suffix}.mp4"}
+
+
+def meta_file(base: str) -> Path:
+    return run_dirs(base)[0] / f"{base}_metadata.json"
+
+
+def video_variant(video) -> str:
+    """Render variant of a part's video from its name: "<base>_part2_tiktok.mp4" → "tiktok"."""
+    _, _, rest = Path(video).stem.rpartition("_part")
+    rest = rest.lstrip("0123456789")
+    return rest[1:] if rest.startswith("_") else "default"
+
+
+# ─── Retention ─────────────────────────────────────────────────────────────────
+def _remove(path) -> int:
+    path = Path(path)
+    try:
+        size = path.stat().st_size
+        path.unlink()
+    except FileNotFoundError:
+        return 0
+    try:
+        path.parent.rmdir()   # drop the run directory once it is empty
+    except OSError:
+        pass
+    return size
+
+
+def _delete_artifacts(store, base: str, kinds) -> int:
+    freed = 0
+    for row in store.run_artifacts(base, kinds):
+        freed += _remove(row["path"])
+        store.drop_artifact(row["path"])
+    return freed
+
+
+def discard_run(base: str, store=None) -> int:
+    """Delete every file tracked for a run, e.g. a story cut off mid-generation that will be regenerated."""
+    return _delete_artifacts(store or default_store(), base, None)
+
+
+def _expire_run(store, run) -> int:
+    """Delete everything a fully uploaded run left on disk."""
+    freed = _delete_artifacts(store, run["base"], None)
+    row = store.run(run["base"])
+    if row and row["meta_file"]:
+        freed += _remove(row["meta_file"])
+    store.set_run_status(run["base"], "expired")
+    return freed
+
+
+def usage(store=None) -> int:
+    """Bytes held by tracked artifacts (from the job store, no directory walk)."""
+    return (store or default_store()).artifact_bytes()
+
+
+def over_budget(store=None) -> bool:
+    return DISK_BUDGET > 0 and usage(store) > DISK_BUDGET
+
+
+def collect(now: float = None, dry_run: bool = False) -> dict:
+    """One retention pass; returns what was (or, with dry_run, would be) deleted."""
+    store = default_store()
+    now = time.time() if now is None else now
+    stats = {"intermediates": 0, "expired": 0, "evicted": 0, "freed_bytes": 0}
+    runs = [r for r in store.uploaded_runs() if r["status"] != "expired"]
+    for run in runs:
+        if run["status"] != "done" and not dry_run:
+            # Fully uploaded: nothing left to resume, even if the uploads came from test.py.
+            store.set_run_status(run["base"], "done")
+        age = now - run["uploaded_at"]
+        if FINAL_RETENTION > 0 and age >= FINAL_RETENTION:
+            stats["expired"] += 1
+            if not dry_run:
+                stats["freed_bytes"] += _expire_run(store, run)
+        elif age >= INTERMEDIATE_RETENTION and store.run_artifacts(run["base"], INTERMEDIATE_KINDS):
+            stats["intermediates"] += 1
+            if not dry_run:
+                stats["freed_bytes"] += _delete_artifacts(store, run["base"], INTERMEDIATE_KINDS)
+    # Over budget: expire uploaded runs early, oldest upload first.
+    if DISK_BUDGET > 0 and not dry_run:
+        for run in runs:
+            if usage(store) <= DISK_BUDGET:
+                break
+            if store.run(run["base"])["status"] == "expired":
+                continue
+            stats["evicted"] += 1
+            stats["freed_bytes"] += _expire_run(store, run)
+        if usage(store) > DISK_BUDGET:
+            print(f"⚠️  Artifacts use {usage(store) / 1024 ** 3:.1f} GB of a {DISK_BUDGET / 1024 ** 3:.1f} GB budget, "
+                  "all of it waiting for upload")
+    if any(stats[k] for k in ("intermediates", "expired", "evicted")):
+        print(f"🧹 Artifact GC: {stats}")
+    return stats
+
+
+class ArtifactCollector:
+    """Background retention: runs `collect()` every `interval` seconds and on `notify()`."""
+
+    def __init__(self, interval: float = GC_INTERVAL):
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="artifact-gc", daemon=True)
+                self._thread.start()
+        return self
+
+    def notify(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                collect()
+            except Exception as e:
+                print(f"⚠️  Artifact GC failed: {e}")
+
+
+_collector = None
+_collector_lock = threading.Lock()
+
+
+def default_collector() -> ArtifactCollector:
+    global _collector
+    with _collector_lock:
+        if _collector is None:
+            _collector = ArtifactCollector()
+        return _collector
+
+
+def start_gc() -> ArtifactCollector:
+    collector = default_collector().start()
+    collector.notify()   # one pass at startup
+    return collector
+
+
+def notify_uploaded():
+    """A run finished uploading; let the background collector look at it now."""
+    default_collector().notify()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply artifact retention once and report disk usage.")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be deleted")
+    args = parser.parse_args()
+    print(collect(dry_run=args.dry_run))
+    budget = f" of {DISK_BUDGET / 1024 ** 3:.1f} GB" if DISK_BUDGET > 0 else ""
+    print(f"Tracked artifacts: {usage() / 1024 ** 3:.2f} GB{budget}")
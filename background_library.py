@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import bisect
+import random
+import hashlib
+import subprocess
+import threading
+from pathlib import Path
+from fs_utils import file_lock, atomic_write_text
+from media_probe import probe_duration
+
+# ─── Background video library ─────────────────────────────────────────────────
+# Source clips are ingested once into a 9:16 "mezzanine": 1080x1920, fixed frame
+# rate, no audio and a short closed GOP with keyframes on a fixed grid. Ingest
+# also records every keyframe timestamp in a persistent index, so a render can
+# `-ss` straight onto a keyframe and decode an already-normalized stream, and
+# choosing `start_at` is an index lookup rather than a probe.
+
+LIBRARY_DIR = Path(os.getenv("BACKGROUND_LIBRARY_DIR", "backgrounds"))
+INDEX_FILE = LIBRARY_DIR / "index.json"
+MEZZ_WIDTH, MEZZ_HEIGHT = 1080, 1920
+MEZZ_FPS = 30
+MEZZ_GOP_SECONDS = 1
+
+_index_cache = {"mtime": None, "clips": []}
+_index_lock = threading.Lock()
+
+
+def _source_id(src: Path) -> str:
+    st = src.stat()
+    return hashlib.sha1(f"{src.resolve()}:{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()[:16]
+
+
+def _transcode_mezzanine(src: Path, dest: Path):
+    gop = MEZZ_FPS * MEZZ_GOP_SECONDS
+    vf = (f"scale={MEZZ_WIDTH}:{MEZZ_HEIGHT}:force_original_aspect_ratio=increase,"
+          f"crop={MEZZ_WIDTH}:{MEZZ_HEIGHT},fps={MEZZ_FPS},setsar=1")
+    tmp = dest.with_suffix(".part.mp4")
+    cmd = ["ffmpeg", "-y", "-v", "error", "-i", str(src), "-an", "-vf", vf,
+           "-c:v", "libx264", "-preset", "medium", "-crf", "20", "-pix_fmt", "yuv420p",
+           "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+           "-movflags", "+faststart", str(tmp)]
+    subprocess.run(cmd, check=True)
+    os.replace(tmp, dest)
+
+
+def _keyframe_times(path: Path) -> list:
+    """Keyframe timestamps from packet flags (no decoding needed)."""
+    out = subprocess.check_output([
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", str(path)
+    ], text=True)
+    times = []
+    for line in out.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            times.append(float(pts))
+    return sorted(times)
+
+
+def load_index() -> list:
+    """Library clips from index.json, re-read only when the file changes."""
+    try:
+        mtime = INDEX_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        return []
+    with _index_lock:
+        if _index_cache["mtime"] != mtime:
+            _index_cache["clips"] = json.loads(INDEX_FILE.read_text()).get("clips", [])
+            _index_cache["mtime"] = mtime
+        return _index_cache["clips"]
+
+
+def ingest(sources) -> list:
+    """Transcode new or changed sources to mezzanine clips and update the index."""
+    LIBRARY_DIR.mkdir(parents=True, exist_ok=True)
+    with file_lock(LIBRARY_DIR / ".ingest.lock"):
+        clips = {c["id"]: c for c in load_index()}
+        for src in map(Path, sources):
+            cid = _source_id(src)
+            if cid in clips and (LIBRARY_DIR / clips[cid]["file"]).exists():
+                print(f"✔ {src.name} already in library")
+                continue
+            dest = LIBRARY_DIR / f"{src.stem}_{cid}.mp4"
+            print(f"🎞  Ingesting {src} → {dest.name}")
+            _transcode_mezzanine(src, dest)
+            clips[cid] = {
+                "id": cid,
+                "source": str(src),
+                "file": dest.name,
+                "duration": probe_duration(dest),
+                "keyframes": _keyframe_times(dest),
+            }
+        atomic_write_text(INDEX_FILE, json.dumps({"clips": list(clips.values())}, indent=1))
+    return load_index()
+
+
+def pick_segment(duration: float, rng=random):
+    """
+    Choose a clip and a keyframe to start from so `duration` seconds fit.
+    Returns (path, start_at) or None when the library is empty.
+    """
+    clips = load_index()
+    if not clips:
+        return None
+    fitting = [c for c in clips if c["duration"] >= duration] or clips
+    clip = rng.choice(fitting)
+    keyframes = clip["keyframes"] or [0.0]
+    last = bisect.bisect_right(keyframes, max(0.0, clip["duration"] - duration)) - 1
+    start_at = keyframes[rng.randint(0, max(0, last))]
+    return LIBRARY_DIR / clip["file"], start_at
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("usage: python background_library.py SOURCE.mp4 [SOURCE.mp4 ...]")
+        sys.exit(1)
+    for clip in ingest(sys.argv[1:]):
+        print(f"{clip['file']}: {clip['duration']:.1f}s, {len(clip['keyframes'])} keyframes")
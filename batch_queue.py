@@ -0,0 +1,412 @@
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import socket
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from fs_utils import atomic_write_text, exclusive_write_text
+
+# ─── Multi-node batch queue on a shared filesystem ─────────────────────────────
+# Any number of worker machines that mount the same directory can render one job
+# list together. Layout under the queue directory:
+#
+#   jobs/<id>.json        the job: {"id", "seed"?, "prompt"?, "parts"?, "profile"?, "attempts"}
+#   leases/<id>.lease     who is working on it and until when (renewed by a heartbeat)
+#   done/<id>.json        exactly-once completion marker: which videos + metadata won
+#   failed/<id>.json      given up after MAX_ATTEMPTS
+#   upload-leases/, published/   the same lease + marker pair for the upload step
+#   upload-retry/<id>.json   upload attempts so far and when the next one may start
+#   upload-failed/<id>.json  uploads given up after MAX_ATTEMPTS
+#
+# Leases are created with an exclusive hard link, so only one node can hold one.
+# A lease whose heartbeat stopped (dead node) expires after LEASE_TTL and is taken
+# over by renaming it away first, so two nodes can't steal it at once. Completion
+# markers are also exclusive: if a slow node and the node that took over both
+# finish, only the first marker counts and the loser deletes its own outputs; so
+# does a failed attempt before its job goes back on the queue, and a node whose
+# lease was taken over while it rendered.
+# Every attempt renders under its own base id, so attempts never overwrite each
+# other. The uploader only publishes jobs that have a done marker and writes a
+# published marker afterwards, so nothing is uploaded twice.
+#
+# Run every command from the shared working directory (the one holding
+# audio_and_subtitles/ and videos/); JOB_DB should stay on local disk.
+
+QUEUE_DIR = Path(os.getenv("BATCH_QUEUE_DIR", "batch_queue"))
+LEASE_TTL = float(os.getenv("LEASE_TTL", 120))
+MAX_ATTEMPTS = int(os.getenv("BATCH_MAX_ATTEMPTS", 3))
+POLL_INTERVAL = 10
+UPLOAD_RETRY_DELAY = float(os.getenv("BATCH_UPLOAD_RETRY_DELAY", 60))   # doubled after every failed attempt
+# Run status in the local job store for renders the queue publishes (see job_store.incomplete_runs).
+BATCH_STATUS = "batch"
+
+
+def node_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def job_id(job: dict) -> str:
+    """Stable id from the job's content, so enqueueing the same list twice is harmless."""
+    content = json.dumps({k: job.get(k) for k in ("seed", "prompt", "parts", "profile")}, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()[:16]
+
+
+def _read_json(path: Path):
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class Lease:
+    """A held lease; a daemon thread renews it every ttl/3 until `release()`."""
+
+    def __init__(self, queue, path: Path, job_id: str):
+        self.queue = queue
+        self.path = path
+        self.job_id = job_id
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, name=f"lease-{job_id}", daemon=True)
+        self._thread.start()
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.queue.ttl / 3):
+            current = _read_json(self.path)
+            if not current or current.get("owner") != self.queue.node:
+                print(f"⚠️  Lost lease on {self.job_id}; another node took it over")
+                self.lost.set()
+                return
+            atomic_write_text(self.path, json.dumps(self.queue.lease_record()))
+
+    def release(self):
+        self._stop.set()
+        self._thread.join()
+        current = _read_json(self.path)
+        if current and current.get("owner") == self.queue.node:
+            self.path.unlink(missing_ok=True)
+
+
+class LeaseQueue:
+    def __init__(self, root=QUEUE_DIR, ttl: float = LEASE_TTL, node: str = None):
+        self.root = Path(root)
+        self.ttl = ttl
+        self.node = node or node_id()
+        for sub in ("jobs", "leases", "done", "failed", "upload-leases", "published", "upload-retry",
+                    "upload-failed"):
+            (self.root / sub).mkdir(parents=True, exist_ok=True)
+
+    def _path(self, sub: str, id_: str, suffix: str = ".json") -> Path:
+        return self.root / sub / f"{id_}{suffix}"
+
+    # ── jobs ──
+    def enqueue(self, jobs) -> list:
+        ids = []
+        for job in jobs:
+            if isinstance(job, str):
+                job = {"prompt": job}
+            job = {**job, "id": job.get("id") or job_id(job), "attempts": 0}
+            exclusive_write_text(self._path("jobs", job["id"]), json.dumps(job, ensure_ascii=False))
+            ids.append(job["id"])
+        return ids
+
+    def job(self, id_: str) -> dict:
+        return _read_json(self._path("jobs", id_))
+
+    def ids(self, sub: str = "jobs") -> list:
+        return sorted(p.stem for p in (self.root / sub).glob("*.json"))
+
+    def pending(self) -> list:
+        finished = set(self.ids("done")) | set(self.ids("failed"))
+        return [i for i in self.ids("jobs") if i not in finished]
+
+    # ── leases ──
+    def lease_record(self) -> dict:
+        now = time.time()
+        return {"owner": self.node, "heartbeat": now, "expires_at": now + self.ttl}
+
+    def try_lease(self, id_: str, kind: str = "leases"):
+        """Take the lease on a job, or None if another live node holds it."""
+        path = self._path(kind, id_, ".lease")
+        if exclusive_write_text(path, json.dumps(self.lease_record())):
+            return Lease(self, path, id_)
+        current = _read_json(path)
+        if current is None or current.get("expires_at", 0) > time.time():
+            return None
+        # Expired: move it aside first so only one node can take over.
+        stale = path.with_name(f"{path.name}.{self.node.replace(':', '_')}.stale")
+        try:
+            os.rename(path, stale)
+        except FileNotFoundError:
+            return None
+        seen = _read_json(stale)
+        if seen and seen.get("expires_at", 0) > time.time():
+            # Someone renewed or re-took it between our read and the rename; put it back.
+            try:
+                os.link(stale, path)
+            except FileExistsError:
+                pass
+            stale.unlink(missing_ok=True)
+            return None
+        stale.unlink(missing_ok=True)
+        print(f"↻ Taking over expired lease on {id_} from {current.get('owner')}")
+        if exclusive_write_text(path, json.dumps(self.lease_record())):
+            return Lease(self, path, id_)
+        return None
+
+    def next_job(self):
+        """(job, lease) for the first pending job nobody holds, or (None, None)."""
+        for id_ in self.pending():
+            lease = self.try_lease(id_)
+            if lease is None:
+                continue
+            job = self.job(id_)
+            if self._path("done", id_).exists() or self._path("failed", id_).exists():
+                lease.release()
+                continue
+            job["attempts"] = job.get("attempts", 0) + 1
+            atomic_write_text(self._path("jobs", id_), json.dumps(job, ensure_ascii=False))
+            return job, lease
+        return None, None
+
+    # ── outcomes ──
+    def complete(self, id_: str, record: dict, kind: str = "done") -> bool:
+        """Write the exclusive completion marker; False if another node already completed it."""
+        record = {**record, "id": id_, "node": self.node, "finished_at": time.time()}
+        return exclusive_write_text(self._path(kind, id_), json.dumps(record, ensure_ascii=False))
+
+    def fail(self, job: dict, error: str):
+        """Record a failed attempt; after MAX_ATTEMPTS the job is parked in failed/."""
+        if job.get("attempts", 0) >= MAX_ATTEMPTS:
+            self.complete(job["id"], {"error": error, "attempts": job["attempts"]}, kind="failed")
+            print(f"❌ Job {job['id']} failed {job['attempts']} times; giving up: {error}")
+        else:
+            print(f"⚠️  Job {job['id']} attempt {job['attempts']} failed: {error}")
+
+    def upload_failed(self, id_: str, error: str) -> dict:
+        """Record a failed upload attempt and back off exponentially; parked in upload-failed/ after MAX_ATTEMPTS."""
+        retry = self.record("upload-retry", id_) or {"attempts": 0}
+        attempts = retry["attempts"] + 1
+        retry = {"attempts": attempts, "error": error,
+                 "retry_after": time.time() + UPLOAD_RETRY_DELAY * 2 ** (attempts - 1)}
+        if attempts >= MAX_ATTEMPTS:
+            self.complete(id_, {"error": error, "attempts": attempts}, kind="upload-failed")
+            print(f"❌ Uploads for job {id_} failed {attempts} times; giving up: {error}")
+        else:
+            print(f"⚠️  Uploads for job {id_} incomplete ({error}); retrying in "
+                  f"{UPLOAD_RETRY_DELAY * 2 ** (attempts - 1):.0f}s (finished platforms are skipped)")
+        atomic_write_text(self._path("upload-retry", id_), json.dumps(retry, ensure_ascii=False))
+        return retry
+
+    def unpublished(self, now: float = None) -> tuple:
+        """(ids ready to upload now, ids backing off) among completed jobs not yet published or given up on."""
+        now = time.time() if now is None else now
+        finished = set(self.ids("published")) | set(self.ids("upload-failed"))
+        ready, waiting = [], []
+        for id_ in self.ids("done"):
+            if id_ in finished:
+                continue
+            retry = self.record("upload-retry", id_) or {}
+            (waiting if retry.get("retry_after", 0) > now else ready).append(id_)
+        return ready, waiting
+
+    def record(self, kind: str, id_: str) -> dict:
+        return _read_json(self._path(kind, id_))
+
+    def status(self) -> dict:
+        leases = [p for p in (self.root / "leases").glob("*.lease")]
+        now = time.time()
+        live = [p for p in leases if (_read_json(p) or {}).get("expires_at", 0) > now]
+        return {"jobs": len(self.ids("jobs")), "done": len(self.ids("done")), "failed": len(self.ids("failed")),
+                "running": len(live), "expired_leases": len(leases) - len(live),
+                "published": len(self.ids("published")), "upload_failed": len(self.ids("upload-failed"))}
+
+
+# ─── Worker: TTS → SRT → render → metadata for leased jobs ────────────────────
+def run_job(job: dict, profile: str = None) -> dict:
+    """Render one job through the regular pipeline (without uploads); returns its outputs."""
+    import prompt_gen
+    from job_store import default_store
+
+    # Each attempt gets its own base id so a straggling node never overwrites the winner's files.
+    base = f"{job['id']}-{uuid.uuid4().hex[:8]}"
+    store = default_store()
+    if job.get("parts"):
+        store.record_run(base, job["parts"])
+    try:
+        # One video per part: done markers list plain paths, which the uploader sends to every platform.
+        pipeline = prompt_gen.build_pipeline(upload=False, variants=())
+        pipeline.run("story", [{"key": base, "base": base, "profile": job.get("profile") or profile,
+                                "prompt": job.get("prompt"), "seed": job.get("seed")}])
+        if pipeline.errors:
+            stage, _, error = pipeline.errors[0]
+            raise RuntimeError(f"{stage}: {error}")
+        videos = sorted(str(r["video_file"]) for r in pipeline.results if r["kind"] == "video")
+        meta_files = {str(r["meta_file"]) for r in pipeline.results if r["kind"] == "meta"}
+        if not videos or len(meta_files) != 1:
+            raise RuntimeError(f"incomplete outputs: {len(videos)} videos, {len(meta_files)} metadata files")
+    except BaseException:
+        _discard_attempt(base)
+        raise
+    # The queue owns this run from here on: keep --resume / the daemon on this node from re-uploading it.
+    store.set_run_status(base, BATCH_STATUS)
+    return {"base": base, "videos": videos, "meta_file": meta_files.pop()}
+
+
+def _part_of(video) -> tuple:
+    base, _, idx = Path(video).stem.rpartition("_part")
+    return base, int(idx)
+
+
+def _discard_attempt(base: str):
+    """Delete everything one attempt wrote (its run directories are its own) and retire its local run."""
+    import artifact_store
+    from job_store import default_store
+    store = default_store()
+    artifact_store.discard_run(base, store)
+    for run_dir in (artifact_store.AUDIO_SUBDIR / base, artifact_store.VIDEO_SUBDIR / base):
+        shutil.rmtree(run_dir, ignore_errors=True)
+    if store.run(base):
+        store.set_run_status(base, "expired")
+
+
+def work_one(queue: LeaseQueue, profile: str = None) -> bool:
+    """Lease and run one job; False if nothing was available."""
+    job, lease = queue.next_job()
+    if job is None:
+        return False
+    try:
+        print(f"🎬 {queue.node} rendering job {job['id']} (attempt {job['attempts']})")
+        record = run_job(job, profile)
+        if lease.lost.is_set():
+            # Another node has taken the job over; it will publish its own attempt.
+            print(f"⏭  Lost the lease on job {job['id']} while rendering; discarding this attempt")
+            _discard_attempt(record["base"])
+        elif queue.complete(job["id"], record):
+            print(f"✅ Job {job['id']} done: {len(record['videos'])} videos")
+        else:
+            print(f"⏭  Job {job['id']} was already completed elsewhere; discarding this attempt")
+            _discard_attempt(record["base"])
+    except Exception as e:
+        queue.fail(job, f"{type(e).__name__}: {e}")
+    finally:
+        lease.release()
+    return True
+
+
+def work(queue: LeaseQueue, concurrency: int = 1, profile: str = None, once: bool = False):
+    """Run `concurrency` job loops; with `once`, exit when no pending job is left."""
+    def loop():
+        while True:
+            if not work_one(queue, profile):
+                if once and not queue.pending():
+                    return
+                time.sleep(POLL_INTERVAL)
+
+    threads = [threading.Thread(target=loop, name=f"batch-worker-{i}") for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+# ─── Uploader: publish completed jobs exactly once ─────────────────────────────
+def upload_one(queue: LeaseQueue, id_: str) -> bool:
+    """Upload one completed job if we can lease it; True only if it is now published."""
+    import artifact_store
+    from job_store import default_store
+    from upload_dispatcher import dispatch_uploads
+
+    lease = queue.try_lease(id_, kind="upload-leases")
+    if lease is None:
+        return False
+    try:
+        if queue.record("published", id_) or queue.record("upload-failed", id_):
+            return False
+        record = queue.record("done", id_)
+        store = default_store()
+        for video in record["videos"]:
+            if store.part_for_video(video) is None:
+                store.adopt_video(video, record["meta_file"])
+                store.set_run_status(_part_of(video)[0], BATCH_STATUS)
+                # Track the worker's intermediates too, so retention here can delete them.
+                files = artifact_store.part_files(*_part_of(video))
+                for kind, key in (("audio", "audio_file"), ("srt", "srt_file")):
+                    if files[key].exists():
+                        store.record_artifact(*_part_of(video), kind, files[key], hashed=False)
+        try:
+            reports = dispatch_uploads([(video, record["meta_file"]) for video in record["videos"]])
+        except Exception as e:
+            queue.upload_failed(id_, str(e))
+            return False
+        results = [{p: r[p]["ok"] for p in r if p != "video"} for r in reports]
+        failed = sorted({p for r in results for p, ok in r.items() if not ok})
+        if failed:
+            queue.upload_failed(id_, f"failed on {', '.join(failed)}")
+            return False
+        queue.complete(id_, {"videos": record["videos"], "uploaded": results}, kind="published")
+        artifact_store.notify_uploaded()
+        return True
+    finally:
+        lease.release()
+
+
+def upload_pass(queue: LeaseQueue) -> int:
+    """Try every completed job that isn't backing off; returns how many were published."""
+    ready, _ = queue.unpublished()
+    return sum(upload_one(queue, id_) for id_ in ready)
+
+
+def upload(queue: LeaseQueue, once: bool = False):
+    """Publish completed jobs; with `once`, exit when nothing is left to render or upload."""
+    from upload_handlers import ensure_tiktok_auth, start_auto_refresher
+    import artifact_store
+    ensure_tiktok_auth()
+    start_auto_refresher()
+    artifact_store.start_gc()
+    while True:
+        if not upload_pass(queue):
+            if once and not queue.pending() and not any(queue.unpublished()):
+                return
+            time.sleep(POLL_INTERVAL)
+
+
+def load_jobs(path) -> list:
+    """A JSON array or JSON-lines file of jobs ({"seed"}, {"prompt"}, {"parts"}, or a bare prompt string)."""
+    text = Path(path).read_text()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a job list across machines sharing a filesystem.")
+    parser.add_argument("--queue", default=str(QUEUE_DIR), help="shared queue directory (BATCH_QUEUE_DIR)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_enqueue = sub.add_parser("enqueue", help="add jobs from a JSON / JSON-lines file")
+    p_enqueue.add_argument("jobs")
+    p_work = sub.add_parser("work", help="render leased jobs")
+    p_work.add_argument("--concurrency", type=int, default=1, help="jobs rendered at once on this node")
+    p_work.add_argument("--profile", default=None, help="render profile (see render_profiles.py)")
+    p_work.add_argument("--once", action="store_true", help="exit when the queue is drained")
+    p_upload = sub.add_parser("upload", help="upload completed jobs exactly once")
+    p_upload.add_argument("--once", action="store_true", help="exit when the queue is drained")
+    sub.add_parser("status", help="print queue counts")
+    args = parser.parse_args()
+
+    queue = LeaseQueue(args.queue)
+    if args.command == "enqueue":
+        ids = queue.enqueue(load_jobs(args.jobs))
+        print(f"Enqueued {len(ids)} job(s) in {queue.root}")
+    elif args.command == "work":
+        work(queue, args.concurrency, args.profile, args.once)
+    elif args.command == "upload":
+        upload(queue, args.once)
+    else:
+        json.dump(queue.status(), sys.stdout, indent=2)
+        print()
@@ -0,0 +1,624 @@
+import os
+import re
+import sys
+import json
+import math
+import time
+import email
+import random
+import shutil
+import argparse
+import resource
+import statistics
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# ─── Offline end-to-end benchmark ─────────────────────────────────────────────
+# Runs real batches through the real pipeline (TTS → alignment → ffmpeg render →
+# uploads) with every external service replaced by a local stand-in on one HTTP
+# server: OpenAI chat (plain + streamed) and transcription, ElevenLabs TTS, the
+# TikTok content-posting API and a YouTube Data API (discovery document, OAuth
+# token endpoint and resumable uploads). Each service has its own latency and
+# all of them share an injected failure rate (429 with Retry-After, or 503).
+# The background clip is synthesised with ffmpeg lavfi. Nothing leaves the host,
+# nothing costs money, and the numbers are comparable between commits:
+#
+#   python bench.py --stories 3 --workers 4 --profile fast
+#
+# Results (stories/hour, per-stage latency percentiles, peak memory) are appended
+# to bench_results/history.jsonl together with the git commit, and compared with
+# the last run that used the same settings.
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+BENCH_DIR = Path(os.getenv("BENCH_DIR", SCRIPT_DIR / "bench_results"))
+DEFAULT_LATENCY = {"openai": 0.8, "whisper": 0.5, "elevenlabs": 0.4, "tiktok": 0.05, "youtube": 0.05}
+SPEECH_WORDS_PER_SECOND = 2.6
+REGRESSION_THRESHOLD = 0.10
+
+WORDS = ("blade oath storm temple raven shield blood thunder iron crown betrayal brother god altar ash "
+         "longship marble spear vow flame shadow wolf honour exile fate sea night oracle throne "
+         "whisper sacred ruin dawn").split()
+
+
+# ─── Fake services ─────────────────────────────────────────────────────────────
+class FakeServices:
+    def __init__(self, latency=None, failure_rate: float = 0.0, tokens_per_second: float = 50, seed: int = 1):
+        self.latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.failure_rate = failure_rate
+        self.tokens_per_second = tokens_per_second
+        self.rng = random.Random(seed)
+        self.counts = {}
+        self.injected = 0
+        self.server = None
+        self._lock = threading.Lock()
+        self._ids = 0
+        self._uploads = {}
+        self._polls = {}
+        self._audio_dir = Path(tempfile.mkdtemp(prefix="bench-tts-"))
+        self._audio = {}
+        self._audio_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        services = self
+
+        class Handler(_FakeHandler):
+            fake = services
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="fake-services", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+        shutil.rmtree(self._audio_dir, ignore_errors=True)
+
+    def next_id(self, prefix: str) -> str:
+        with self._lock:
+            self._ids += 1
+            return f"{prefix}{self._ids}"
+
+    def hit(self, service: str) -> bool:
+        """Count a request, sleep its latency; True if a failure should be injected instead."""
+        with self._lock:
+            self.counts[service] = self.counts.get(service, 0) + 1
+            fail = self.rng.random() < self.failure_rate
+            self.injected += fail
+        time.sleep(self.latency.get(service, 0))
+        return fail
+
+    # ── content ──
+    def story_parts(self, n: int = 3, words: int = 85) -> list:
+        with self._lock:
+            return [" ".join(self.rng.choice(WORDS) for _ in range(words)).capitalize() + "." for _ in range(n)]
+
+    def metadata(self, n: int) -> dict:
+        return {"videos": [{
+            "part": i,
+            "tiktok": {"caption": f"Part {i} of the saga", "hashtags": ["#myth", "#story", "#fyp", "#viking", "#rome"]},
+            "instagram": {"caption": f"Part {i}. Follow for more.", "hashtags": ["#myth"] * 15},
+            "youtube_shorts": {"title": f"The Oath, part {i} #Shorts", "description": "Part of the saga #Shorts",
+                               "tags": ["#Shorts", "myth", "story", "epic", "history"]},
+        } for i in range(1, n + 1)]}
+
+    def speech(self, text: str, pcm: bool = False) -> bytes:
+        """
+        MP3 (or raw 16-bit mono PCM) of speech-like bursts lasting as long as `text`
+        would take to read (cached per second).
+        """
+        seconds = max(1, round(len(text.split()) / SPEECH_WORDS_PER_SECOND))
+        with self._audio_lock:
+            path = self._audio.get((seconds, pcm))
+            if path is None:
+                path = self._audio_dir / f"speech_{seconds}.{'pcm' if pcm else 'mp3'}"
+                codec = ["-f", "s16le", "-ac", "1"] if pcm else ["-c:a", "libmp3lame", "-b:a", "128k"]
+                subprocess.run([
+                    "ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi",
+                    "-i", f"aevalsrc='0.6*sin(2*PI*220*t)*gt(mod(t\\,0.55)\\,0.15)':s=44100:d={seconds}",
+                    *codec, str(path),
+                ], check=True)
+                self._audio[(seconds, pcm)] = path
+        return path.read_bytes()
+
+    def discovery_document(self) -> dict:
+        part = {"type": "string", "required": True, "repeated": True, "location": "query"}
+        return {
+            "kind": "discovery#restDescription", "discoveryVersion": "v1", "protocol": "rest",
+            "id": "youtube:v3", "name": "youtube", "version": "v3",
+            "rootUrl": f"{self.url}/youtube/", "servicePath": "youtube/v3/", "batchPath": "batch",
+            "baseUrl": f"{self.url}/youtube/youtube/v3/", "parameters": {},
+            "schemas": {
+                "Video": {"id": "Video", "type": "object", "properties": {"id": {"type": "string"}}},
+                "ChannelListResponse": {"id": "ChannelListResponse", "type": "object",
+                                        "properties": {"items": {"type": "array", "items": {"type": "object"}}}},
+            },
+            "resources": {
+                "videos": {"methods": {"insert": {
+                    "id": "youtube.videos.insert", "path": "videos", "httpMethod": "POST",
+                    "parameters": {"part": part}, "parameterOrder": ["part"],
+                    "request": {"$ref": "Video"}, "response": {"$ref": "Video"},
+                    "supportsMediaUpload": True,
+                    "mediaUpload": {"accept": ["video/*", "application/octet-stream"], "maxSize": "256GB",
+                                    "protocols": {"simple": {"multipart": True, "path": "/upload/youtube/v3/videos"},
+                                                  "resumable": {"multipart": True, "path": "/resumable/upload/youtube/v3/videos"}}},
+                }}},
+                "channels": {"methods": {"list": {
+                    "id": "youtube.channels.list", "path": "channels", "httpMethod": "GET",
+                    "parameters": {"part": part, "mine": {"type": "boolean", "location": "query"}},
+                    "parameterOrder": ["part"], "response": {"$ref": "ChannelListResponse"},
+                }}},
+            },
+        }
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake = None
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self) -> bytes:
+        n = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(n) if n else b""
+
+    def _send(self, status: int, body: bytes = b"", ctype: str = "application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _json(self, obj, status: int = 200, headers=None):
+        self._send(status, json.dumps(obj).encode(), headers=headers)
+
+    def _fail(self):
+        if self.fake.rng.random() < 0.5:
+            self._json({"error": {"message": "rate limited (injected)"}}, 429, {"Retry-After": "0.5"})
+        else:
+            self._json({"error": {"message": "unavailable (injected)"}}, 503)
+
+    def _route(self, method: str):
+        url = urlparse(self.path)
+        path, query = url.path, parse_qs(url.query)
+        body = self._body()
+        if path == "/v1/chat/completions":
+            return self._chat(body)
+        if path == "/v1/audio/transcriptions":
+            return self._transcribe(body)
+        if path.startswith("/v1/text-to-speech/"):
+            return self._tts(query, body)
+        if path.startswith("/v2/") or path.startswith("/tiktok/"):
+            return self._tiktok(method, path, query, body)
+        if path.startswith("/youtube/"):
+            return self._youtube(method, path, query, body)
+        self._json({"error": f"no fake for {method} {path}"}, 404)
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+    # ── OpenAI ──
+    def _chat(self, body: bytes):
+        if self.fake.hit("openai"):
+            return self._fail()
+        req = json.loads(body)
+        prompt = req["messages"][-1]["content"]
+        m = re.search(r"part 1 to part (\d+)", prompt)
+        batch = re.search(r"Write (\d+) different stories", prompt)
+        if batch:
+            content = json.dumps({"stories": [{"parts": self.fake.story_parts(), **self.fake.metadata(3)}
+                                              for _ in range(int(batch.group(1)))]})
+        else:
+            content = json.dumps(self.fake.metadata(int(m.group(1))) if m else {"parts": self.fake.story_parts()})
+        chunks = [content[i:i + 4] for i in range(0, len(content), 4)]   # ~4 characters per token
+        delay = 1 / self.fake.tokens_per_second
+        created = int(time.time())
+        if not req.get("stream"):
+            time.sleep(delay * len(chunks))
+            return self._json({
+                "id": self.fake.next_id("chatcmpl-"), "object": "chat.completion", "created": created,
+                "model": req.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(chunks), "total_tokens": 0},
+            })
+        cid = self.fake.next_id("chatcmpl-")
+        events = []
+        for i, piece in enumerate(chunks + [None]):
+            delta = {"content": piece} if piece is not None else {}
+            if i == 0:
+                delta["role"] = "assistant"
+            events.append("data: " + json.dumps({
+                "id": cid, "object": "chat.completion.chunk", "created": created, "model": req.get("model"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": None if piece is not None else "stop"}],
+            }) + "\n\n")
+        events.append("data: [DONE]\n\n")
+        encoded = [e.encode() for e in events]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(sum(map(len, encoded))))
+        self.end_headers()
+        for e in encoded:
+            self.wfile.write(e)
+            self.wfile.flush()
+            time.sleep(delay)
+
+    def _transcribe(self, body: bytes):
+        if self.fake.hit("whisper"):
+            return self._fail()
+        from media_probe import mp3_duration
+        msg = email.message_from_bytes(b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + body)
+        audio = next((p.get_payload(decode=True) for p in msg.walk() if p.get_filename()), b"")
+        with tempfile.NamedTemporaryFile(suffix=".mp3") as tmp:
+            tmp.write(audio)
+            tmp.flush()
+            duration = mp3_duration(tmp.name) or 10.0
+        segments, t = [], 0.0
+        while t < duration:
+            end = min(duration, t + 3.0)
+            segments.append({"id": len(segments), "seek": 0, "start": t, "end": end,
+                             "text": " ".join(self.fake.rng.choice(WORDS) for _ in range(8)), "tokens": [],
+                             "temperature": 0.0, "avg_logprob": -0.1, "compression_ratio": 1.0, "no_speech_prob": 0.0})
+            t = end
+        self._json({"task": "transcribe", "language": "english", "duration": duration,
+                    "text": " ".join(s["text"] for s in segments), "segments": segments})
+
+    # ── ElevenLabs ──
+    def _tts(self, query: dict, body: bytes):
+        if self.fake.hit("elevenlabs"):
+            return self._fail()
+        pcm = query.get("output_format", [""])[0].startswith("pcm_")
+        self._send(200, self.fake.speech(json.loads(body).get("text", ""), pcm),
+                   "audio/pcm" if pcm else "audio/mpeg")
+
+    # ── TikTok ──
+    def _tiktok(self, method, path, query, body):
+        if self.fake.hit("tiktok"):
+            return self._fail()
+        if path in ("/v2/oauth/refresh_token/", "/v2/oauth/token/"):
+            return self._json({"data": {"access_token": "bench-access", "refresh_token": "bench-refresh",
+                                        "expires_in": 86400, "open_id": "bench"}})
+        if path == "/v2/post/publish/video/init/":
+            publish_id = self.fake.next_id("v_pub_bench_")
+            return self._json({"data": {"publish_id": publish_id, "upload_url": f"{self.fake.url}/tiktok/upload/{publish_id}"},
+                               "error": {"code": "ok"}})
+        if path.startswith("/tiktok/upload/"):
+            first, last, total = map(int, re.match(r"bytes (\d+)-(\d+)/(\d+)", self.headers["Content-Range"]).groups())
+            return self._send(201 if last + 1 >= total else 206)
+        if path == "/v2/post/publish/get_status/":
+            publish_id = (query.get("publish_id") or [""])[0]
+            with self.fake._lock:
+                polls = self.fake._polls[publish_id] = self.fake._polls.get(publish_id, 0) + 1
+            return self._json({"data": {"status": "PUBLISH_COMPLETE" if polls > 1 else "PROCESSING_UPLOAD"}})
+        self._json({"error": {"code": "not_found"}}, 404)
+
+    # ── YouTube ──
+    def _youtube(self, method, path, query, body):
+        if path == "/youtube/discovery":
+            return self._json(self.fake.discovery_document())
+        if self.fake.hit("youtube"):
+            return self._fail()
+        if path == "/youtube/token":
+            return self._json({"access_token": "bench-yt", "expires_in": 3600, "token_type": "Bearer"})
+        if path == "/youtube/youtube/v3/channels":
+            return self._json({"items": [{"snippet": {"title": "Bench Channel"}}]})
+        if method == "POST" and "/upload/" in path:
+            session = self.fake.next_id("yt_session_")
+            with self.fake._lock:
+                self.fake._uploads[session] = 0
+            return self._send(200, headers={"Location": f"{self.fake.url}/youtube/upload-session/{session}"})
+        if method == "PUT" and path.startswith("/youtube/upload-session/"):
+            session = path.rsplit("/", 1)[1]
+            m = re.match(r"bytes (\d+)-(\d+)/(\d+)", self.headers.get("Content-Range", ""))
+            with self.fake._lock:
+                received = self.fake._uploads.get(session, 0)
+                if m:
+                    received = self.fake._uploads[session] = int(m.group(2)) + 1
+                    total = int(m.group(3))
+                else:
+                    total = int(self.headers.get("Content-Range", "bytes */0").rsplit("/", 1)[1])
+            if received < total:
+                return self._send(308, headers={"Range": f"bytes=0-{received - 1}"} if received else None)
+            return self._json({"id": self.fake.next_id("yt_video_"), "kind": "youtube#video"})
+        self._json({"error": {"message": f"no fake for {method} {path}"}}, 404)
+
+
+# ─── Environment ───────────────────────────────────────────────────────────────
+def synth_background(path: Path, seconds: int = 120):
+    subprocess.run([
+        "ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi",
+        "-i", f"testsrc2=size=1080x1920:rate=30:duration={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-g", "30", "-pix_fmt", "yuv420p", str(path),
+    ], check=True)
+
+
+def configure_environment(services: FakeServices, workdir: Path, real_limits: bool = False):
+    """Point every client at the fakes and every state file into `workdir` (before anything is imported)."""
+    tiktok_tokens = workdir / "tiktok_token.json"
+    tiktok_tokens.write_text(json.dumps({"access_token": "bench-access", "refresh_token": "bench-refresh",
+                                         "expires_at": int(time.time()) + 86400}))
+    youtube_tokens = workdir / "youtube_token.json"
+    youtube_tokens.write_text(json.dumps({
+        "token": "bench-yt", "refresh_token": "bench-yt-refresh", "token_uri": f"{services.url}/youtube/token",
+        "client_id": "bench", "client_secret": "bench",
+        "scopes": ["https://www.googleapis.com/auth/youtube.upload", "https://www.googleapis.com/auth/youtube.readonly"],
+        "expiry": "2099-01-01T00:00:00Z",
+    }))
+    discovery = workdir / "youtube_v3.json"
+    discovery.write_text(json.dumps(services.discovery_document()))
+    env = {
+        "OPENAI_API_KEY": "bench", "OPENAI_BASE_URL": f"{services.url}/v1",
+        "ELEVENLABS_API_KEY": "bench", "ELEVENLABS_BASE_URL": services.url,
+        "TIKTOK_API_BASE": services.url, "TIKTOK_CLIENT_KEY": "bench", "TIKTOK_TOKEN_STORE": str(tiktok_tokens),
+        "YOUTUBE_TOKEN_STORE": str(youtube_tokens), "YOUTUBE_DISCOVERY_CACHE": str(discovery),
+        "YOUTUBE_DISCOVERY_URL": f"{services.url}/youtube/discovery",
+        "YOUTUBE_CLIENT_SECRETS_FILE": str(workdir / "client_secret.json"),
+        "JOB_DB": str(workdir / "jobs.sqlite3"), "MEDIA_CACHE_DIR": str(workdir / "cache"), "USE_MEDIA_CACHE": "0",
+        "BACKGROUND_LIBRARY_DIR": str(workdir / "backgrounds"),
+        "TRACE_FILE": str(workdir / "trace.json"), "METRICS_FILE": str(workdir / "metrics.prom"), "METRICS_PORT": "0",
+    }
+    if not real_limits and "RATE_LIMITS" not in os.environ:
+        # The pipeline is under test, not the providers' quotas.
+        env["RATE_LIMITS"] = (json.dumps({name: {"rate": 1000, "burst": 1000} for name in (
+            "openai.chat", "openai.whisper", "elevenlabs.tts", "tiktok.oauth", "tiktok.init", "tiktok.chunk", "tiktok.status")}))
+    os.environ.update(env)
+
+
+# ─── Measurement ───────────────────────────────────────────────────────────────
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def stage_latencies(spans) -> dict:
+    by_name = {}
+    for s in spans:
+        by_name.setdefault(s["name"], []).append(s["duration"])
+    return {name: {"count": len(v), "p50": percentile(v, 50), "p90": percentile(v, 90),
+                   "p99": percentile(v, 99), "max": max(v)} for name, v in sorted(by_name.items())}
+
+
+def git_revision() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=SCRIPT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            return None
+    return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def run_benchmark(stories: int = 3, workers: int = 4, profile: str = "fast", latency=None, failure_rate: float = 0.0,
+                  tokens_per_second: float = 50, background_seconds: int = 120, library: bool = False,
+                  real_limits: bool = False, seed: int = 1, keep: bool = False, batch_size: int = 1) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix="brainrot-bench-"))
+    services = FakeServices(latency, failure_rate, tokens_per_second, seed).start()
+    cwd = os.getcwd()
+    try:
+        configure_environment(services, workdir, real_limits)
+        os.chdir(workdir)
+        print(f"🧪 Fakes on {services.url}; working in {workdir}")
+        synth_background(workdir / "videoplayback.mp4", background_seconds)
+        sys.path.insert(0, str(SCRIPT_DIR))
+        import prompt_gen
+        import tracing
+        if library:
+            import background_library
+            background_library.ingest([workdir / "videoplayback.mp4"])
+
+        prompt_gen.ensure_tiktok_auth()
+        pipeline = prompt_gen.build_pipeline(network_workers=min(workers, prompt_gen.NETWORK_CONCURRENCY),
+                                             render_workers=min(workers, prompt_gen.RENDER_CONCURRENCY))
+        started = time.perf_counter()
+        if batch_size > 1:
+            jobs = prompt_gen.batched_story_jobs(stories, batch_size, profile)
+        else:
+            jobs = [{"key": i, "profile": profile} for i in range(stories)]
+        pipeline.run("story", jobs)
+        reports = prompt_gen.wait_for_uploads(pipeline.results)
+        produced = time.perf_counter() - started
+        prompt_gen.wait_for_publishes(timeout=600)
+        wall = time.perf_counter() - started
+        tracing.tracer.flush()
+
+        upload_failures = sum(not r[p]["ok"] for r in reports for p in ("youtube", "tiktok"))
+        return {
+            **git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {"stories": stories, "workers": workers, "profile": profile, "latency": services.latency,
+                       "failure_rate": failure_rate, "tokens_per_second": tokens_per_second,
+                       "library": library, "real_limits": real_limits, "batch_size": batch_size,
+                       "cpus": os.cpu_count()},
+            "wall_s": round(wall, 2),
+            "produce_s": round(produced, 2),
+            "videos": len(reports),
+            "stories_per_hour": round(stories * 3600 / produced, 2),
+            "videos_per_hour": round(len(reports) * 3600 / produced, 2),
+            "pipeline_errors": len(pipeline.errors),
+            "upload_failures": upload_failures,
+            "requests": dict(services.counts),
+            "injected_failures": services.injected,
+            "stages": stage_latencies(tracing.tracer.spans),
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "peak_child_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        }
+    finally:
+        os.chdir(cwd)
+        services.stop()
+        if keep:
+            print(f"Kept {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ─── Results ───────────────────────────────────────────────────────────────────
+def save_result(result: dict, bench_dir: Path = BENCH_DIR) -> Path:
+    bench_dir.mkdir(parents=True, exist_ok=True)
+    path = bench_dir / f"{result['timestamp'].replace(':', '')}_{result['commit'] or 'nogit'}.json"
+    path.write_text(json.dumps(result, indent=2))
+    with open(bench_dir / "history.jsonl", "a") as f:
+        f.write(json.dumps(result) + "\n")
+    return path
+
+
+def previous_result(result: dict, bench_dir: Path = BENCH_DIR):
+    """The most recent earlier run with identical settings, or None."""
+    history = bench_dir / "history.jsonl"
+    if not history.exists():
+        return None
+    match = None
+    for line in history.read_text().splitlines():
+        entry = json.loads(line)
+        if entry["config"] == result["config"] and entry["timestamp"] != result["timestamp"]:
+            match = entry
+    return match
+
+
+def print_result(result: dict, baseline: dict = None):
+    print(f"\n📊 {result['commit']}{' (dirty)' if result['dirty'] else ''}: "
+          f"{result['stories_per_hour']} stories/h, {result['videos_per_hour']} videos/h "
+          f"({result['videos']} videos in {result['produce_s']}s, {result['wall_s']}s incl. publish polling)")
+    print(f"   peak RSS {result['peak_rss_mb']} MB (ffmpeg children {result['peak_child_rss_mb']} MB) | "
+          f"errors {result['pipeline_errors']} | upload failures {result['upload_failures']} | "
+          f"injected failures {result['injected_failures']}")
+    print(f"   {'stage':<16}{'n':>5}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+    for name, s in result["stages"].items():
+        print(f"   {name:<16}{s['count']:>5}{s['p50']:>9.2f}{s['p90']:>9.2f}{s['p99']:>9.2f}{s['max']:>9.2f}")
+    if not baseline:
+        return
+    print(f"\n   vs {baseline['commit']} ({baseline['timestamp']}):")
+    regressions = []
+
+    def compare(label, old, new, higher_is_better):
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        flag = "⚠️ " if worse > REGRESSION_THRESHOLD else "  "
+        if worse > REGRESSION_THRESHOLD:
+            regressions.append(label)
+        print(f"   {flag}{label:<22}{old:>10.2f} → {new:>10.2f} ({change:+.1%})")
+
+    compare("stories/hour", baseline["stories_per_hour"], result["stories_per_hour"], True)
+    compare("peak RSS MB", baseline["peak_rss_mb"], result["peak_rss_mb"], False)
+    for name, s in result["stages"].items():
+        if name in baseline["stages"]:
+            compare(f"{name} p50 s", baseline["stages"][name]["p50"], s["p50"], False)
+    print(f"\n   {'⚠️  Possible regressions: ' + ', '.join(regressions) if regressions else '✅ No regressions'}")
+
+
+# ─── Startup time ──────────────────────────────────────────────────────────────
+STARTUP_TARGETS = ("prompt_gen", "upload_handlers", "upload_dispatcher", "daemon")
+
+
+def _import_once(module: str) -> tuple:
+    """(wall seconds, `-X importtime` report) for importing `module` in a fresh interpreter."""
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=SCRIPT_DIR, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {proc.stderr.strip().splitlines()[-1]}")
+    return wall, proc.stderr
+
+
+def _direct_imports(report: str, module: str, top: int = 5) -> list:
+    """The target's most expensive direct imports as (name, cumulative ms)."""
+    costs = []
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        stripped = name.strip()
+        if name.startswith("   ") and not name.startswith("    ") and cumulative.strip().isdigit():
+            costs.append((stripped, int(cumulative) / 1000))
+        elif not name.startswith("  "):
+            # A top-level import finished: children seen so far belonged to it.
+            if stripped == module:
+                break
+            costs = []
+    return sorted(costs, key=lambda c: -c[1])[:top]
+
+
+def run_startup_benchmark(modules=STARTUP_TARGETS, repeats: int = 5) -> dict:
+    """Median wall time to import each entry point in a fresh interpreter, minus bare interpreter start."""
+    bare = statistics.median(
+        _timed(lambda: subprocess.run([sys.executable, "-c", "pass"], check=True)) for _ in range(repeats))
+    results = {}
+    for module in modules:
+        runs = [_import_once(module) for _ in range(repeats)]
+        wall = statistics.median(w for w, _ in runs)
+        results[module] = {"import_ms": round((wall - bare) * 1000, 1), "wall_ms": round(wall * 1000, 1),
+                           "slowest_imports": _direct_imports(runs[-1][1], module)}
+    return {**git_revision(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {"mode": "startup", "modules": list(modules), "repeats": repeats},
+            "interpreter_ms": round(bare * 1000, 1), "modules": results}
+
+
+def _timed(fn) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def print_startup(result: dict, baseline: dict = None):
+    print(f"\n⏱  Startup at {result['commit']}{' (dirty)' if result['dirty'] else ''} "
+          f"(bare interpreter {result['interpreter_ms']} ms, median of {result['config']['repeats']})")
+    for module, r in result["modules"].items():
+        before = (baseline or {}).get("modules", {}).get(module)
+        delta = f"  (was {before['import_ms']} ms at {baseline['commit']})" if before else ""
+        print(f"   {module:<20}{r['import_ms']:>8.1f} ms{delta}")
+        for name, ms in r["slowest_imports"]:
+            print(f"      {name:<26}{ms:>7.1f} ms")
+
+
+def _parse_latency(text: str) -> dict:
+    return {k: float(v) for k, v in (pair.split("=") for pair in text.split(",") if pair)} if text else {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the full pipeline against local fake services.")
+    parser.add_argument("--stories", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--profile", default="fast", help="render profile (see render_profiles.py)")
+    parser.add_argument("--latency", default="", help="per-service seconds, e.g. openai=0.8,elevenlabs=0.4,tiktok=0.05")
+    parser.add_argument("--tokens-per-second", type=float, default=50, help="simulated LLM output speed")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 429/503")
+    parser.add_argument("--background-seconds", type=int, default=120)
+    parser.add_argument("--library", action="store_true", help="ingest the synthetic background into a library first")
+    parser.add_argument("--real-limits", action="store_true", help="keep the production client-side rate limits")
+    parser.add_argument("--batch-size", type=int, default=1, help="stories generated per LLM request (see STORY_BATCH_SIZE)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="keep the working directory")
+    parser.add_argument("--no-save", action="store_true", help="don't record the result")
+    parser.add_argument("--startup", action="store_true", help="only measure import/startup time of the entry points")
+    parser.add_argument("--repeats", type=int, default=5, help="fresh interpreters per module for --startup")
+    args = parser.parse_args()
+    if args.startup:
+        result = run_startup_benchmark(repeats=args.repeats)
+        baseline = previous_result(result)
+        if not args.no_save:
+            print(f"Saved {save_result(result)}")
+        print_startup(result, baseline)
+        sys.exit(0)
+    result = run_benchmark(args.stories, args.workers, args.profile, _parse_latency(args.latency), args.failure_rate,
+                           args.tokens_per_second, args.background_seconds, args.library, args.real_limits,
+                           args.seed, args.keep, args.batch_size)
+    baseline = previous_result(result)
+    if not args.no_save:
+        print(f"Saved {save_result(result)}")
+    print_result(result, baseline)
@@ -0,0 +1,112 @@
+import os
+import json
+import mmap
+import time
+from pathlib import Path
+from fs_utils import atomic_write_text
+
+# ─── Chunked, resumable TikTok media transfer ─────────────────────────────────
+# TikTok's FILE_UPLOAD rules: files under 5 MB go up whole; otherwise every chunk
+# is 5–64 MB, sent in order, total_chunk_count = floor(size / chunk_size), and the
+# last chunk absorbs the remainder (up to 128 MB). Chunks are sliced out of a
+# memory map so only one chunk is resident at a time, and progress is written to
+# a sidecar file after every acknowledged chunk so an interrupted upload resumes
+# where it stopped instead of from byte zero.
+
+MIN_CHUNK = 5 * 1024 * 1024
+MAX_CHUNK = 64 * 1024 * 1024
+MAX_FINAL_CHUNK = 128 * 1024 * 1024
+MAX_CHUNKS = 1000
+DEFAULT_CHUNK = int(os.getenv("TIKTOK_CHUNK_SIZE", 10 * 1024 * 1024))
+UPLOAD_URL_TTL = 55 * 60   # TikTok upload URLs are valid for one hour
+
+
+def plan_chunks(size: int, chunk_size: int = DEFAULT_CHUNK):
+    """(chunk_size, total_chunk_count) that satisfy TikTok's chunking rules."""
+    if size < MIN_CHUNK:
+        return size, 1
+    chunk_size = max(MIN_CHUNK, min(chunk_size, MAX_CHUNK, size))
+    # Grow the chunk if the remainder would push the final chunk past its limit
+    # or the file would need too many chunks.
+    while (size // chunk_size > MAX_CHUNKS or
+           size - chunk_size * (size // chunk_size - 1) > MAX_FINAL_CHUNK) and chunk_size < MAX_CHUNK:
+        chunk_size = min(MAX_CHUNK, chunk_size * 2)
+    return chunk_size, size // chunk_size
+
+
+def chunk_ranges(size: int, chunk_size: int, count: int) -> list:
+    """Inclusive (first, last) byte ranges; the final chunk takes the remainder."""
+    ranges = [(i * chunk_size, (i + 1) * chunk_size - 1) for i in range(count)]
+    ranges[-1] = (ranges[-1][0], size - 1)
+    return ranges
+
+
+def state_path(video_path) -> Path:
+    return Path(f"{video_path}.tiktok-upload.json")
+
+
+def load_state(video_path):
+    """Saved progress for `video_path`, or None if missing, stale or for a different file."""
+    path = state_path(video_path)
+    try:
+        state = json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+    st = os.stat(video_path)
+    if (state.get("video_size") != st.st_size or state.get("mtime_ns") != st.st_mtime_ns
+            or time.time() - state.get("created_at", 0) > UPLOAD_URL_TTL):
+        path.unlink(missing_ok=True)
+        return None
+    return state
+
+
+def new_state(video_path, publish_id: str, upload_url: str, chunk_size: int, count: int) -> dict:
+    st = os.stat(video_path)
+    state = {
+        "video_size": st.st_size, "mtime_ns": st.st_mtime_ns,
+        "publish_id": publish_id, "upload_url": upload_url,
+        "chunk_size": chunk_size, "total_chunk_count": count,
+        "next_chunk": 0, "created_at": time.time(),
+    }
+    save_state(video_path, state)
+    return state
+
+
+def save_state(video_path, state: dict):
+    atomic_write_text(state_path(video_path), json.dumps(state))
+
+
+def clear_state(video_path):
+    state_path(video_path).unlink(missing_ok=True)
+
+
+def upload_chunks(video_path, state: dict, session=None, timeout: float = 120):
+    """
+    PUT the remaining chunks described by `state`, persisting progress after each one.
+    Raises requests.HTTPError on a rejected chunk; the saved state lets the caller retry.
+    """
+    import requests
+    http = session or requests
+    size = state["video_size"]
+    ranges = chunk_ranges(size, state["chunk_size"], state["total_chunk_count"])
+    with open(video_path, "rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in range(state["next_chunk"], len(ranges)):
+            first, last = ranges[i]
+            resp = http.put(
+                state["upload_url"],
+                headers={
+                    "Content-Type": "video/mp4",
+                    "Content-Length": str(last - first + 1),
+                    "Content-Range": f"bytes {first}-{last}/{size}",
+                },
+                data=mm[first:last + 1],
+                timeout=timeout,
+            )
+            if resp.status_code not in (200, 201, 206):
+                print(f"❌ TikTok chunk {i + 1}/{len(ranges)} failed ({resp.status_code}): {resp.text}")
+                resp.raise_for_status()
+                raise requests.HTTPError(f"Unexpected status {resp.status_code} for chunk {i + 1}", response=resp)
+            state["next_chunk"] = i + 1
+            save_state(video_path, state)
+            print(f"  TikTok chunk {i + 1}/{len(ranges)} sent")
+    clear_state(video_path)
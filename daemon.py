@@ -0,0 +1,216 @@
+import os
+import time
+import queue
+import shutil
+import signal
+import argparse
+import threading
+from prompt_gen import (
+    AUDIO_SUBDIR, VIDEO_SUBDIR, MAX_WORKERS, NETWORK_CONCURRENCY, RENDER_CONCURRENCY,
+    STORY_BATCH_SIZE, build_pipeline, generate_story_batch, save_story, wait_for_publishes, wait_for_uploads,
+)
+from job_store import default_store
+from render_profiles import DEFAULT_PROFILE, get_profile
+from upload_handlers import ensure_tiktok_auth, start_auto_refresher
+from tracing import serve_metrics, tracer
+import artifact_store
+
+# ─── Continuous production daemon ──────────────────────────────────────────────
+# One long-lived process instead of one story per invocation: interpreter start,
+# client construction and TikTok auth are paid once. A producer thread keeps a
+# bounded buffer of finished stories (parts + metadata) ahead of the renderers, so
+# the encoder never idles while gpt-4 is writing. A feeder releases buffered
+# stories into the same staged pipeline `prompt_gen.py` uses, paced to a target
+# number of videos per hour. Backpressure:
+#   • the buffer is bounded, so generation stops when it is full;
+#   • stories are only released while the pipeline's part backlog is below a limit;
+#   • both generation and release pause while free disk space is below a floor.
+# Buffered stories are recorded in the job store, so anything left in the buffer
+# at shutdown is finished by the next daemon (or `prompt_gen.py --resume`).
+
+STORY_BUFFER = int(os.getenv("DAEMON_STORY_BUFFER", 3))
+TARGET_VIDEOS_PER_HOUR = float(os.getenv("DAEMON_VIDEOS_PER_HOUR", 0))   # 0 = as fast as possible
+MAX_BACKLOG = int(os.getenv("DAEMON_MAX_BACKLOG", 2 * RENDER_CONCURRENCY + 2))
+MIN_FREE_DISK = float(os.getenv("DAEMON_MIN_FREE_GB", 5)) * 1024 ** 3
+POLL_INTERVAL = 5
+RETRY_DELAY = 30
+
+# Stages whose queued items are parts that still need rendering.
+RENDER_BACKLOG_STAGES = ("story", "tts", "transcribe", "srt", "render")
+
+
+def free_disk() -> int:
+    return min(shutil.disk_usage(d).free for d in (AUDIO_SUBDIR, VIDEO_SUBDIR))
+
+
+class ProductionDaemon:
+    def __init__(self, rate: float = TARGET_VIDEOS_PER_HOUR, buffer: int = STORY_BUFFER,
+                 workers: int = MAX_WORKERS, profile: str = DEFAULT_PROFILE,
+                 max_backlog: int = MAX_BACKLOG, min_free_disk: float = MIN_FREE_DISK, upload: bool = True):
+        self.rate = rate
+        self.profile = profile
+        self.max_backlog = max_backlog
+        self.min_free_disk = min_free_disk
+        self.buffer = queue.Queue(maxsize=buffer)
+        self.stop = threading.Event()
+        self.stats = {"generated": 0, "released": 0, "videos": 0, "failed": 0}
+        self._stats_lock = threading.Lock()
+        self._uploading = {}   # id -> upload-stage result whose report future is still pending
+        self.pipeline = build_pipeline(upload=upload,
+                                       network_workers=min(workers, NETWORK_CONCURRENCY),
+                                       render_workers=min(workers, RENDER_CONCURRENCY))
+        self.pipeline.on_result = self._on_result
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def _on_result(self, item):
+        self._count("videos")
+        if "report" in item:
+            key = id(item)
+            with self._stats_lock:
+                self._uploading[key] = item
+            item["report"].add_done_callback(lambda _: self._upload_done(key))
+
+    def _upload_done(self, key):
+        with self._stats_lock:
+            self._uploading.pop(key, None)
+
+    # ── backpressure ──
+    def disk_full(self) -> bool:
+        return free_disk() < self.min_free_disk or artifact_store.over_budget()
+
+    def backlogged(self) -> bool:
+        return self.pipeline.backlog(RENDER_BACKLOG_STAGES) >= self.max_backlog
+
+    def _wait_until(self, ready, reason: str):
+        """Sleep until `ready()` or shutdown; returns False on shutdown."""
+        warned = False
+        while not ready():
+            if not warned:
+                print(f"⏸  Paused: {reason}")
+                warned = True
+            if self.stop.wait(POLL_INTERVAL):
+                return False
+        if warned:
+            print(f"▶️  Resumed ({reason} cleared)")
+        return not self.stop.is_set()
+
+    # ── producer: keep the story buffer full ──
+    def _produce_batch(self) -> list:
+        """Generate up to a buffer's worth of stories (with metadata) in one request."""
+        k = max(1, min(STORY_BATCH_SIZE, self.buffer.maxsize))
+        stories = []
+        for story in generate_story_batch(k):
+            base = save_story(story["parts"], story["metadata"])
+            stories.append({"key": base, "base": base, "parts": len(story["parts"]), "profile": self.profile})
+        return stories
+
+    def _producer(self):
+        while not self.stop.is_set():
+            if not self._wait_until(lambda: not self.disk_full(), "low disk space"):
+                return
+            try:
+                stories = self._produce_batch()
+            except Exception as e:
+                print(f"⚠️  Story generation failed: {e}; retrying in {RETRY_DELAY}s")
+                self._count("failed")
+                self.stop.wait(RETRY_DELAY)
+                continue
+            self._count("generated", len(stories))
+            for story in stories:
+                print(f"📚 Buffered story {story['base']} ({self.buffer.qsize() + 1}/{self.buffer.maxsize})")
+                # Blocks while the buffer is full: generation waits for the renderers.
+                while not self.stop.is_set():
+                    try:
+                        self.buffer.put(story, timeout=POLL_INTERVAL)
+                        break
+                    except queue.Full:
+                        continue
+
+    # ── feeder: release buffered stories at the target rate ──
+    def _feeder(self):
+        next_release = time.monotonic()
+        while not self.stop.is_set():
+            try:
+                story = self.buffer.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if not (self._wait_until(lambda: not self.backlogged(), "render backlog full")
+                    and self._wait_until(lambda: not self.disk_full(), "low disk space")):
+                return
+            if self.rate > 0:
+                if self.stop.wait(max(0, next_release - time.monotonic())):
+                    return
+                next_release = max(next_release, time.monotonic()) + story["parts"] * 3600 / self.rate
+            self.pipeline.submit("story", story)
+            self._count("released")
+
+    def _reporter(self):
+        while not self.stop.wait(300):
+            print(f"📈 {self.stats} | buffer {self.buffer.qsize()}/{self.buffer.maxsize} | "
+                  f"backlog {self.pipeline.backlog(RENDER_BACKLOG_STAGES)} | "
+                  f"free {free_disk() / 1024 ** 3:.1f} GB | artifacts {artifact_store.usage() / 1024 ** 3:.1f} GB | "
+                  f"errors {len(self.pipeline.errors)}")
+            tracer.set_gauge("daemon_buffered_stories", self.buffer.qsize())
+            tracer.set_gauge("daemon_backlog_parts", self.pipeline.backlog(RENDER_BACKLOG_STAGES))
+            for key, value in self.stats.items():
+                tracer.set_gauge("daemon_stories_total", value, kind=key)
+            tracer.flush()
+
+    def run(self):
+        get_profile(self.profile)  # fail fast on a typo
+        self.pipeline.start()
+        # Stories buffered (or half-finished) by a previous daemon go first.
+        for base in default_store().incomplete_runs():
+            self.pipeline.submit("story", {"key": base, "base": base, "profile": self.profile})
+        threads = [threading.Thread(target=fn, name=fn.__name__.strip("_"), daemon=True)
+                   for fn in (self._producer, self._feeder, self._reporter)]
+        for t in threads:
+            t.start()
+        rate = f"{self.rate:g} videos/hour" if self.rate > 0 else "unthrottled"
+        print(f"🚀 Daemon running ({rate}, buffer {self.buffer.maxsize}, max backlog {self.max_backlog})")
+        try:
+            while not self.stop.wait(1):
+                pass
+        finally:
+            self.stop.set()
+            for t in threads:
+                t.join()
+            print("🛑 Draining pipeline…")
+            self.pipeline.close("story")
+            self.pipeline.join()
+            with self._stats_lock:
+                pending = list(self._uploading.values())
+            if pending:
+                print(f"⏳ Waiting for {len(pending)} upload(s)…")
+                wait_for_uploads(pending)
+            tracer.flush()
+            print(f"Stopped: {self.stats}")
+
+    def shutdown(self, *_):
+        self.stop.set()
+
+
+def main(rate: float = TARGET_VIDEOS_PER_HOUR, buffer: int = STORY_BUFFER, workers: int = MAX_WORKERS,
+         profile: str = DEFAULT_PROFILE):
+    ensure_tiktok_auth(block=False)   # TikTok uploads wait for the login; rendering doesn't
+    start_auto_refresher()
+    serve_metrics()
+    artifact_store.start_gc()
+    daemon = ProductionDaemon(rate, buffer, workers, profile)
+    signal.signal(signal.SIGTERM, daemon.shutdown)
+    signal.signal(signal.SIGINT, daemon.shutdown)
+    daemon.run()
+    wait_for_publishes()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Produce and upload story videos continuously.")
+    parser.add_argument("--rate", type=float, default=TARGET_VIDEOS_PER_HOUR, help="target videos per hour (0 = unthrottled)")
+    parser.add_argument("--buffer", type=int, default=STORY_BUFFER, help="stories to keep generated ahead of rendering")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="worker threads for TTS and rendering")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, help="render profile (see render_profiles.py)")
+    args = parser.parse_args()
+    main(args.rate, args.buffer, args.workers, args.profile)
@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from fs_utils import sha256_file
+
+# ─── Job manifest ──────────────────────────────────────────────────────────────
+# A small SQLite index of everything a run produces: the story (base id + part
+# texts), every artifact path with its content hash, the per-part metadata and
+# per-platform upload state. Uploads look their metadata up by video path in one
+# indexed query instead of re-parsing the metadata JSON, and a crashed batch can
+# resume by skipping artifacts whose hashes still match and uploads already done.
+# WAL mode + a busy timeout let several worker processes share the file.
+
+JOB_DB = Path(os.getenv("JOB_DB", "jobs.sqlite3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    base        TEXT PRIMARY KEY,
+    created_at  REAL NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'generating',
+    parts_count INTEGER,
+    meta_file   TEXT
+);
+CREATE TABLE IF NOT EXISTS parts (
+    base          TEXT NOT NULL,
+    idx           INTEGER NOT NULL,
+    text          TEXT,
+    status        TEXT NOT NULL DEFAULT 'pending',
+    metadata_json TEXT,
+    updated_at    REAL,
+    PRIMARY KEY (base, idx)
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    path       TEXT PRIMARY KEY,
+    base       TEXT NOT NULL,
+    idx        INTEGER,
+    kind       TEXT NOT NULL,
+    sha256     TEXT,
+    bytes      INTEGER,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS artifacts_part ON artifacts(base, idx, kind);
+CREATE TABLE IF NOT EXISTS uploads (
+    base       TEXT NOT NULL,
+    idx        INTEGER NOT NULL,
+    platform   TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    remote_id  TEXT,
+    error      TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (base, idx, platform)
+);
+CREATE INDEX IF NOT EXISTS uploads_remote ON uploads(platform, remote_id);
+"""
+
+# Upload states that mean "don't upload this again".
+UPLOADED = ("uploaded", "published")
+
+
+class JobStore:
+    def __init__(self, path=JOB_DB):
+        self.path = Path(path)
+        self._local = threading.local()
+        with self._conn() as db:
+            db.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    # ── runs & parts ──
+    def record_run(self, base: str, parts: list = None, status: str = "generating"):
+        with self._conn() as db:
+            db.execute("INSERT OR IGNORE INTO runs (base, created_at, status) VALUES (?, ?, ?)", (base, time.time(), status))
+            if parts is not None:
+                db.execute("UPDATE runs SET parts_count = ? WHERE base = ?", (len(parts), base))
+                for idx, text in enumerate(parts, 1):
+                    self._upsert_part(db, base, idx, text=text)
+
+    def record_part(self, base: str, idx: int, text: str):
+        with self._conn() as db:
+            db.execute("INSERT OR IGNORE INTO runs (base, created_at) VALUES (?, ?)", (base, time.time()))
+            self._upsert_part(db, base, idx, text=text)
+
+    def _upsert_part(self, db, base, idx, **fields):
+        db.execute("INSERT OR IGNORE INTO parts (base, idx, updated_at) VALUES (?, ?, ?)", (base, idx, time.time()))
+        for column, value in fields.items():
+            db.execute(f"UPDATE parts SET {column} = ?, updated_at = ? WHERE base = ? AND idx = ?",
+                       (value, time.time(), base, idx))
+
+    def set_run_status(self, base: str, status: str, **fields):
+        with self._conn() as db:
+            db.execute("UPDATE runs SET status = ? WHERE base = ?", (status, base))
+            for column, value in fields.items():
+                db.execute(f"UPDATE runs SET {column} = ? WHERE base = ?", (value, base))
+
+    def set_part_status(self, base: str, idx: int, status: str):
+        with self._conn() as db:
+            self._upsert_part(db, base, idx, status=status)
+
+    def run_parts(self, base: str) -> list:
+        rows = self._conn().execute("SELECT text FROM parts WHERE base = ? ORDER BY idx", (base,)).fetchall()
+        return [r["text"] for r in rows]
+
+    def complete_parts(self, base: str):
+        """A run's story texts if it was fully generated (parts_count recorded and every part on file), else None."""
+        run = self.run(base)
+        parts = self.run_parts(base)
+        if run is None or not run["parts_count"] or len(parts) != run["parts_count"] or not all(parts):
+            return None
+        return parts
+
+    def reset_run(self, base: str):
+        """Forget a half-generated story (parts, artifact rows, uploads) so it can be generated afresh."""
+        with self._conn() as db:
+            for table in ("parts", "artifacts", "uploads"):
+                db.execute(f"DELETE FROM {table} WHERE base = ?", (base,))
+            db.execute("UPDATE runs SET parts_count = NULL, status = 'generating' WHERE base = ?", (base,))
+
+    def run(self, base: str):
+        return self._conn().execute("SELECT * FROM runs WHERE base = ?", (base,)).fetchone()
+
+    def incomplete_runs(self) -> list:
+        """Runs to resume; 'batch' runs belong to batch_queue.py, which renders and uploads them itself."""
+        return [r["base"] for r in self._conn().execute(
+            "SELECT base FROM runs WHERE status NOT IN ('done', 'expired', 'batch') ORDER BY created_at")]
+
+    # ── metadata ──
+    def record_metadata(self, base: str, entries: list, meta_file=None, first_idx: int = 1):
+        """Per-part metadata in part order from `first_idx`; the model's own "part" field isn't trusted."""
+        with self._conn() as db:
+            for idx, entry in enumerate(entries, first_idx):
+                self._upsert_part(db, base, idx, metadata_json=json.dumps(entry, ensure_ascii=False))
+            if meta_file is not None:
+                db.execute("UPDATE runs SET meta_file = ? WHERE base = ?", (str(meta_file), base))
+
+    def run_metadata(self, base: str) -> list:
+        rows = self._conn().execute(
+            "SELECT metadata_json FROM parts WHERE base = ? AND metadata_json IS NOT NULL ORDER BY idx", (base,))
+        return [json.loads(r["metadata_json"]) for r in rows]
+
+    def part_metadata(self, video_path) -> dict:
+        """Metadata entry for the part a video belongs to, or None if the video is unknown."""
+        row = self._conn().execute(
+            "SELECT p.metadata_json FROM artifacts a JOIN parts p ON p.base = a.base AND p.idx = a.idx "
+            "WHERE a.path = ?", (str(video_path),)).fetchone()
+        return json.loads(row["metadata_json"]) if row and row["metadata_json"] else None
+
+    # ── artifacts ──
+    def record_artifact(self, base: str, idx, kind: str, path, hashed: bool = True):
+        path = Path(path)
+        digest = sha256_file(path) if hashed else None
+        with self._conn() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO artifacts (path, base, idx, kind, sha256, bytes, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (str(path), base, idx, kind, digest, path.stat().st_size, time.time()))
+
+    def artifact(self, base: str, idx, kind: str):
+        return self._conn().execute(
+            "SELECT * FROM artifacts WHERE base = ? AND idx IS ? AND kind = ? ORDER BY created_at DESC LIMIT 1",
+            (base, idx, kind)).fetchone()
+
+    def has_artifact(self, base: str, idx, kind: str, verify: bool = True) -> bool:
+        """True if the artifact exists on disk (and still matches its recorded hash)."""
+        row = self.artifact(base, idx, kind)
+        if not row or not Path(row["path"]).exists():
+            return False
+        if verify and row["sha256"]:
+            return sha256_file(row["path"]) == row["sha256"]
+        return True
+
+    def adopt_video(self, video_path, meta_file=None):
+        """Register a video rendered before the job store existed ("<base>_part<N>.mp4")."""
+        video_path = Path(video_path)
+        base, _, rest = video_path.stem.partition("_part")
+        idx = int("".join(ch for ch in rest if ch.isdigit()) or 0) if rest else None
+        if not base or not idx:
+            return None
+        self.record_run(base, status="rendering")
+        if meta_file is not None and not (self.run(base)["meta_file"]):
+            self.set_run_status(base, "rendering", meta_file=str(meta_file))
+        self.record_artifact(base, idx, "video", video_path, hashed=False)
+        return base, idx
+
+    def run_artifacts(self, base: str, kinds=None) -> list:
+        rows = self._conn().execute("SELECT * FROM artifacts WHERE base = ? ORDER BY idx", (base,)).fetchall()
+        return [r for r in rows if kinds is None or r["kind"] in kinds]
+
+    def drop_artifact(self, path):
+        with self._conn() as db:
+            db.execute("DELETE FROM artifacts WHERE path = ?", (str(path),))
+
+    def artifact_bytes(self, kinds=None) -> int:
+        rows = self._conn().execute("SELECT kind, SUM(bytes) AS total FROM artifacts GROUP BY kind").fetchall()
+        return sum(r["total"] or 0 for r in rows if kinds is None or r["kind"] in kinds)
+
+    def has_runs(self) -> bool:
+        return self._conn().execute("SELECT 1 FROM runs LIMIT 1").fetchone() is not None
+
+    def part_for_video(self, video_path):
+        row = self._conn().execute("SELECT base, idx FROM artifacts WHERE path = ?", (str(video_path),)).fetchone()
+        return (row["base"], row["idx"]) if row else None
+
+    # ── uploads ──
+    def mark_upload(self, base: str, idx: int, platform: str, status: str, remote_id: str = None, error: str = None):
+        with self._conn() as db:
+            db.execute(
+                "INSERT INTO uploads (base, idx, platform, status, remote_id, error, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (base, idx, platform) DO UPDATE SET status = excluded.status, "
+                "remote_id = COALESCE(excluded.remote_id, uploads.remote_id), error = excluded.error, "
+                "updated_at = excluded.updated_at",
+                (base, idx, platform, status, remote_id, error, time.time()))
+
+    def mark_remote(self, platform: str, remote_id: str, status: str, error: str = None):
+        with self._conn() as db:
+            db.execute("UPDATE uploads SET status = ?, error = ?, updated_at = ? WHERE platform = ? AND remote_id = ?",
+                       (status, error, time.time(), platform, remote_id))
+
+    def is_uploaded(self, base: str, idx: int, platform: str) -> bool:
+        row = self._conn().execute(
+            "SELECT status FROM uploads WHERE base = ? AND idx = ? AND platform = ?", (base, idx, platform)).fetchone()
+        return bool(row) and row["status"] in UPLOADED
+
+    def uploaded_runs(self, platforms=("youtube", "tiktok")) -> list:
+        """
+        (base, status, uploaded_at) for runs whose every part is uploaded on every platform,
+        oldest upload first; `uploaded_at` is when the last of those uploads finished.
+        """
+        marks = ",".join("?" * len(platforms))
+        return self._conn().execute(
+            "SELECT r.base, r.status, MAX(u.updated_at) AS uploaded_at, COUNT(*) AS uploaded, "
+            "COALESCE(r.parts_count, (SELECT COUNT(DISTINCT a.idx) FROM artifacts a "
+            "                         WHERE a.base = r.base AND a.kind = 'video')) AS parts "
+            f"FROM runs r JOIN uploads u ON u.base = r.base AND u.platform IN ({marks}) "
+            f"AND u.status IN ({','.join('?' * len(UPLOADED))}) "
+            "GROUP BY r.base HAVING parts > 0 AND uploaded >= parts * ? ORDER BY uploaded_at",
+            (*platforms, *UPLOADED, len(platforms))).fetchall()
+
+    def pending_uploads(self, platforms=("youtube", "tiktok")) -> list:
+        """
+        (video, meta_file, missing_platforms) for rendered parts not yet uploaded everywhere.
+        `video` is the path, or a {variant: path} map when the part was rendered per platform.
+        """
+        from artifact_store import video_variant
+        rows = self._conn().execute(
+            "SELECT a.path, a.base, a.idx, r.meta_file FROM artifacts a JOIN runs r ON r.base = a.base "
+            "WHERE a.kind = 'video' AND r.status != 'batch' ORDER BY r.created_at, a.idx").fetchall()
+        parts = {}
+        for row in rows:
+            if Path(row["path"]).exists():
+                part = parts.setdefault((row["base"], row["idx"]), {"videos": {}, "meta_file": row["meta_file"]})
+                part["videos"][video_variant(row["path"])] = row["path"]
+        pending = []
+        for (base, idx), part in parts.items():
+            missing = [p for p in platforms if not self.is_uploaded(base, idx, p)]
+            if missing:
+                videos = part["videos"]
+                pending.append((videos["default"] if list(videos) == ["default"] else videos, part["meta_file"], missing))
+        return pending
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_store() -> JobStore:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = JobStore()
+        return _default
@@ -0,0 +1,120 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+from fs_utils import file_lock, atomic_write_text
+
+# ─── Content-addressed media cache ────────────────────────────────────────────
+# Stores TTS audio and Whisper segments keyed by a hash of the request inputs, so
+# re-renders and crash recoveries skip the paid API round trips. Entries are
+# written atomically; a cache-wide lock file serialises eviction against reads
+# from other workers and processes. LRU order is tracked through file mtimes,
+# which are bumped on every hit.
+
+CACHE_DIR = Path(os.getenv("MEDIA_CACHE_DIR", ".media_cache"))
+CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+
+def cache_key(**fields) -> str:
+    """Stable hash of the inputs that determine an API response."""
+    blob = json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class MediaCache:
+    def __init__(self, root=CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock_path = self.root / ".lock"
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.root / key[:2] / f"{key}{suffix}"
+
+    # ── files (audio) ──
+    def fetch_file(self, key: str, suffix: str, dest) -> bool:
+        """Copy a cached entry to `dest`; returns False on a miss."""
+        src = self._path(key, suffix)
+        with file_lock(self._lock_path, shared=True):
+            if not src.exists():
+                return False
+            shutil.copyfile(src, dest)
+            os.utime(src)
+        return True
+
+    def store_file(self, key: str, suffix: str, src):
+        dest = self._path(key, suffix)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=dest.parent, suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(src, tmp)
+        with file_lock(self._lock_path, shared=True):
+            os.replace(tmp, dest)
+        self.evict()
+
+    # ── bytes (in-memory PCM audio) ──
+    def get_bytes(self, key: str, suffix: str):
+        path = self._path(key, suffix)
+        with file_lock(self._lock_path, shared=True):
+            if not path.exists():
+                return None
+            data = path.read_bytes()
+            os.utime(path)
+        return data
+
+    def put_bytes(self, key: str, suffix: str, data: bytes):
+        dest = self._path(key, suffix)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=dest.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        with file_lock(self._lock_path, shared=True):
+            os.replace(tmp, dest)
+        self.evict()
+
+    # ── JSON (transcriptions) ──
+    def get_json(self, key: str):
+        path = self._path(key, ".json")
+        with file_lock(self._lock_path, shared=True):
+            if not path.exists():
+                return None
+            data = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)
+        return data
+
+    def put_json(self, key: str, value):
+        path = self._path(key, ".json")
+        with file_lock(self._lock_path, shared=True):
+            atomic_write_text(path, json.dumps(value, ensure_ascii=False))
+        self.evict()
+
+    # ── eviction ──
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits in `max_bytes`."""
+        with file_lock(self._lock_path):
+            entries = []
+            total = 0
+            for p in self.root.glob("*/*"):
+                if p.suffix == ".tmp":
+                    continue
+                st = p.stat()
+                entries.append((st.st_mtime, st.st_size, p))
+                total += st.st_size
+            if total <= self.max_bytes:
+                return
+            for _, size, p in sorted(entries, key=lambda e: e[0]):
+                p.unlink(missing_ok=True)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+
+_default_cache = None
+
+
+def default_cache() -> MediaCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = MediaCache()
+    return _default_cache
@@ -0,0 +1,178 @@
+import os
+import struct
+import subprocess
+from pathlib import Path
+from functools import lru_cache
+from tracing import span
+
+# ─── In-process duration probing ──────────────────────────────────────────────
+# Reads durations straight from container headers so a render doesn't have to
+# fork ffprobe twice per part: MP4/MOV via the moov/mvhd atom, MP3 via the first
+# frame header plus its Xing/Info or VBRI tag (or the CBR bitrate). Anything else
+# falls back to ffprobe. Results are memoized per (path, mtime, size).
+
+_MP4_CONTAINERS = {b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"uuid", b"pdin", b"moof", b"mfra", b"meta"}
+
+_MP3_BITRATES = {
+    (3, 3): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (3, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (3, 1): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 3): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 1): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+# ─── MP4 ───────────────────────────────────────────────────────────────────────
+def _iter_boxes(f, start: int, end: int):
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, kind = struct.unpack(">I4s", header)
+        hdr_len = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            hdr_len = 16
+        elif size == 0:
+            size = end - pos
+        if size < hdr_len:
+            return
+        yield kind, pos + hdr_len, pos + size
+        pos += size
+
+
+def mp4_duration(path) -> float:
+    """Duration from the movie header (mvhd) inside moov; None if not an MP4/MOV."""
+    end = os.path.getsize(path)
+    with open(path, "rb") as f:
+        first = f.read(8)
+        if len(first) < 8 or first[4:8] not in _MP4_CONTAINERS:
+            return None
+        for kind, body, box_end in _iter_boxes(f, 0, end):
+            if kind != b"moov":
+                continue
+            for sub, sbody, _ in _iter_boxes(f, body, box_end):
+                if sub != b"mvhd":
+                    continue
+                f.seek(sbody)
+                version = f.read(4)[0]
+                if version == 1:
+                    _, _, timescale, duration = struct.unpack(">QQIQ", f.read(28))
+                else:
+                    _, _, timescale, duration = struct.unpack(">IIII", f.read(16))
+                if not timescale:
+                    return None
+                return duration / timescale
+    return None
+
+
+# ─── MP3 ───────────────────────────────────────────────────────────────────────
+def _parse_mp3_header(h: bytes):
+    if len(h) < 4 or h[0] != 0xFF or (h[1] & 0xE0) != 0xE0:
+        return None
+    version = (h[1] >> 3) & 3      # 3 = MPEG1, 2 = MPEG2, 0 = MPEG2.5
+    layer = (h[1] >> 1) & 3        # 3 = I, 2 = II, 1 = III
+    br_idx, sr_idx = h[2] >> 4, (h[2] >> 2) & 3
+    if version == 1 or layer == 0 or br_idx in (0, 15) or sr_idx == 3:
+        return None
+    bitrate = _MP3_BITRATES[(3 if version == 3 else 2, layer)][br_idx] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][sr_idx]
+    padding = (h[2] >> 1) & 1
+    mono = (h[3] >> 6) == 3
+    if layer == 3:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or version == 3) else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    return {"version": version, "layer": layer, "bitrate": bitrate, "sample_rate": sample_rate,
+            "samples": samples, "mono": mono, "length": length}
+
+
+def mp3_duration(path) -> float:
+    """Duration from the Xing/Info or VBRI tag of the first frame, else from the CBR bitrate."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(10)
+        start = 0
+        if head[:3] == b"ID3" and len(head) == 10:
+            tag_size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+            start = 10 + tag_size + (10 if head[5] & 0x10 else 0)
+        f.seek(start)
+        buf = f.read(64 * 1024)
+
+        # Find the first frame header that is followed by another valid header.
+        for i in range(len(buf) - 4):
+            hdr = _parse_mp3_header(buf[i:i + 4])
+            if not hdr or hdr["length"] <= 0:
+                continue
+            nxt = i + hdr["length"]
+            if nxt + 4 <= len(buf) and not _parse_mp3_header(buf[nxt:nxt + 4]):
+                continue
+            break
+        else:
+            return None
+        frame = buf[i:i + hdr["length"] + 64]
+        audio_start = start + i
+
+        if hdr["layer"] == 1:
+            if hdr["version"] == 3:
+                side = 17 if hdr["mono"] else 32
+            else:
+                side = 9 if hdr["mono"] else 17
+            for tag in (b"Xing", b"Info"):
+                if frame[4 + side:8 + side] == tag:
+                    flags = struct.unpack(">I", frame[8 + side:12 + side])[0]
+                    if flags & 1:
+                        frames = struct.unpack(">I", frame[12 + side:16 + side])[0]
+                        return frames * hdr["samples"] / hdr["sample_rate"]
+            if frame[36:40] == b"VBRI":
+                frames = struct.unpack(">I", frame[50:54])[0]
+                return frames * hdr["samples"] / hdr["sample_rate"]
+
+        # No VBR tag: assume constant bitrate, ignoring a trailing ID3v1 tag.
+        f.seek(max(0, size - 128))
+        tail = 128 if f.read(3) == b"TAG" else 0
+        return (size - audio_start - tail) * 8 / hdr["bitrate"]
+
+
+# ─── Public API ────────────────────────────────────────────────────────────────
+def media_duration(path) -> float:
+    """Pure-Python duration reader; returns None for formats it can't handle."""
+    suffix = Path(path).suffix.lower()
+    try:
+        if suffix in (".mp4", ".m4a", ".mov", ".m4v"):
+            return mp4_duration(path)
+        if suffix == ".mp3":
+            return mp3_duration(path)
+    except (OSError, struct.error, IndexError, KeyError, ZeroDivisionError):
+        return None
+    return None
+
+
+def ffprobe_duration(path) -> float:
+    out = subprocess.check_output([
+        "ffprobe", "-v", "error", "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1", str(path)
+    ])
+    return float(out.strip())
+
+
+@lru_cache(maxsize=512)
+def _cached_duration(path: str, mtime_ns: int, size: int) -> float:
+    with span("probe", file=os.path.basename(path)) as s:
+        duration = media_duration(path)
+        if duration is None:
+            s["attrs"]["ffprobe"] = True
+            duration = ffprobe_duration(path)
+    return duration
+
+
+def probe_duration(path) -> float:
+    """Duration in seconds, memoized by path + mtime so background clips are parsed once."""
+    st = os.stat(path)
+    return _cached_duration(str(path), st.st_mtime_ns, st.st_size)
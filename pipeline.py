@@ -0,0 +1,163 @@
+import queue
+import threading
+import traceback
+
+# ─── Stage scheduler ───────────────────────────────────────────────────────────
+# A small dependency-aware scheduler: every stage owns a bounded input queue and
+# a fixed pool of worker threads. Stage functions take one item (a dict) and
+# return/yield zero or more items, which are routed to every downstream stage
+# whose `consumes` kind matches the item's "kind". A full downstream queue blocks
+# the producing worker, which gives per-stage backpressure: a slow encoder stalls
+# the TTS stage instead of letting audio files pile up without bound.
+#
+# Stages with several upstreams and `join=True` hold items until one item with
+# the same "key" has arrived from each upstream, then merge them into one item.
+# `consumes` may also map upstream names to kinds, for a stage that takes a
+# different kind of item from each upstream.
+
+_DONE = object()
+
+
+class Stage:
+    def __init__(self, name, fn, workers=1, maxsize=2, after=(), consumes=None, join=False):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.after = tuple(after)
+        self.consumes = consumes
+        self.join = join
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.downstream = []
+        self._open_upstreams = len(self.after)
+        self._running = workers
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def accepts(self, item, upstream=None):
+        consumes = self.consumes.get(upstream) if isinstance(self.consumes, dict) else self.consumes
+        return consumes is None or item.get("kind") == consumes
+
+
+class Pipeline:
+    def __init__(self, on_result=None):
+        """`on_result(item)` receives sink outputs instead of `.results` (for long-running pipelines)."""
+        self.stages = {}
+        self.errors = []
+        self.results = []
+        self.on_result = on_result
+        self._errors_lock = threading.Lock()
+
+    def add_stage(self, name, fn, workers=1, maxsize=2, after=(), consumes=None, join=False):
+        """Register a stage; `after` names the upstream stages it depends on."""
+        if isinstance(after, str):
+            after = (after,)
+        for up in after:
+            if up not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{up}'")
+        stage = Stage(name, fn, workers, maxsize, after, consumes, join)
+        for up in after:
+            self.stages[up].downstream.append(stage)
+        self.stages[name] = stage
+        return stage
+
+    def submit(self, name, item):
+        """Feed an item into a source stage (blocks while that stage is full)."""
+        self.stages[name].queue.put(item)
+
+    def close(self, name):
+        """Signal that no more items will be submitted to a source stage."""
+        self.stages[name].queue.put(_DONE)
+
+    def start(self):
+        for stage in self.stages.values():
+            for i in range(stage.workers):
+                t = threading.Thread(target=self._worker, args=(stage,), name=f"{stage.name}-{i}", daemon=True)
+                stage._threads.append(t)
+                t.start()
+        return self
+
+    def join(self):
+        """Wait for every stage to drain; returns the items emitted by sink stages."""
+        for stage in self.stages.values():
+            for t in stage._threads:
+                t.join()
+        return self.results
+
+    def backlog(self, names=None) -> int:
+        """Items queued (not yet picked up) across the given stages, or all stages."""
+        names = self.stages if names is None else names
+        return sum(self.stages[n].queue.qsize() for n in names)
+
+    def run(self, source, items):
+        """Convenience: start, feed `items` into `source`, close it and wait."""
+        self.start()
+        for item in items:
+            self.submit(source, item)
+        self.close(source)
+        return self.join()
+
+    # ── internals ──
+    def _worker(self, stage):
+        while True:
+            item = stage.queue.get()
+            if item is _DONE:
+                # Let sibling workers see the sentinel too, then exit.
+                stage.queue.put(_DONE)
+                break
+            try:
+                out = stage.fn(item)
+                if out is None:
+                    continue
+                if isinstance(out, dict):
+                    out = (out,)
+                for produced in out:
+                    self._emit(stage, produced)
+            except Exception as e:
+                with self._errors_lock:
+                    self.errors.append((stage.name, item, e))
+                print(f"⚠️  Stage '{stage.name}' failed on {item.get('key')}: {e}")
+                traceback.print_exc()
+        with stage._lock:
+            stage._running -= 1
+            last = stage._running == 0
+        if last:
+            for down in stage.downstream:
+                self._upstream_closed(down)
+
+    def _emit(self, stage, item):
+        if not stage.downstream:
+            if self.on_result is not None:
+                self.on_result(item)
+                return
+            with self._errors_lock:
+                self.results.append(item)
+            return
+        for down in stage.downstream:
+            if not down.accepts(item, stage.name):
+                continue
+            routed = self._joined(down, stage, item) if down.join else item
+            if routed is not None:
+                down.queue.put(routed)
+
+    def _joined(self, down, upstream, item):
+        with down._lock:
+            slot = down._pending.setdefault(item["key"], {})
+            slot[upstream.name] = item
+            if len(slot) < len(down.after):
+                return None
+            del down._pending[item["key"]]
+        merged = {}
+        for name in down.after:
+            merged.update(slot[name])
+        merged["kind"] = down.name
+        return merged
+
+    def _upstream_closed(self, stage):
+        with stage._lock:
+            stage._open_upstreams -= 1
+            done = stage._open_upstreams == 0
+        if done:
+            if stage._pending:
+                print(f"⚠️  Stage '{stage.name}' dropped {len(stage._pending)} incomplete joins")
+            stage.queue.put(_DONE)
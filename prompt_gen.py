@@ -1,17 +1,64 @@
+import io
 import os
 import uuid
 import json
+import wave
+import hashlib
 import random
+import functools
+import itertools
+import argparse
+import threading
 import subprocess
 from pathlib import Path
 from dotenv import load_dotenv
-from openai import OpenAI
-from elevenlabs.client import ElevenLabs
-from upload_handlers import ensure_tiktok_auth, start_auto_refresher, upload_tiktok, upload_youtube_short
+from pipeline import Pipeline
+from rate_limit import limited
+import tracing
+from tracing import run_ffmpeg, serve_metrics, span, traced, traced_iter
+from stream_json import ArrayStreamParser
+from fs_utils import atomic_write_text, sha256_file
+from job_store import default_store
+import artifact_store
+from artifact_store import AUDIO_SUBDIR, VIDEO_SUBDIR, part_files
+from media_cache import cache_key, default_cache
+from media_probe import probe_duration
+import background_library
+from render_profiles import DEFAULT_PROFILE, encoder_args, get_profile
+from upload_handlers import ensure_tiktok_auth, start_auto_refresher, tiktok_publish_tracker
+from upload_dispatcher import default_dispatcher
 
 load_dotenv()
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-eleven_client = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
+
+# API clients are built on first use (and their SDKs imported then), so importing
+# this module — e.g. from an upload-only worker or a CLI subcommand — stays cheap.
+# `prompt_gen.openai_client` / `prompt_gen.eleven_client` still work via __getattr__.
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_openai_client():
+    with _clients_lock:
+        if "openai" not in _clients:
+            from openai import OpenAI
+            # Retries are handled by rate_limit.py, so the SDK's own retry loop is turned off.
+            # OPENAI_BASE_URL (read by the SDK) can point at a local stand-in (see bench.py).
+            _clients["openai"] = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        return _clients["openai"]
+
+def get_eleven_client():
+    with _clients_lock:
+        if "elevenlabs" not in _clients:
+            from elevenlabs.client import ElevenLabs
+            _clients["elevenlabs"] = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"),
+                                                base_url=os.getenv("ELEVENLABS_BASE_URL") or None)
+        return _clients["elevenlabs"]
+
+def __getattr__(name):
+    if name == "openai_client":
+        return get_openai_client()
+    if name == "eleven_client":
+        return get_eleven_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Configuration
 BACKGROUND_VIDEOS = ["videoplayback.mp4"]
@@ -19,14 +66,49 @@ FONT_NAME = "Arial"
 FONT_SIZE = 20
 MARGIN_V = 50
 MAX_WORDS = 5
-AUDIO_SUBDIR = Path("audio_and_subtitles")
-VIDEO_SUBDIR = Path("videos")
-AUDIO_SUBDIR.mkdir(exist_ok=True)
-VIDEO_SUBDIR.mkdir(exist_ok=True)
+VOICE_ID = "21m00Tcm4TlvDq8ikWAM"
+TTS_MODEL_ID = "eleven_flash_v2_5"
+TTS_OUTPUT_FORMAT = "mp3_44100_128"
+# "pcm" keeps each part's speech in memory as raw 16-bit mono PCM: subtitles are aligned
+# from the samples and the audio is piped into ffmpeg's stdin, so there is no MP3 file,
+# no probe and only one (AAC) encode. ElevenLabs only offers PCM output on paid tiers.
+TTS_AUDIO_MODE = os.getenv("TTS_AUDIO_MODE", "mp3")
+PCM_OUTPUT_FORMAT = "pcm_44100"
+PCM_SAMPLE_RATE = 44100
+USE_MEDIA_CACHE = os.getenv("USE_MEDIA_CACHE", "1") != "0"
+STREAM_GENERATION = os.getenv("STREAM_GENERATION", "1") != "0"
+# "local" aligns the known script against the audio offline; "whisper" always transcribes.
+SUBTITLE_TIMING = os.getenv("SUBTITLE_TIMING", "local")
+# Per-platform output variants for multi-output renders. "default" keeps the
+# original single-profile encode and file naming. A variant named after a platform
+# is what that platform's uploader receives; other platforms get "default".
+RENDER_VARIANTS = {
+    "default": {},
+    "tiktok":  {"maxrate": "6M",  "bufsize": "12M", "audio_bitrate": "128k", "max_duration": 600},
+    "youtube": {"maxrate": "10M", "bufsize": "20M", "audio_bitrate": "192k", "max_duration": 60},
+}
+# Variants every part is rendered to, e.g. "tiktok,youtube" (empty = one default render).
+PLATFORM_VARIANTS = tuple(v for v in os.getenv("PLATFORM_VARIANTS", "").split(",") if v)
+# "1" renders all parts of a story (and all variants) from one background decode, once every
+# part's subtitles are ready; "0" renders each part as soon as it is ready (earlier first upload).
+RENDER_PER_STORY = os.getenv("RENDER_PER_STORY", "1") != "0"
+
+def ensure_output_dirs():
+    """Create the output directories; called by every entry point that writes into them."""
+    AUDIO_SUBDIR.mkdir(exist_ok=True)
+    VIDEO_SUBDIR.mkdir(exist_ok=True)
+
+# Concurrency: network-bound steps (TTS, Whisper) and CPU-bound ffmpeg renders
+# get separate limits so parallel parts don't oversubscribe the encoder cores.
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", 4))
+NETWORK_CONCURRENCY = int(os.getenv("NETWORK_CONCURRENCY", 6))
+RENDER_CONCURRENCY = int(os.getenv("RENDER_CONCURRENCY", max(1, (os.cpu_count() or 2) // 4)))
+NETWORK_SLOTS = threading.BoundedSemaphore(NETWORK_CONCURRENCY)
+RENDER_SLOTS = threading.BoundedSemaphore(RENDER_CONCURRENCY)
 
 # 1) Prompt definitions
-def generate_story_parts(model="gpt-4"):
-    prompt = (
+# The story brief without its output format, shared with the batched prompt.
+STORY_BRIEF = (
         """
             Create an irresistibly addictive micro-epic that grabs readers by the throat and refuses to let go. Set your tale in the blood-soaked world of ancient myth—Rome's marble halls, Viking longships cutting through storm-dark seas, or beneath the shadow of Greek temples where gods walk among mortals.
 
@@ -51,6 +133,11 @@ def generate_story_parts(model="gpt-4"):
             - Use specific, relatable motivations: protecting loved ones, keeping promises, seeking justice
             - The reader should feel like they're living this nightmare, not just watching it
 
+        """
+)
+
+STORY_FORMAT = (
+        """
             Output as pure JSON with no additional text:
             {"parts":[
             "Part 1 text that makes readers' hearts race...",
@@ -58,22 +145,31 @@ def generate_story_parts(model="gpt-4"):
             "Part 3 text that leaves them desperate for more..."
             ]}
         """
-    )
-    resp = openai_client.chat.completions.create(
+)
+
+STORY_PROMPT = STORY_BRIEF + STORY_FORMAT
+
+def story_prompt(brief: str = None) -> str:
+    """STORY_PROMPT, with a job's own story idea (e.g. a batch job's "prompt") added before the output format."""
+    if not brief:
+        return STORY_PROMPT
+    return STORY_BRIEF + f"""
+            THIS STORY: {brief.strip()}
+""" + STORY_FORMAT
+
+@traced("story")
+def generate_story_parts(model="gpt-4", prompt: str = None, seed: int = None):
+    """`prompt` is a story idea added to STORY_PROMPT (see story_prompt); `seed` makes sampling repeatable."""
+    prompt = story_prompt(prompt)
+    resp = limited("openai", "chat", get_openai_client().chat.completions.create,
         model=model,
-        messages=[{"role": "user", "content": prompt}]
+        messages=[{"role": "user", "content": prompt}],
+        **({"seed": seed} if seed is not None else {})
     )
     data = json.loads(resp.choices[0].message.content)
     return data['parts']
 
 # 2) Utilities
-def probe_duration(path: Path) -> float:
-    out = subprocess.check_output([
-        "ffprobe", "-v", "error", "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1", str(path)
-    ])
-    return float(out.strip())
-
 def fmt_ts(t: float) -> str:
     h, rem = divmod(int(t), 3600)
     m, s = divmod(rem, 60)
@@ -81,60 +177,236 @@ def fmt_ts(t: float) -> str:
     return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
 
 # 3) Process part: TTS, SRT, video creation
-def process_part(text: str, idx: int, base: str):
-    audio_file = AUDIO_SUBDIR / f"{base}_part{idx}.mp3"
-    srt_file = AUDIO_SUBDIR / f"{base}_part{idx}.srt"
-    video_file = VIDEO_SUBDIR / f"{base}_part{idx}.mp4"
-
-    # TTS
-    stream = eleven_client.text_to_speech.convert(text=text, voice_id="21m00Tcm4TlvDq8ikWAM", model_id="eleven_flash_v2_5", output_format="mp3_44100_128")
-    with open(audio_file, "wb") as f:
+@traced("tts")
+def synthesize_speech(text: str, audio_file: Path) -> Path:
+    key = cache_key(kind="tts", text=text, voice_id=VOICE_ID, model_id=TTS_MODEL_ID, output_format=TTS_OUTPUT_FORMAT)
+    if USE_MEDIA_CACHE and default_cache().fetch_file(key, ".mp3", audio_file):
+        return audio_file
+    def download():
+        # The SDK streams lazily, so the whole download is one retryable unit.
+        stream = get_eleven_client().text_to_speech.convert(text=text, voice_id=VOICE_ID, model_id=TTS_MODEL_ID, output_format=TTS_OUTPUT_FORMAT)
+        with open(audio_file, "wb") as f:
+            for chunk in stream:
+                f.write(chunk)
+    with NETWORK_SLOTS:
+        limited("elevenlabs", "tts", download)
+    if USE_MEDIA_CACHE:
+        default_cache().store_file(key, ".mp3", audio_file)
+    return audio_file
+
+@traced("tts")
+def synthesize_pcm(text: str) -> bytes:
+    """Speech for `text` as raw 16-bit mono PCM at PCM_SAMPLE_RATE, kept in memory."""
+    key = cache_key(kind="tts", text=text, voice_id=VOICE_ID, model_id=TTS_MODEL_ID, output_format=PCM_OUTPUT_FORMAT)
+    if USE_MEDIA_CACHE:
+        cached = default_cache().get_bytes(key, ".pcm")
+        if cached is not None:
+            return cached
+    def download():
+        stream = get_eleven_client().text_to_speech.convert(text=text, voice_id=VOICE_ID, model_id=TTS_MODEL_ID, output_format=PCM_OUTPUT_FORMAT)
+        buf = bytearray()
         for chunk in stream:
-            f.write(chunk)
-
-    # WHISPER transcription
-    transcription = openai_client.audio.transcriptions.create(
-        file=open(audio_file, "rb"), model="whisper-1", response_format="verbose_json", temperature=0
-    )
-    segments = transcription.segments
-
-    # Re-chunk
+            buf += chunk
+        return bytes(buf[:len(buf) - len(buf) % 2])   # whole samples only
+    with NETWORK_SLOTS:
+        pcm = limited("elevenlabs", "tts", download)
+    if USE_MEDIA_CACHE:
+        default_cache().put_bytes(key, ".pcm", pcm)
+    return pcm
+
+def pcm_duration(pcm: bytes, sample_rate: int = PCM_SAMPLE_RATE) -> float:
+    return len(pcm) / (2 * sample_rate)
+
+def pcm_to_wav(pcm: bytes, sample_rate: int = PCM_SAMPLE_RATE) -> bytes:
+    """A WAV container around in-memory PCM, for APIs that need a file (Whisper)."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(pcm)
+    return buf.getvalue()
+
+def transcribe_segments(audio_file: Path = None, wav: bytes = None) -> list:
+    """Whisper segments for an audio file, or for in-memory WAV bytes."""
+    audio_hash = hashlib.sha256(wav).hexdigest() if wav is not None else sha256_file(audio_file)
+    key = cache_key(kind="whisper", audio=audio_hash, model="whisper-1", response_format="verbose_json", temperature=0)
+    if USE_MEDIA_CACHE:
+        cached = default_cache().get_json(key)
+        if cached is not None:
+            return cached
+    def transcribe():
+        if wav is not None:
+            return get_openai_client().audio.transcriptions.create(
+                file=("speech.wav", wav), model="whisper-1", response_format="verbose_json", temperature=0
+            )
+        # Reopen per attempt: a failed upload leaves the previous handle at EOF.
+        with open(audio_file, "rb") as af:
+            return get_openai_client().audio.transcriptions.create(
+                file=af, model="whisper-1", response_format="verbose_json", temperature=0
+            )
+    with NETWORK_SLOTS:
+        transcription = limited("openai", "whisper", transcribe)
+    segments = [{"start": seg.start, "end": seg.end, "text": seg.text} for seg in transcription.segments]
+    if USE_MEDIA_CACHE:
+        default_cache().put_json(key, segments)
+    return segments
+
+@traced("transcription")
+def subtitle_segments(text: str, audio_file: Path = None, pcm: bytes = None) -> list:
+    """
+    Segments for the SRT: offline alignment of the known script, Whisper as the fallback.
+    With `pcm` (in-memory speech) the samples are aligned directly instead of decoding a file.
+    """
+    if SUBTITLE_TIMING == "local":
+        import alignment  # pulls in NumPy; only needed once a part is being timed
+        try:
+            if pcm is not None:
+                return alignment.align_pcm(text, pcm, PCM_SAMPLE_RATE)
+            return alignment.align_file(text, audio_file)
+        except (alignment.AlignmentError, subprocess.CalledProcessError, FileNotFoundError) as e:
+            print(f"Local alignment failed ({e}); falling back to Whisper")
+    if pcm is not None:
+        return transcribe_segments(wav=pcm_to_wav(pcm))
+    return transcribe_segments(audio_file)
+
+def rechunk_segments(segments: list, max_words: int = MAX_WORDS) -> list:
     new_segments = []
     for seg in segments:
-        words = seg.text.split()
+        if seg.get("words"):
+            # Word timings are known: cut chunks on real word boundaries.
+            timed = seg["words"]
+            for i in range(0, len(timed), max_words):
+                group = timed[i:i + max_words]
+                new_segments.append({"start": group[0]["start"], "end": group[-1]["end"],
+                                     "text": " ".join(w["word"] for w in group)})
+            continue
+        words = seg["text"].split()
         if not words: continue
-        group_count = (len(words) + MAX_WORDS - 1) // MAX_WORDS
-        dur = (seg.end - seg.start) / group_count
+        group_count = (len(words) + max_words - 1) // max_words
+        dur = (seg["end"] - seg["start"]) / group_count
         for i in range(group_count):
-            start = seg.start + i * dur
+            start = seg["start"] + i * dur
             end = start + dur
-            chunk_txt = " ".join(words[i*MAX_WORDS:(i+1)*MAX_WORDS])
+            chunk_txt = " ".join(words[i*max_words:(i+1)*max_words])
             new_segments.append({"start": start, "end": end, "text": chunk_txt})
+    return new_segments
 
-    # Write SRT
+@traced("srt")
+def write_srt(segments: list, srt_file: Path) -> Path:
     with open(srt_file, "w", encoding="utf-8") as sf:
-        for i, seg in enumerate(new_segments, 1):
+        for i, seg in enumerate(segments, 1):
             sf.write(f"{i}\n{fmt_ts(seg['start'])} --> {fmt_ts(seg['end'])}\n{seg['text']}\n\n")
+    return srt_file
 
-    # Video render
-    audio_dur = probe_duration(audio_file)
+def pick_background(duration: float):
+    """(background path, start offset): an indexed keyframe from the library, else a random raw offset."""
+    segment = background_library.pick_segment(duration)
+    if segment:
+        return str(segment[0]), segment[1]
     bg = random.choice(BACKGROUND_VIDEOS)
     bg_dur = probe_duration(bg)
-    start_at = random.uniform(0, max(0, bg_dur - audio_dur))
-    filter_str = (
+    return bg, random.uniform(0, max(0, bg_dur - duration))
+
+def subtitle_filter(srt_file: Path) -> str:
+    return (
         f"subtitles='{srt_file}':force_style='FontName={FONT_NAME},"
         f"FontSize={FONT_SIZE},PrimaryColour=&HFFFFFF&,MarginV={MARGIN_V}'"
     )
-    cmd = ["ffmpeg", "-ss", str(start_at), "-i", bg, "-i", str(audio_file), "-t", str(audio_dur),
-           "-map", "0:v", "-map", "1:a", "-c:v", "libx264", "-c:a", "aac", "-vf", filter_str, str(video_file)]
-    subprocess.run(cmd, check=True)
+
+def variant_args(variant: str, profile: str = None) -> list:
+    """Profile encoder settings with the variant's rate caps and audio bitrate layered on top."""
+    spec = RENDER_VARIANTS[variant]
+    args = encoder_args(profile)
+    if "audio_bitrate" in spec:
+        args[args.index("-b:a") + 1] = spec["audio_bitrate"]
+    if "maxrate" in spec:
+        args += ["-maxrate", spec["maxrate"], "-bufsize", spec["bufsize"]]
+    return args
+
+def check_variants(variants) -> tuple:
+    unknown = [v for v in variants if v not in RENDER_VARIANTS]
+    if unknown:
+        raise KeyError(f"Unknown render variant(s) {', '.join(unknown)} (have: {', '.join(RENDER_VARIANTS)})")
+    return tuple(variants)
+
+def variant_path(base: str, idx: int, variant: str) -> Path:
+    suffix = "" if variant == "default" else f"_{variant}"
+    return part_files(base, idx, suffix)["video_file"]
+
+def _audio_input(audio_file: Path, pcm: bytes = None):
+    """(duration, ffmpeg input args) for a part's speech: stdin PCM or an audio file."""
+    if pcm is not None:
+        return pcm_duration(pcm), ["-f", "s16le", "-ar", str(PCM_SAMPLE_RATE), "-ac", "1", "-i", "pipe:0"]
+    return probe_duration(audio_file), ["-i", str(audio_file)]
+
+def render_video(audio_file: Path, srt_file: Path, video_file: Path, profile: str = None, pcm: bytes = None) -> Path:
+    """
+    Burn the subtitles onto a background stretch as long as the audio. With `pcm`, the
+    in-memory speech is piped to ffmpeg's stdin and its length comes from the sample count.
+    The SRT must already exist: the subtitles filter reads it when ffmpeg starts.
+    """
+    audio_dur, audio_input = _audio_input(audio_file, pcm)
+    bg, start_at = pick_background(audio_dur)
+    cmd = ["ffmpeg", "-y", "-ss", str(start_at), "-i", bg, *audio_input, "-t", str(audio_dur),
+           "-map", "0:v", "-map", "1:a", *encoder_args(profile), "-vf", subtitle_filter(srt_file), str(video_file)]
+    with RENDER_SLOTS, span("render", video=video_file.name, profile=profile):
+        run_ffmpeg(cmd, audio_dur, label=video_file.stem, stdin_data=pcm)
     return video_file
 
-# 4) Metadata generation
-def generate_metadata(parts: list):
-    prompt = f"""
-        You are a social-media growth expert. For each of these video scripts (part 1 to part {len(parts)}), generate optimized metadata for TikTok, Instagram, and YouTube Shorts:
+def render_story(parts: list, base: str, variants=("default",), profile: str = None) -> dict:
+    """
+    Render several parts of one story, each to every variant, from a single decode of one
+    background. Parts occupy consecutive stretches of it: the decoded background is split
+    per part and trimmed, the subtitles are burnt in, and each part is split once more into
+    one encode per variant. `parts` are pipeline part items (idx, audio_file, srt_file and,
+    in PCM mode, pcm); PCM parts are concatenated on ffmpeg's stdin and trimmed apart again.
+    Returns {idx: {variant: video_path}}.
+    """
+    pcm = [p.get("pcm") for p in parts]
+    use_pcm = all(chunk is not None for chunk in pcm)
+    durations = [pcm_duration(c) for c in pcm] if use_pcm else [probe_duration(p["audio_file"]) for p in parts]
+    total = sum(durations)
+    bg, start_at = pick_background(total)
+
+    cmd = ["ffmpeg", "-y", "-ss", str(start_at), "-t", f"{total:.3f}", "-i", bg]
+    if use_pcm:
+        cmd += ["-f", "s16le", "-ar", str(PCM_SAMPLE_RATE), "-ac", "1", "-i", "pipe:0"]
+    else:
+        for part in parts:
+            cmd += ["-i", str(part["audio_file"])]
+
+    n_parts, n_variants = len(parts), len(variants)
+    graph = [f"[0:v]split={n_parts}" + "".join(f"[bg{n}]" for n in range(n_parts))]
+    if use_pcm:
+        graph.append(f"[1:a]asplit={n_parts}" + "".join(f"[pcm{n}]" for n in range(n_parts)))
+    offset = 0.0
+    for n, (part, dur) in enumerate(zip(parts, durations)):
+        graph.append(f"[bg{n}]trim=start={offset:.3f}:duration={dur:.3f},setpts=PTS-STARTPTS,"
+                     f"{subtitle_filter(part['srt_file'])},split={n_variants}"
+                     + "".join(f"[v{n}{v}]" for v in variants))
+        if use_pcm:
+            # A filter output can only be mapped once, so each variant gets its own copy of the audio.
+            graph.append(f"[pcm{n}]atrim=start={offset:.3f}:duration={dur:.3f},asetpts=PTS-STARTPTS,"
+                         f"asplit={n_variants}" + "".join(f"[a{n}{v}]" for v in variants))
+        offset += dur
+    cmd += ["-filter_complex", ";".join(graph)]
+
+    outputs = {}
+    for n, (part, dur) in enumerate(zip(parts, durations)):
+        outputs[part["idx"]] = {}
+        for v in variants:
+            out = variant_path(base, part["idx"], v)
+            limit = min(dur, RENDER_VARIANTS[v].get("max_duration", dur))
+            audio = f"[a{n}{v}]" if use_pcm else f"{n + 1}:a"
+            cmd += ["-map", f"[v{n}{v}]", "-map", audio, "-t", f"{limit:.3f}", *variant_args(v, profile), str(out)]
+            outputs[part["idx"]][v] = out
+    with RENDER_SLOTS, span("render", base=base, parts=n_parts, variants=n_variants, profile=profile):
+        run_ffmpeg(cmd, total, label=base, stdin_data=b"".join(pcm) if use_pcm else None)
+    return outputs
 
+# 4) Metadata generation
+METADATA_BRIEF = """
         1. TikTok:
         • caption (≤150 characters)
         • 5 trending hashtags
@@ -147,7 +419,13 @@ def generate_metadata(parts: list):
         • title (≤60 characters, include "#Shorts")
         • description (≤150 characters, include "#Shorts" & a CTA)
         • 5–10 relevant tags (must include "#Shorts")
+        """
 
+def metadata_prompt(parts: list) -> str:
+    return f"""
+        You are a social-media growth expert. For each of these video scripts (part 1 to part {len(parts)}), generate optimized metadata for TikTok, Instagram, and YouTube Shorts:
+
+{METADATA_BRIEF}
         Return exactly one JSON object with this structure:
 
         {{
@@ -169,46 +447,388 @@ def generate_metadata(parts: list):
         Here are the scripts:
         {json.dumps(parts, indent=2)}
         """
-    resp = openai_client.chat.completions.create(model="gpt-4", messages=[{"role":"user","content":prompt}])
-    return json.loads(resp.choices[0].message.content)
 
-# Main orchestration
-def main():
-    # Ensure TikTok auth is ready
-    ensure_tiktok_auth()
-    start_auto_refresher()
+def number_metadata(metadata: dict) -> dict:
+    """Renumber "videos" entries by position, so a missing or malformed "part" can't break the join with renders."""
+    return {**metadata, "videos": [{**entry, "part": idx} for idx, entry in enumerate(metadata.get("videos", []), 1)]}
 
-    parts = generate_story_parts()
-    print(parts)
-    base = uuid.uuid4().hex
-    video_paths = []
-    for idx, text in enumerate(parts, 1):
-        print(f"Processing part {idx}")
-        video_paths.append(process_part(text, idx, base))
-    
-    metadata = generate_metadata(parts)
-    meta_file = AUDIO_SUBDIR / f"{base}_metadata.json"
-    meta_file.write_text(json.dumps(metadata, ensure_ascii=False, indent=2))
-    print(f"Metadata saved to {meta_file}")
-
-    # Upload videos to platforms
-    for video_path in video_paths:
-        print(f"\nUploading {video_path.name}...")
-        try:
-            print("Uploading to YouTube Shorts...")
-            youtube_response = upload_youtube_short(str(video_path), str(meta_file))
-            print(f"YouTube upload complete! Video ID: {youtube_response['id']}")
-        except Exception as e:
-            print(f"YouTube upload failed: {e}")
+@traced("metadata")
+def generate_metadata(parts: list):
+    prompt = metadata_prompt(parts)
+    resp = limited("openai", "chat", get_openai_client().chat.completions.create, model="gpt-4", messages=[{"role":"user","content":prompt}])
+    return json.loads(resp.choices[0].message.content)
 
-        try:
-            print("Uploading to TikTok...")
-            tiktok_response = upload_tiktok(str(video_path), str(meta_file))
-            print(f"TikTok upload complete! Status: {tiktok_response}")
-        except Exception as e:
-            print(f"TikTok upload failed: {e}")
+# 4b) Batched generation: K stories and their metadata in one request, so bulk runs
+# pay for the prompt template and a round trip once per batch instead of twice per story.
+STORY_BATCH_SIZE = int(os.getenv("STORY_BATCH_SIZE", 4))
 
-if __name__ == '__main__':
-    main()
+def story_batch_prompt(k: int) -> str:
+    return STORY_BRIEF + f"""
+            Write {k} different stories following the brief above — different eras, heroes and betrayals.
+            For every story also write social-media metadata for each of its parts:
+{METADATA_BRIEF}
+            Output as pure JSON with no additional text:
+            {{"stories": [
+              {{"parts": ["Part 1 text...", "Part 2 text...", "Part 3 text..."],
+                "videos": [
+                  {{"part": 1,
+                    "tiktok": {{"caption": "...", "hashtags": ["#…"]}},
+                    "instagram": {{"caption": "...", "hashtags": ["#…"]}},
+                    "youtube_shorts": {{"title": "...", "description": "...", "tags": ["…"]}}}},
+                  …one entry per part…
+                ]}},
+              …{k} stories in total…
+            ]}}
+        """
 
+def _valid_story(story) -> bool:
+    """Three non-empty parts and one metadata entry per part with the fields the uploaders read."""
+    if not isinstance(story, dict):
+        return False
+    parts, videos = story.get("parts"), story.get("videos")
+    if not (isinstance(parts, list) and len(parts) == 3 and all(isinstance(p, str) and p.strip() for p in parts)):
+        return False
+    if not (isinstance(videos, list) and len(videos) == len(parts)):
+        return False
+    for idx, entry in enumerate(videos, 1):
+        if not isinstance(entry, dict):
+            return False
+        entry.setdefault("part", idx)
+        if not (isinstance(entry.get("tiktok"), dict) and isinstance(entry.get("youtube_shorts"), dict)):
+            return False
+    return True
+
+def _request_story_batch(k: int, model: str, seed: int = None) -> list:
+    resp = limited("openai", "chat", get_openai_client().chat.completions.create,
+        model=model,
+        messages=[{"role": "user", "content": story_batch_prompt(k)}],
+        **({"seed": seed} if seed is not None else {})
+    )
+    stories = json.loads(resp.choices[0].message.content)["stories"]
+    valid = [{"parts": s["parts"], "metadata": {"videos": s["videos"]}} for s in stories if _valid_story(s)]
+    if not valid:
+        raise ValueError(f"none of {len(stories)} returned stories passed validation")
+    return valid[:k]
+
+@traced("story_batch")
+def generate_story_batch(k: int = STORY_BATCH_SIZE, model="gpt-4", seed: int = None) -> list:
+    """
+    `k` stories as [{"parts": [...], "metadata": {"videos": [...]}}] from one request.
+    An unparsable or invalid response is retried as two half-size batches (a long batch
+    may be cut off by the token limit); a single story falls back to the two-request path.
+    Stories that fail validation are dropped and the shortfall requested again.
+    """
+    try:
+        stories = _request_story_batch(k, model, seed)
+    except (ValueError, KeyError, TypeError) as e:
+        if k <= 1:
+            print(f"⚠️  Batched story unusable ({e}); generating it the regular way")
+            parts = generate_story_parts(model, seed=seed)
+            return [{"parts": parts, "metadata": generate_metadata(parts)}]
+        half = k // 2
+        print(f"⚠️  Batch of {k} stories unusable ({e}); retrying as {half} + {k - half}")
+        return (generate_story_batch(half, model, seed)
+                + generate_story_batch(k - half, model, None if seed is None else seed + half))
+    if len(stories) < k:
+        missing = k - len(stories)
+        print(f"⚠️  Only {len(stories)}/{k} stories in the batch were valid; requesting {missing} more")
+        stories += generate_story_batch(missing, model, None if seed is None else seed + len(stories))
+    return stories
+
+def save_story(parts: list, metadata: dict, status: str = "buffered") -> str:
+    """Record a pre-generated story and its metadata file; the pipeline then skips both API calls for it."""
+    store = default_store()
+    base = uuid.uuid4().hex
+    store.record_run(base, parts, status=status)
+    meta_file = artifact_store.meta_file(base)
+    metadata = number_metadata(metadata)
+    atomic_write_text(meta_file, json.dumps(metadata, ensure_ascii=False, indent=2))
+    store.record_metadata(base, metadata.get("videos", []), meta_file)
+    return base
+
+def batched_story_jobs(stories: int, batch_size: int = STORY_BATCH_SIZE, profile: str = None):
+    """Pipeline jobs for `stories` new stories, generated `batch_size` at a time; yields as each batch lands."""
+    ensure_output_dirs()
+    remaining = stories
+    while remaining > 0:
+        k = min(batch_size, remaining)
+        batch = generate_story_batch(k)
+        remaining -= len(batch)
+        for story in batch:
+            base = save_story(story["parts"], story["metadata"])
+            yield {"key": base, "base": base, "profile": profile}
+
+# 5) Streaming variants: hand each part / metadata entry downstream as soon as its
+# JSON closes in the token stream, instead of waiting for the whole response.
+def _stream_array(prompt: str, key: str, model: str, seed: int = None):
+    stream = limited("openai", "chat", get_openai_client().chat.completions.create,
+        model=model, messages=[{"role": "user", "content": prompt}], stream=True,
+        **({"seed": seed} if seed is not None else {})
+    )
+    parser = ArrayStreamParser(key)
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield from parser.feed(delta)
+    if parser.count == 0:
+        raise ValueError(f"No '{key}' array in streamed response: {parser.buf[:200]!r}")
+
+def stream_story_parts(model="gpt-4", prompt: str = None, seed: int = None):
+    """Like generate_story_parts, but yields each part as soon as its string closes."""
+    yield from traced_iter("story", _stream_array(story_prompt(prompt), "parts", model, seed), streamed=True)
+
+def stream_metadata(parts: list, model="gpt-4"):
+    """Like generate_metadata, but yields each per-part entry of "videos" as it arrives."""
+    yield from traced_iter("metadata", _stream_array(metadata_prompt(parts), "videos", model), streamed=True)
+
+# Staged pipeline: story → TTS → transcribe → SRT → render, with metadata branching
+# off the story and joining the renders again at the upload stage.
+def _story_stage(job):
+    store = default_store()
+    base = job.get("base") or uuid.uuid4().hex
+    parts = []
+    # A resumed run reuses its recorded story; otherwise streaming hands part 1
+    # to TTS while the LLM is still writing parts 2 and 3.
+    known = store.complete_parts(base) if job.get("base") else None
+    if known:
+        source = known
+    else:
+        if job.get("base") and store.run_parts(base):
+            # Cut off while streaming: the parts on record are only the start of the story.
+            print(f"↻ Story {base} was cut off during generation; discarding its partial parts")
+            artifact_store.discard_run(base, store)
+            store.reset_run(base)
+        store.record_run(base)
+        generate = stream_story_parts if STREAM_GENERATION else generate_story_parts
+        source = generate(prompt=job.get("prompt"), seed=job.get("seed"))
+    for idx, text in enumerate(source, 1):
+        print(f"Story {base} part {idx}: {text}")
+        store.record_part(base, idx, text)
+        parts.append(text)
+        yield {
+            "kind": "part", "key": (base, idx), "base": base, "idx": idx, "text": text,
+            "profile": job.get("profile"),
+            **part_files(base, idx),
+        }
+    store.record_run(base, parts)
+    store.set_run_status(base, "rendering")
+    yield {"kind": "story", "key": base, "base": base, "parts": parts}
+
+def _tts_stage(part):
+    store = default_store()
+    if TTS_AUDIO_MODE == "pcm":
+        # Speech stays in memory and rides along with the part until it is piped into ffmpeg.
+        if store.has_artifact(part["base"], part["idx"], "video"):
+            return {**part, "pcm": None}
+        print(f"Processing part {part['idx']} of {part['base']}")
+        return {**part, "pcm": synthesize_pcm(part["text"])}
+    if store.has_artifact(part["base"], part["idx"], "audio"):
+        return part
+    print(f"Processing part {part['idx']} of {part['base']}")
+    synthesize_speech(part["text"], part["audio_file"])
+    store.record_artifact(part["base"], part["idx"], "audio", part["audio_file"])
+    return part
+
+def _transcribe_stage(part):
+    if default_store().has_artifact(part["base"], part["idx"], "srt"):
+        return {**part, "segments": None}
+    return {**part, "segments": rechunk_segments(subtitle_segments(part["text"], part["audio_file"], part.get("pcm")))}
+
+def _srt_stage(part):
+    if part["segments"] is not None:
+        write_srt(part["segments"], part["srt_file"])
+        default_store().record_artifact(part["base"], part["idx"], "srt", part["srt_file"])
+    return part
+
+def _render_stage(part, variants=()):
+    if variants:
+        return _render_parts(part["base"], [part], variants)
+    store = default_store()
+    if not store.has_artifact(part["base"], part["idx"], "video"):
+        render_video(part["audio_file"], part["srt_file"], part["video_file"], part.get("profile"), part.get("pcm"))
+        store.record_artifact(part["base"], part["idx"], "video", part["video_file"])
+        store.set_part_status(part["base"], part["idx"], "rendered")
+    return {"kind": "video", "key": part["key"], "base": part["base"], "idx": part["idx"], "video_file": part["video_file"]}
+
+def _render_parts(base: str, parts: list, variants=()) -> list:
+    """Render whichever of a story's parts still lack an output in one render_story call; one video item per part."""
+    store = default_store()
+    names = tuple(variants) or ("default",)
+    outputs = {p["idx"]: {v: variant_path(base, p["idx"], v) for v in names} for p in parts}
+    todo = [p for p in parts if not all(path.exists() and store.part_for_video(path)
+                                        for path in outputs[p["idx"]].values())]
+    if todo:
+        outputs.update(render_story(todo, base, names, todo[0].get("profile")))
+        for part in todo:
+            for path in outputs[part["idx"]].values():
+                store.record_artifact(base, part["idx"], "video", path)
+            store.set_part_status(base, part["idx"], "rendered")
+    items = []
+    for part in parts:
+        videos = outputs[part["idx"]]
+        item = {"kind": "video", "key": part["key"], "base": base, "idx": part["idx"],
+                "video_file": videos.get("default") or next(iter(videos.values()))}
+        if variants:
+            item["videos"] = videos   # the dispatcher sends each platform its own variant
+        items.append(item)
+    return items
+
+class StoryRenderer:
+    """
+    Story-level render stage: collects a story's SRT-ready parts (from "srt") until the
+    "story" item (from "story") says how many there are, then renders them all at once.
+    """
+
+    def __init__(self, variants=()):
+        self.variants = variants
+        self._stories = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, item):
+        base = item["base"]
+        with self._lock:
+            slot = self._stories.setdefault(base, {"parts": {}, "count": None})
+            if item["kind"] == "story":
+                slot["count"] = len(item["parts"])
+            else:
+                slot["parts"][item["idx"]] = item
+            if slot["count"] is None or len(slot["parts"]) < slot["count"]:
+                return None
+            del self._stories[base]
+        return _render_parts(base, [slot["parts"][i] for i in sorted(slot["parts"])], self.variants)
+
+    def pending(self) -> list:
+        """Stories still waiting for parts (one failed upstream, or the pipeline stopped early)."""
+        with self._lock:
+            return list(self._stories)
+
+def _metadata_stage(story):
+    store = default_store()
+    base = story["base"]
+    meta_file = artifact_store.meta_file(base)
+    known = store.run_metadata(base)
+    if len(known) == len(story["parts"]) and meta_file.exists():
+        for idx in range(1, len(known) + 1):
+            yield {"kind": "meta", "key": (base, idx), "meta_file": meta_file}
+        return
+    if not STREAM_GENERATION:
+        metadata = number_metadata(generate_metadata(story["parts"]))
+        atomic_write_text(meta_file, json.dumps(metadata, ensure_ascii=False, indent=2))
+        store.record_metadata(base, metadata.get("videos", []), meta_file)
+        print(f"Metadata saved to {meta_file}")
+        for idx in range(1, len(story["parts"]) + 1):
+            yield {"kind": "meta", "key": (base, idx), "meta_file": meta_file}
+        return
+    # Rewrite the file as each entry arrives so part 1 can upload before part 3's metadata exists.
+    # Entries arrive in part order; their position, not the model's "part" field, is the join key.
+    videos = []
+    for idx, entry in enumerate(stream_metadata(story["parts"]), 1):
+        entry = {**entry, "part": idx}
+        videos.append(entry)
+        atomic_write_text(meta_file, json.dumps({"videos": videos}, ensure_ascii=False, indent=2))
+        store.record_metadata(base, [entry], meta_file, first_idx=idx)
+        print(f"Metadata for part {idx} saved to {meta_file}")
+        yield {"kind": "meta", "key": (base, idx), "meta_file": meta_file}
+
+def _upload_finished(job, report_future):
+    store = default_store()
+    run = store.run(job["base"])
+    platforms = default_dispatcher().platforms
+    if run and all(store.is_uploaded(job["base"], idx, p)
+                   for idx in range(1, (run["parts_count"] or 0) + 1) for p in platforms):
+        store.set_run_status(job["base"], "done")
+        artifact_store.notify_uploaded()
+
+def _upload_stage(job):
+    # Hand the video to the dispatcher and move on: a platform that is slow or still
+    # waiting for a login (TikTok) must not back up into the renders. `report` is a
+    # Future resolving to the per-platform report (see wait_for_uploads).
+    report = default_dispatcher().submit(job.get("videos") or job["video_file"], job["meta_file"])
+    report.add_done_callback(lambda f: _upload_finished(job, f))
+    return {**job, "report": report}
+
+def build_pipeline(upload: bool = True, network_workers: int = NETWORK_CONCURRENCY,
+                   render_workers: int = RENDER_CONCURRENCY, variants=PLATFORM_VARIANTS,
+                   per_story: bool = RENDER_PER_STORY) -> Pipeline:
+    """
+    Wire the stages together. Queue sizes bound how much finished audio may wait on the encoder.
+    With `variants`, every part is rendered once per variant and each platform uploads its own.
+    With `per_story`, the render stage waits for all of a story's parts and renders them together.
+    """
+    ensure_output_dirs()
+    variants = check_variants(variants)
+    p = Pipeline()
+    p.add_stage("story", _story_stage, workers=2, maxsize=0)
+    p.add_stage("tts", _tts_stage, workers=network_workers, maxsize=network_workers, after="story", consumes="part")
+    p.add_stage("transcribe", _transcribe_stage, workers=network_workers, maxsize=network_workers, after="tts")
+    p.add_stage("srt", _srt_stage, workers=1, maxsize=render_workers, after="transcribe")
+    if per_story:
+        p.add_stage("render", StoryRenderer(variants), workers=render_workers, maxsize=render_workers,
+                    after=("srt", "story"), consumes={"srt": "part", "story": "story"})
+    else:
+        p.add_stage("render", functools.partial(_render_stage, variants=variants), workers=render_workers,
+                    maxsize=render_workers, after="srt")
+    p.add_stage("metadata", _metadata_stage, workers=2, maxsize=0, after="story", consumes="story")
+    if upload:
+        # Submitting never blocks; the dispatcher enforces per-platform caps.
+        p.add_stage("upload", _upload_stage, workers=1, maxsize=0, after=("render", "metadata"), join=True)
+    return p
+
+def main(stories: int = 1, workers: int = MAX_WORKERS, profile: str = DEFAULT_PROFILE, resume: bool = False,
+         batch_size: int = STORY_BATCH_SIZE, variants=PLATFORM_VARIANTS):
+    # A pending TikTok login doesn't hold up rendering; only TikTok uploads wait for it
+    ensure_tiktok_auth(block=False)
+    start_auto_refresher()
+    serve_metrics()
+    artifact_store.start_gc()
+
+    # Renders, metadata and uploads of finished parts all overlap.
+    pipeline = build_pipeline(network_workers=min(workers, NETWORK_CONCURRENCY),
+                              render_workers=min(workers, RENDER_CONCURRENCY), variants=variants)
+    get_profile(profile)  # fail fast on a typo
+    if stories > 1 and batch_size > 1:
+        # Bulk runs ask for several stories (with metadata) per request; rendering starts with the first batch.
+        jobs = batched_story_jobs(stories, batch_size, profile)
+    else:
+        jobs = [{"key": i, "profile": profile} for i in range(stories)]
+    if resume:
+        # Unfinished runs pick up where they stopped: finished artifacts and uploads are skipped.
+        pending = default_store().incomplete_runs()
+        print(f"Resuming {len(pending)} unfinished run(s)")
+        jobs = itertools.chain([{"key": b, "base": b, "profile": profile} for b in pending], jobs)
+    pipeline.run("story", jobs)
+    if pipeline.errors:
+        print(f"{len(pipeline.errors)} pipeline step(s) failed")
+    renderer = pipeline.stages["render"].fn
+    if isinstance(renderer, StoryRenderer) and renderer.pending():
+        print(f"⚠️  {len(renderer.pending())} story(ies) not rendered: some parts never reached the render stage")
+    wait_for_uploads(pipeline.results)
+    wait_for_publishes()
+    tracing.tracer.flush()
+    print(f"Trace written to {tracing.TRACE_FILE}, metrics to {tracing.METRICS_FILE}")
+
+def wait_for_uploads(results) -> list:
+    """Reports for the upload stage's results, once every platform has finished with them."""
+    return [r["report"].result() for r in results if "report" in r]
+
+
+def wait_for_publishes(timeout: float = None):
+    """Block until TikTok has finished processing every post uploaded by this process."""
+    tracker = tiktok_publish_tracker()
+    if tracker.pending():
+        print(f"Waiting for {tracker.pending()} TikTok publish(es) to finish processing…")
+    return tracker.wait_all(timeout)
 
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate, render and upload brainrot story videos.")
+    parser.add_argument("--stories", type=int, default=None, help="number of new stories to produce (default 1, or 0 with --resume)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="worker threads per story and across stories")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, help="render profile (see render_profiles.py)")
+    parser.add_argument("--resume", action="store_true", help="finish unfinished runs recorded in the job store first")
+    parser.add_argument("--batch-size", type=int, default=STORY_BATCH_SIZE, help="stories generated per LLM request when producing several (1 = one request per story)")
+    parser.add_argument("--variants", default=",".join(PLATFORM_VARIANTS), help="per-platform renders per part, e.g. tiktok,youtube (see RENDER_VARIANTS; empty = one render)")
+    args = parser.parse_args()
+    stories = args.stories if args.stories is not None else (0 if args.resume else 1)
+    main(stories, args.workers, args.profile, args.resume, args.batch_size, tuple(v for v in args.variants.split(",") if v))
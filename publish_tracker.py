@@ -0,0 +1,115 @@
+import time
+import queue
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ─── Asynchronous publish-status tracking ─────────────────────────────────────
+# TikTok keeps processing a post for a while after the bytes are uploaded. Rather
+# than making an upload worker wait, each publish_id is registered here and polled
+# from a single background event loop with exponential backoff. The blocking
+# status requests run on a small bounded thread pool, so a large backlog of
+# outstanding publishes never turns into a flood of concurrent requests.
+# Completion/failure is delivered as an event on `events`, to listeners and an
+# optional per-publish callback, and through the Future returned by `register`.
+
+TERMINAL_STATUSES = {
+    "PUBLISH_COMPLETE": "complete",
+    "SEND_TO_USER_INBOX": "complete",
+    "FAILED": "failed",
+}
+
+
+class PublishTracker:
+    def __init__(self, fetch_status, max_pollers: int = 4, initial_delay: float = 5.0,
+                 max_delay: float = 60.0, timeout: float = 30 * 60):
+        """`fetch_status(publish_id)` performs one blocking status request and returns the status dict."""
+        self.fetch_status = fetch_status
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.events = queue.Queue()
+        self._listeners = []
+        self._pool = ThreadPoolExecutor(max_workers=max_pollers, thread_name_prefix="publish-poll")
+        self._max_pollers = max_pollers
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._started = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._loop is None:
+                threading.Thread(target=self._run_loop, name="publish-tracker", daemon=True).start()
+        self._started.wait()
+        return self
+
+    def _run_loop(self):
+        import asyncio  # deferred: only processes that actually upload start the loop
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._sem = asyncio.Semaphore(self._max_pollers)
+        self._started.set()
+        self._loop.run_forever()
+
+    def register(self, publish_id: str, label: str = None, callback=None):
+        """Start tracking a publish; returns a concurrent Future for its final event."""
+        import asyncio
+        self.start()
+        fut = asyncio.run_coroutine_threadsafe(self._track(publish_id, label, callback), self._loop)
+        with self._lock:
+            self._futures[publish_id] = fut
+        return fut
+
+    def add_listener(self, fn):
+        """Call `fn(event)` for every finished publish (in addition to per-publish callbacks); idempotent."""
+        with self._lock:
+            if fn not in self._listeners:
+                self._listeners.append(fn)
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(1 for f in self._futures.values() if not f.done())
+
+    def wait_all(self, timeout: float = None) -> list:
+        """Block until every registered publish has finished; returns their events."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            futures = list(self._futures.values())
+        results = []
+        for f in futures:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            results.append(f.result(remaining))
+        return results
+
+    async def _track(self, publish_id, label, callback):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        delay = self.initial_delay
+        deadline = loop.time() + self.timeout
+        status = None
+        event = None
+        while loop.time() < deadline:
+            await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+            try:
+                async with self._sem:
+                    status = await loop.run_in_executor(self._pool, self.fetch_status, publish_id)
+            except Exception as e:
+                print(f"⚠️  Status check for {publish_id} failed: {e}")
+                status = {"status": "UNKNOWN", "error": str(e)}
+            outcome = TERMINAL_STATUSES.get((status or {}).get("status"))
+            if outcome:
+                event = {"publish_id": publish_id, "label": label, "event": outcome, "status": status}
+                break
+            delay = min(delay * 2, self.max_delay)
+        if event is None:
+            event = {"publish_id": publish_id, "label": label, "event": "timeout", "status": status}
+        icon = {"complete": "✅", "failed": "❌"}.get(event["event"], "⌛")
+        print(f"{icon} TikTok publish {label or publish_id}: {event['event']} ({(status or {}).get('status')})")
+        self.events.put(event)
+        for fn in self._listeners + ([callback] if callback else []):
+            try:
+                fn(event)
+            except Exception as e:
+                print(f"⚠️  Publish callback failed: {e}")
+        return event
@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import random
+import threading
+
+# ─── Client-side rate limiting & retries ───────────────────────────────────────
+# Every external call goes through a Limiter keyed by (provider, endpoint):
+#   • a token bucket caps the request rate (with a small burst allowance);
+#   • an AIMD concurrency limit grows by ~1 per window of successes and halves on
+#     a 429, so parallel workers settle just under the provider's real limit;
+#   • a 429/503 with Retry-After pauses the whole endpoint, not just the caller;
+#   • transient failures are retried with full-jitter exponential backoff. Calls
+#     marked non-idempotent are only retried when the provider provably did not
+#     act on them (throttled, or the connection never got through).
+# Limits come from DEFAULT_LIMITS, overridable with RATE_LIMITS='{"openai.chat": {"rate": 1}}'.
+
+DEFAULT_LIMITS = {
+    # rate = requests/second, burst = bucket size, concurrency = starting AIMD limit
+    "openai.chat":        {"rate": 2.0,  "burst": 4,  "concurrency": 4,  "max_concurrency": 16},
+    "openai.whisper":     {"rate": 2.0,  "burst": 4,  "concurrency": 4,  "max_concurrency": 16},
+    "elevenlabs.tts":     {"rate": 2.0,  "burst": 4,  "concurrency": 3,  "max_concurrency": 10},
+    "tiktok.oauth":       {"rate": 0.5,  "burst": 2,  "concurrency": 1,  "max_concurrency": 2},
+    "tiktok.init":        {"rate": 0.1,  "burst": 3,  "concurrency": 2,  "max_concurrency": 6},
+    "tiktok.chunk":       {"rate": 10.0, "burst": 10, "concurrency": 4,  "max_concurrency": 16},
+    "tiktok.status":      {"rate": 1.0,  "burst": 4,  "concurrency": 4,  "max_concurrency": 8},
+}
+FALLBACK_LIMIT = {"rate": 5.0, "burst": 5, "concurrency": 4, "max_concurrency": 16}
+MAX_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", 5))
+BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", 1.0))
+BACKOFF_CAP = float(os.getenv("RETRY_BACKOFF_CAP", 60.0))
+
+THROTTLE_STATUSES = {429}
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveConcurrency:
+    """AIMD limit: +1 per `limit` successes, ×0.5 on throttling (at most once per cooldown)."""
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 16, cooldown: float = 2.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, outcome: str):
+        """`outcome` is "ok", "throttled" or "error" (errors leave the limit alone)."""
+        with self._cond:
+            self.in_flight -= 1
+            if outcome == "ok":
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            elif outcome == "throttled":
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = now
+            self._cond.notify_all()
+
+
+class RetryableResponse(Exception):
+    """Raised internally for an HTTP response that should be retried."""
+
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+def parse_retry_after(headers) -> float:
+    """Seconds to wait from Retry-After / retry-after-ms, or None."""
+    if not headers:
+        return None
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def classify(exc):
+    """
+    (retryable, throttled, retry_after, sent) for an exception raised by an SDK or requests.
+    `sent` is False only when the request certainly never reached the provider.
+    """
+    if isinstance(exc, RetryableResponse):
+        response = exc.response
+    else:
+        response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    headers = getattr(response, "headers", None) or getattr(exc, "headers", None)
+    if status is not None:
+        return status in RETRYABLE_STATUSES, status in THROTTLE_STATUSES, parse_retry_after(headers), True
+    name = type(exc).__name__
+    if name in ("ConnectTimeout", "ConnectionRefusedError") or "NewConnectionError" in str(exc):
+        return True, False, None, False
+    if name in ("ConnectionError", "Timeout", "ReadTimeout", "APIConnectionError", "APITimeoutError",
+                "ChunkedEncodingError", "RemoteDisconnected", "ConnectionResetError"):
+        return True, False, None, True
+    return False, False, None, True
+
+
+class Limiter:
+    def __init__(self, name: str, rate: float, burst: float, concurrency: int, max_concurrency: int = 16,
+                 max_attempts: int = MAX_ATTEMPTS):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveConcurrency(concurrency, maximum=max_concurrency)
+        self.max_attempts = max_attempts
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float):
+        """Hold every caller of this endpoint for `seconds` (Retry-After)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _wait_for_pause(self):
+        while True:
+            with self._lock:
+                wait = self._paused_until - time.monotonic()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def call(self, fn, *args, idempotent: bool = True, **kwargs):
+        """
+        Run `fn(*args, **kwargs)` under the limits, retrying transient failures.
+        If `fn` returns an HTTP response with a retryable status, it is retried too;
+        the last such response is returned unchanged once attempts run out.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            self._wait_for_pause()
+            self.bucket.acquire()
+            self.concurrency.acquire()
+            outcome = "error"
+            try:
+                result = fn(*args, **kwargs)
+                status = getattr(result, "status_code", None)
+                if isinstance(status, int) and status in RETRYABLE_STATUSES:
+                    raise RetryableResponse(result)
+                outcome = "ok"
+                return result
+            except Exception as e:
+                retryable, throttled, retry_after, sent = classify(e)
+                if throttled:
+                    outcome = "throttled"
+                # A throttled request was rejected, not executed, so it is safe to repeat.
+                may_retry = retryable and (idempotent or throttled or not sent)
+                if not may_retry or attempt >= self.max_attempts:
+                    if isinstance(e, RetryableResponse):
+                        return e.response
+                    raise
+                delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1)))
+                if retry_after is not None:
+                    delay = retry_after + random.uniform(0, BACKOFF_BASE)
+                    self.pause(retry_after)
+                print(f"↻ {self.name}: {e}; retry {attempt}/{self.max_attempts - 1} in {delay:.1f}s")
+            finally:
+                self.concurrency.release(outcome)
+            time.sleep(delay)
+
+    def request(self, session, method: str, url: str, idempotent: bool = None, **kwargs):
+        """`session.request(method, url, ...)` under the limits; GET/PUT default to idempotent."""
+        if idempotent is None:
+            idempotent = method.upper() in ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+        return self.call(session.request, method, url, idempotent=idempotent, **kwargs)
+
+
+class LimitedSession:
+    """Drop-in for the few `requests.Session` methods we use, routed through one Limiter."""
+
+    def __init__(self, session, limiter_: Limiter, idempotent: bool = None):
+        self.session = session
+        self.limiter = limiter_
+        self.idempotent = idempotent
+
+    def request(self, method, url, **kwargs):
+        return self.limiter.request(self.session, method, url, idempotent=self.idempotent, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+
+def _configured_limits() -> dict:
+    limits = {k: dict(v) for k, v in DEFAULT_LIMITS.items()}
+    overrides = os.getenv("RATE_LIMITS")
+    if overrides:
+        for name, values in json.loads(overrides).items():
+            limits[name] = {**limits.get(name, FALLBACK_LIMIT), **values}
+    return limits
+
+
+_limiters = {}
+_registry_lock = threading.Lock()
+
+
+def limiter(provider: str, endpoint: str) -> Limiter:
+    """The shared Limiter for one provider endpoint (created on first use)."""
+    name = f"{provider}.{endpoint}"
+    with _registry_lock:
+        if name not in _limiters:
+            _limiters[name] = Limiter(name, **_configured_limits().get(name, FALLBACK_LIMIT))
+        return _limiters[name]
+
+
+def limited(provider: str, endpoint: str, fn, *args, idempotent: bool = True, **kwargs):
+    return limiter(provider, endpoint).call(fn, *args, idempotent=idempotent, **kwargs)
+
@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+# ─── Render profiles ───────────────────────────────────────────────────────────
+# Named libx264/AAC settings so a job can trade quality for throughput. Profiles
+# pin an explicit thread count so several encodes can share a CPU-only box
+# without oversubscribing it; `calibrate` measures each one on this machine.
+
+RENDER_PROFILES = {
+    "draft":    {"preset": "ultrafast", "crf": 28, "threads": 2, "tune": "fastdecode", "audio_bitrate": "96k"},
+    "fast":     {"preset": "veryfast",  "crf": 24, "threads": 2, "tune": None,         "audio_bitrate": "128k"},
+    "balanced": {"preset": "medium",    "crf": 22, "threads": 4, "tune": None,         "audio_bitrate": "160k"},
+    "quality":  {"preset": "slow",      "crf": 19, "threads": 4, "tune": "film",       "audio_bitrate": "192k"},
+}
+DEFAULT_PROFILE = os.getenv("RENDER_PROFILE", "balanced")
+
+
+def get_profile(name: str = None) -> dict:
+    name = name or DEFAULT_PROFILE
+    if name not in RENDER_PROFILES:
+        raise KeyError(f"Unknown render profile '{name}' (have: {', '.join(RENDER_PROFILES)})")
+    return RENDER_PROFILES[name]
+
+
+def encoder_args(name: str = None) -> list:
+    """ffmpeg output options for a profile's video and audio encoders."""
+    p = get_profile(name)
+    args = ["-c:v", "libx264", "-preset", p["preset"], "-crf", str(p["crf"]),
+            "-threads", str(p["threads"]), "-pix_fmt", "yuv420p"]
+    if p.get("tune"):
+        args += ["-tune", p["tune"]]
+    args += ["-c:a", "aac", "-b:a", p["audio_bitrate"]]
+    return args
+
+
+# ─── Calibration ───────────────────────────────────────────────────────────────
+def benchmark_profile(name: str, seconds: int = 10, size: str = "1080x1920", rate: int = 30) -> dict:
+    """Encode a synthetic lavfi clip with one profile; returns fps, speed and output size."""
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp) / f"{name}.mp4"
+        cmd = ["ffmpeg", "-y", "-v", "error",
+               "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={rate}:duration={seconds}",
+               "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+               *encoder_args(name), "-shortest", str(out)]
+        t0 = time.perf_counter()
+        subprocess.run(cmd, check=True)
+        elapsed = time.perf_counter() - t0
+        size_bytes = out.stat().st_size
+    frames = seconds * rate
+    return {
+        "profile": name,
+        "fps": frames / elapsed,
+        "speed": seconds / elapsed,
+        "elapsed": elapsed,
+        "bytes": size_bytes,
+        "kbps": size_bytes * 8 / seconds / 1000,
+    }
+
+
+def recommend(results: list, cores: int = None, min_speed: float = 1.0) -> dict:
+    """
+    Pick the highest-quality profile (lowest CRF) that still encodes at least
+    `min_speed`x realtime, and a worker count that fills the cores with it.
+    """
+    cores = cores or os.cpu_count() or 1
+    ok = [r for r in results if r["speed"] >= min_speed] or [max(results, key=lambda r: r["speed"])]
+    best = min(ok, key=lambda r: (RENDER_PROFILES[r["profile"]]["crf"], -r["speed"]))
+    workers = max(1, cores // RENDER_PROFILES[best["profile"]]["threads"])
+    return {"profile": best["profile"], "workers": workers,
+            "videos_per_hour": best["speed"] * workers * 3600 / 35}  # ~35s parts
+
+
+def calibrate(seconds: int = 10, min_speed: float = 1.0) -> dict:
+    results = []
+    print(f"{'profile':<10} {'fps':>8} {'speed':>7} {'kbps':>8}")
+    for name in RENDER_PROFILES:
+        r = benchmark_profile(name, seconds)
+        results.append(r)
+        print(f"{name:<10} {r['fps']:8.1f} {r['speed']:6.2f}x {r['kbps']:8.0f}")
+    rec = recommend(results, min_speed=min_speed)
+    print(f"\n✅ Recommended: RENDER_PROFILE={rec['profile']} RENDER_CONCURRENCY={rec['workers']} "
+          f"(~{rec['videos_per_hour']:.0f} parts/hour on {os.cpu_count()} cores)")
+    return rec
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark render profiles on this machine.")
+    parser.add_argument("--seconds", type=int, default=10, help="length of the synthetic test clip")
+    parser.add_argument("--min-speed", type=float, default=1.0, help="minimum realtime factor per encode")
+    args = parser.parse_args()
+    try:
+        calibrate(args.seconds, args.min_speed)
+    except FileNotFoundError:
+        print("❌ ffmpeg not found on PATH")
+        sys.exit(1)
@@ -0,0 +1,86 @@
+import re
+import json
+
+# ─── Incremental JSON array parsing ───────────────────────────────────────────
+# LLM responses are streamed token by token. ArrayStreamParser watches the text
+# for `"<key>": [` and hands back each element of that array (a string or an
+# object) as soon as it is syntactically complete, without waiting for the rest
+# of the document.
+
+
+class ArrayStreamParser:
+    def __init__(self, key: str):
+        self.key = key
+        self.buf = ""
+        self.done = False
+        self.count = 0
+        self._open = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._pos = None        # scan position once inside the array
+        self._start = None      # start of the element being read
+        self._depth = 0
+        self._in_str = False
+        self._escape = False
+
+    def feed(self, text: str) -> list:
+        """Append streamed text; returns the elements completed by it."""
+        self.buf += text
+        if self.done:
+            return []
+        if self._pos is None:
+            m = self._open.search(self.buf)
+            if not m:
+                return []
+            self._pos = m.end()
+        return self._scan()
+
+    def _scan(self) -> list:
+        out = []
+        buf = self.buf
+        i = self._pos
+        while i < len(buf):
+            c = buf[i]
+            if self._in_str:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_str = False
+                    if self._depth == 0:
+                        out.append(self._finish(i + 1))
+            elif c == '"':
+                if self._depth == 0 and self._start is None:
+                    self._start = i
+                self._in_str = True
+            elif c in "{[":
+                if self._depth == 0 and self._start is None:
+                    self._start = i
+                self._depth += 1
+            elif c in "}]":
+                if self._depth == 0:    # closing bracket of the array itself
+                    self.done = True
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0:
+                    out.append(self._finish(i + 1))
+            elif self._depth == 0 and self._start is None and not c.isspace() and c != ",":
+                # Bare scalars (numbers, true/false/null) end at the next comma or bracket.
+                j = i
+                while j < len(buf) and buf[j] not in ",]" and not buf[j].isspace():
+                    j += 1
+                if j == len(buf):
+                    break
+                self._start = i
+                out.append(self._finish(j))
+                i = j
+                continue
+            i += 1
+        self._pos = i
+        return out
+
+    def _finish(self, end: int):
+        value = json.loads(self.buf[self._start:end])
+        self._start = None
+        self.count += 1
+        return value
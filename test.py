@@ -1,24 +1,20 @@
-import uuid
-import json
 import os
-import subprocess
-import random
 from dotenv import load_dotenv
-from openai import OpenAI
-from elevenlabs.client import ElevenLabs
 from pathlib import Path
 from upload_handlers import (
     ensure_tiktok_auth,
     start_auto_refresher,
-    upload_youtube_short,
-    upload_tiktok
+    tiktok_publish_tracker,
 )
+from upload_dispatcher import dispatch_uploads
+from job_store import default_store
+import artifact_store
 
 # ─── Load environment variables ────────────────────────
-load_dotenv()  # expects .env with OPENAI_API_KEY & ELEVENLABS_API_KEY
+load_dotenv()  # expects .env with YOUTUBE_CLIENT_SECRETS_FILE and the TikTok credentials
 
-def upload_all_videos():
-    """Upload all videos from the videos directory to YouTube and TikTok."""
+def upload_all_videos(scan: bool = False):
+    """Upload every rendered video that isn't on YouTube and TikTok yet."""
     # Setup paths
     videos_dir = Path("videos")
     metadata_dir = Path("audio_and_subtitles")
@@ -37,13 +33,28 @@ def upload_all_videos():
         print("Please check that the path in your .env file is correct.")
         return
 
-    # Get all video files first
-    video_files = sorted(videos_dir.glob("*.mp4"))
-    if not video_files:
-        print("❌ No video files found in videos directory!")
+    # Videos still missing an upload come from the job store; the directory is only
+    # scanned to import videos rendered before the store existed (or with --scan).
+    store = default_store()
+    if scan or not store.has_runs():
+        # Flat files from before per-run directories, and videos/<base>/ from after.
+        for video_path in sorted([*videos_dir.glob("*.mp4"), *videos_dir.glob("*/*.mp4")]):
+            if store.part_for_video(video_path) is None:
+                uuid = video_path.name.split('_part')[0]
+                metadata_file = metadata_dir / uuid / f"{uuid}_metadata.json"
+                if not metadata_file.exists():
+                    metadata_file = metadata_dir / f"{uuid}_metadata.json"
+                if not metadata_file.exists():
+                    print(f"\n⚠️  No metadata found for {video_path.name}, skipping...")
+                    continue
+                store.adopt_video(video_path, metadata_file)
+
+    jobs = [(video, meta) for video, meta, _ in store.pending_uploads()]
+    if not jobs:
+        print("✅ Nothing to upload: every recorded video is already on all platforms")
         return
         
-    print(f"\n📁 Found {len(video_files)} video files to process")
+    print(f"\n📁 Found {len(jobs)} videos still to upload")
 
     # Ensure TikTok authentication is ready
     try:
@@ -61,43 +72,30 @@ def upload_all_videos():
         print("4. Run the script again and follow the authentication steps carefully")
         return
 
-    # Process each video
-    for video_path in video_files:
-        # Extract the UUID from the video filename (everything before _part)
-        uuid = video_path.name.split('_part')[0]
-        
-        # Find corresponding metadata file
-        metadata_file = metadata_dir / f"{uuid}_metadata.json"
-        
-        if not metadata_file.exists():
-            print(f"\n⚠️  No metadata found for {video_path.name}, skipping...")
-            continue
+    # Upload every video to both platforms concurrently; one failure doesn't stop the rest
+    print(f"\n📤 Uploading {len(jobs)} videos...")
+    reports = dispatch_uploads(jobs)
 
-        print(f"\n📤 Processing {video_path.name}...")
+    # Uploads return once the bytes are sent; collect TikTok's processing outcome
+    publish_events = tiktok_publish_tracker().wait_all()
+    print(f"TikTok processing: {sum(e['event'] == 'complete' for e in publish_events)}/{len(publish_events)} published")
+    # Fully uploaded runs drop their intermediates now (and old finals, per retention).
+    artifact_store.collect()
 
-        try:
-            print("\nUploading to TikTok...")
-            # Verify token before upload
-            token_store = Path.home() / '.tiktok_token.json'
-            if not token_store.exists():
-                raise Exception("Token file not found! Please authenticate again.")
-                
-            token_data = json.loads(token_store.read_text())
-            print(f"Using access token: {token_data['access_token'][:20]}...")
-            
-            tiktok_response = upload_tiktok(str(video_path), str(metadata_file))
-            print(f"✅ TikTok upload complete! Status: {tiktok_response}")
-        except Exception as e:
-            print(f"\n❌ TikTok upload failed: {e}")
-            print("\nTo fix this:")
-            print("1. Delete ~/.tiktok_token.json")
-            print("2. Run the script again to re-authenticate")
-            print("3. Make sure to:")
-            print("   - Complete the TikTok authentication in the browser")
-            print("   - Copy the ENTIRE token data (including { and })")
-            print("   - Paste it correctly in the terminal")
-            print("   - Press Ctrl+D (Mac/Linux) or Ctrl+Z (Windows) followed by Enter")
-            return  # Stop processing if TikTok auth fails
+    failed = {platform: [r["video"] for r in reports if not r[platform]["ok"]] for platform in ("youtube", "tiktok")}
+    print(f"\n✅ Done: {len(reports)} videos, "
+          f"{len(failed['youtube'])} YouTube failures, {len(failed['tiktok'])} TikTok failures")
+    if failed["tiktok"]:
+        print("\nIf TikTok keeps failing:")
+        print("1. Delete ~/.tiktok_token.json")
+        print("2. Run the script again to re-authenticate")
+        print("3. Make sure to:")
+        print("   - Complete the TikTok authentication in the browser")
+        print("   - Copy the ENTIRE token data (including { and })")
+        print("   - Paste it correctly in the terminal")
+        print("   - Press Ctrl+D (Mac/Linux) or Ctrl+Z (Windows) followed by Enter")
+    return reports
 
 if __name__ == "__main__":
-    upload_all_videos()
+    import sys
+    upload_all_videos(scan="--scan" in sys.argv)
@@ -0,0 +1,26 @@
+import sys
+import threading
+from pathlib import Path
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+# The modules live flat in the repository root.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def fake_server():
+    """Start a local HTTP server for a BaseHTTPRequestHandler subclass; returns its base URL."""
+    servers = []
+
+    def start(handler) -> str:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
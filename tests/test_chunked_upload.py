@@ -0,0 +1,77 @@
+import os
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+import chunked_upload
+from chunked_upload import MAX_CHUNK, MAX_CHUNKS, MAX_FINAL_CHUNK, MIN_CHUNK, chunk_ranges, plan_chunks
+
+MB = 1024 * 1024
+
+
+def test_small_files_go_up_whole():
+    assert plan_chunks(3 * MB) == (3 * MB, 1)
+
+
+def test_remainder_goes_into_the_final_chunk():
+    size = 25 * MB + 123
+    chunk_size, count = plan_chunks(size, 10 * MB)
+    assert (chunk_size, count) == (10 * MB, 2)
+    assert chunk_ranges(size, chunk_size, count) == [(0, 10 * MB - 1), (10 * MB, size - 1)]
+
+
+@pytest.mark.parametrize("size", [5 * MB, 64 * MB + 1, 700 * MB + 17, 20 * 1024 * MB])
+def test_plans_follow_tiktok_rules(size):
+    chunk_size, count = plan_chunks(size, 10 * MB)
+    ranges = chunk_ranges(size, chunk_size, count)
+    assert MIN_CHUNK <= chunk_size <= MAX_CHUNK
+    assert 1 <= count <= MAX_CHUNKS
+    assert ranges[0][0] == 0 and ranges[-1][1] == size - 1
+    assert ranges[-1][1] - ranges[-1][0] + 1 <= MAX_FINAL_CHUNK
+
+
+def test_upload_resumes_after_a_failed_chunk(tmp_path, fake_server):
+    """The second chunk is rejected once; the retry sends only that chunk and the file arrives intact."""
+    received, failures = {}, {"left": 1}
+
+    class Upload(BaseHTTPRequestHandler):
+        def do_PUT(self):
+            first = int(self.headers["Content-Range"].split()[1].split("-")[0])
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            if first > 0 and failures["left"]:
+                failures["left"] -= 1
+                self.send_response(500)
+            else:
+                received[first] = body
+                self.send_response(206 if first == 0 else 201)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    video = tmp_path / "clip_part1.mp4"
+    video.write_bytes(os.urandom(2500))
+    url = fake_server(Upload) + "/upload"
+    state = chunked_upload.new_state(video, "pub-1", url, chunk_size=1000, count=2)
+
+    with pytest.raises(requests.HTTPError):
+        chunked_upload.upload_chunks(video, state)
+    resumed = chunked_upload.load_state(video)
+    assert resumed["next_chunk"] == 1 and resumed["publish_id"] == "pub-1"
+    assert list(received) == [0]
+
+    chunked_upload.upload_chunks(video, resumed)
+    assert list(received) == [0, 1000]
+    assert received[0] + received[1000] == video.read_bytes()
+    assert not chunked_upload.state_path(video).exists()
+
+
+def test_stale_state_is_discarded(tmp_path):
+    video = tmp_path / "clip_part1.mp4"
+    video.write_bytes(b"x" * 100)
+    chunked_upload.new_state(video, "pub-1", "http://unused", chunk_size=100, count=1)
+    video.write_bytes(b"y" * 200)   # re-rendered: size and mtime changed
+    assert chunked_upload.load_state(video) is None
+    assert not chunked_upload.state_path(video).exists()
@@ -0,0 +1,96 @@
+import pytest
+
+import prompt_gen
+from job_store import JobStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)   # part_files() creates the run directories under the cwd
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    monkeypatch.setattr(prompt_gen, "default_store", lambda: store)
+    return store
+
+
+def story(monkeypatch, job, stream=False, generated=("new 1", "new 2", "new 3")):
+    """Run the story stage for one job; returns (part texts yielded, whether the LLM was asked)."""
+    calls = []
+
+    def generate(prompt=None, seed=None):
+        calls.append(prompt)
+        yield from generated
+
+    monkeypatch.setattr(prompt_gen, "STREAM_GENERATION", stream)
+    monkeypatch.setattr(prompt_gen, "stream_story_parts" if stream else "generate_story_parts", generate)
+    items = list(prompt_gen._story_stage(job))
+    assert items[-1]["kind"] == "story"
+    return [i["text"] for i in items if i["kind"] == "part"], bool(calls)
+
+
+def test_incomplete_runs_skip_finished_and_batch_runs(store):
+    for base, status in [("a", "generating"), ("b", "done"), ("c", "rendering"), ("d", "expired"), ("e", "batch")]:
+        store.record_run(base, status=status)
+    assert store.incomplete_runs() == ["a", "c"]
+    store.set_run_status("c", "done")
+    assert store.incomplete_runs() == ["a"]
+
+
+def test_complete_parts_needs_every_recorded_part(store):
+    store.record_run("s")
+    store.record_part("s", 1, "one")
+    store.record_part("s", 2, "two")
+    assert store.complete_parts("s") is None          # cut off: the part count was never recorded
+    store.record_run("s", ["one", "two", "three"])
+    assert store.complete_parts("s") == ["one", "two", "three"]
+    assert store.complete_parts("unknown") is None
+
+
+def test_resume_reuses_a_complete_story(store, monkeypatch):
+    store.record_run("s", ["one", "two", "three"])
+    texts, asked = story(monkeypatch, {"base": "s"})
+    assert texts == ["one", "two", "three"] and not asked
+    assert store.run("s")["status"] == "rendering"
+
+
+@pytest.mark.parametrize("stream", [True, False])
+def test_resume_regenerates_a_truncated_story(store, monkeypatch, stream):
+    store.record_run("s")
+    store.record_part("s", 1, "half a story")
+    video = prompt_gen.part_files("s", 1)["video_file"]
+    video.write_bytes(b"stale render")
+    store.record_artifact("s", 1, "video", video)
+    store.mark_upload("s", 1, "youtube", "uploaded", remote_id="yt1")
+
+    texts, asked = story(monkeypatch, {"base": "s"}, stream=stream)
+    assert asked and texts == ["new 1", "new 2", "new 3"]
+    assert store.complete_parts("s") == texts
+    assert not video.exists() and store.part_for_video(video) is None
+    assert not store.is_uploaded("s", 1, "youtube")
+
+
+def test_new_story_records_its_parts(store, monkeypatch):
+    texts, asked = story(monkeypatch, {}, stream=True)
+    [base] = store.incomplete_runs()
+    assert asked and store.complete_parts(base) == texts
+
+
+def test_pending_uploads_groups_variants_and_skips_uploaded(store, tmp_path):
+    store.record_run("s", ["one", "two"])
+    files = {}
+    for idx, suffix in [(1, ""), (1, "_tiktok"), (2, "")]:
+        path = tmp_path / f"s_part{idx}{suffix}.mp4"
+        path.write_bytes(b"v")
+        store.record_artifact("s", idx, "video", path)
+        files[idx, suffix] = str(path)
+    store.set_run_status("s", "rendering", meta_file="meta.json")
+    store.mark_upload("s", 2, "youtube", "uploaded", remote_id="yt2")
+    store.mark_upload("s", 2, "tiktok", "uploaded", remote_id="pub2")
+
+    pending = store.pending_uploads()
+    assert pending == [({"default": files[1, ""], "tiktok": files[1, "_tiktok"]}, "meta.json", ["youtube", "tiktok"])]
+
+    store.mark_remote("tiktok", "pub2", "failed", error="spam_risk")
+    assert [p[0] for p in store.pending_uploads()][1] == files[2, ""]
+
+    store.set_run_status("s", "batch")
+    assert store.pending_uploads() == []
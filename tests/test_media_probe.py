@@ -0,0 +1,108 @@
+import struct
+
+import pytest
+
+import media_probe
+from media_probe import media_duration, mp3_duration, mp4_duration, probe_duration
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz: 417-byte frames of 1152 samples.
+STEREO = b"\xff\xfb\x90\x00"
+MONO = b"\xff\xfb\x90\xc0"
+FRAME_LEN = 417
+FRAME_SECONDS = 1152 / 44100
+
+
+def frame(header=STEREO, body=b"") -> bytes:
+    return (header + body).ljust(FRAME_LEN, b"\x00")
+
+
+def xing_frame(frames: int, header=STEREO, tag=b"Xing") -> bytes:
+    side = 17 if header == MONO else 32
+    return frame(header, b"\x00" * side + tag + struct.pack(">II", 1, frames))
+
+
+def vbri_frame(frames: int) -> bytes:
+    # VBRI sits 32 bytes after the header: tag, version, delay, quality, bytes, frames.
+    return frame(STEREO, b"\x00" * 32 + b"VBRI" + struct.pack(">HHHII", 1, 0, 75, 0, frames))
+
+
+def id3v2(size: int) -> bytes:
+    syncsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b"ID3\x04\x00\x00" + syncsafe + b"\x00" * size
+
+
+def box(kind: bytes, body: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(body), kind) + body
+
+
+def mvhd(timescale: int, duration: int, version: int = 0) -> bytes:
+    if version == 1:
+        body = struct.pack(">B3xQQIQ", 1, 0, 0, timescale, duration)
+    else:
+        body = struct.pack(">B3xIIII", 0, 0, 0, timescale, duration)
+    return box(b"mvhd", body + b"\x00" * 80)
+
+
+def write(tmp_path, name, data) -> str:
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.mark.parametrize("header, tag", [(STEREO, b"Xing"), (STEREO, b"Info"), (MONO, b"Xing")])
+def test_mp3_xing_tag_gives_frame_count(tmp_path, header, tag):
+    # The file holds only 4 frames; the tag's count (not the file size) must win.
+    path = write(tmp_path, "vbr.mp3", xing_frame(1000, header, tag) + frame(header) * 3)
+    assert mp3_duration(path) == pytest.approx(1000 * FRAME_SECONDS)
+
+
+def test_mp3_vbri_tag(tmp_path):
+    path = write(tmp_path, "vbri.mp3", vbri_frame(250) + frame() * 3)
+    assert mp3_duration(path) == pytest.approx(250 * FRAME_SECONDS)
+
+
+def test_mp3_cbr_from_size_skips_id3_tags(tmp_path):
+    frames = frame() * 20
+    path = write(tmp_path, "cbr.mp3", id3v2(300) + frames + b"TAG" + b"\x00" * 125)
+    assert mp3_duration(path) == pytest.approx(len(frames) * 8 / 128000)
+
+
+def test_mp3_finds_first_frame_after_junk(tmp_path):
+    # A valid-looking header whose "next frame" isn't one must be skipped.
+    frames = frame() * 10
+    path = write(tmp_path, "junk.mp3", STEREO + b"junk" + frames)
+    assert mp3_duration(path) == pytest.approx(len(frames) * 8 / 128000)
+
+
+def test_mp3_without_frames_is_none(tmp_path):
+    assert mp3_duration(write(tmp_path, "empty.mp3", b"\x00" * 2000)) is None
+
+
+@pytest.mark.parametrize("version", [0, 1])
+def test_mp4_mvhd(tmp_path, version):
+    data = box(b"ftyp", b"isom\x00\x00\x02\x00") + box(b"moov", mvhd(1000, 12_345, version))
+    assert mp4_duration(write(tmp_path, "clip.mp4", data)) == pytest.approx(12.345)
+
+
+def test_mp4_moov_after_mdat(tmp_path):
+    data = (box(b"ftyp", b"isom\x00\x00\x02\x00") + box(b"mdat", b"\x00" * 5000)
+            + box(b"moov", box(b"trak", b"") + mvhd(600, 1800)))
+    assert mp4_duration(write(tmp_path, "faststart-less.mp4", data)) == pytest.approx(3.0)
+
+
+def test_mp4_rejects_other_files(tmp_path):
+    assert mp4_duration(write(tmp_path, "not.mp4", b"RIFF" + b"\x00" * 100)) is None
+    assert mp4_duration(write(tmp_path, "nomoov.mp4", box(b"ftyp", b"isom"))) is None
+
+
+def test_media_duration_dispatches_on_suffix(tmp_path):
+    assert media_duration(write(tmp_path, "a.m4a", box(b"ftyp", b"M4A ") + box(b"moov", mvhd(10, 25)))) == 2.5
+    assert media_duration(write(tmp_path, "a.wav", b"RIFF" + b"\x00" * 100)) is None
+
+
+def test_probe_duration_reads_headers_without_ffprobe(tmp_path, monkeypatch):
+    def no_ffprobe(path):
+        raise AssertionError("ffprobe should not be needed")
+    monkeypatch.setattr(media_probe, "ffprobe_duration", no_ffprobe)
+    path = write(tmp_path, "voice.mp3", xing_frame(100) + frame() * 3)
+    assert probe_duration(path) == pytest.approx(100 * FRAME_SECONDS)
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import Pipeline
+
+
+def test_linear_stages_and_sink_results():
+    p = Pipeline()
+    p.add_stage("double", lambda item: {**item, "n": item["n"] * 2}, workers=3)
+    p.add_stage("fan", lambda item: ({**item, "copy": c} for c in range(2)), after="double")
+    results = p.run("double", [{"key": i, "n": i} for i in range(5)])
+    assert sorted((r["n"], r["copy"]) for r in results) == [(n * 2, c) for n in range(5) for c in range(2)]
+    assert p.errors == []
+
+
+def test_unknown_upstream_is_rejected():
+    p = Pipeline()
+    with pytest.raises(ValueError):
+        p.add_stage("render", lambda item: item, after="srt")
+
+
+def test_consumes_routes_by_kind():
+    p = Pipeline()
+    p.add_stage("src", lambda item: [{"kind": "part", "key": item["key"]}, {"kind": "story", "key": item["key"]}])
+    p.add_stage("parts", lambda item: {**item, "seen": "parts"}, after="src", consumes="part")
+    p.add_stage("stories", lambda item: {**item, "seen": "stories"}, after="src", consumes="story")
+    results = p.run("src", [{"key": 1}, {"key": 2}])
+    assert sorted((r["seen"], r["kind"]) for r in results) == [("parts", "part")] * 2 + [("stories", "story")] * 2
+
+
+def test_join_merges_one_item_per_upstream_by_key():
+    p = Pipeline()
+    p.add_stage("src", lambda item: item)
+    p.add_stage("video", lambda item: {"key": item["key"], "video": f"v{item['key']}"}, after="src", workers=2)
+    p.add_stage("meta", lambda item: {"key": item["key"], "meta": f"m{item['key']}"}, after="src")
+    p.add_stage("upload", lambda item: item, after=("video", "meta"), join=True)
+    results = p.run("src", [{"key": k} for k in range(4)])
+    assert sorted(results, key=lambda r: r["key"]) == [
+        {"key": k, "video": f"v{k}", "meta": f"m{k}", "kind": "upload"} for k in range(4)]
+
+
+def test_incomplete_joins_are_dropped_at_shutdown(capsys):
+    p = Pipeline()
+    p.add_stage("src", lambda item: item)
+    p.add_stage("video", lambda item: item, after="src")
+    p.add_stage("meta", lambda item: item if item["key"] != 1 else None, after="src")
+    p.add_stage("upload", lambda item: item, after=("video", "meta"), join=True)
+    results = p.run("src", [{"key": k} for k in range(3)])
+    assert sorted(r["key"] for r in results) == [0, 2]
+    assert "dropped 1 incomplete joins" in capsys.readouterr().out
+
+
+def test_consumes_per_upstream():
+    # The story stage's "story" item and the srt stage's "part" items reach one stage.
+    seen = []
+    p = Pipeline()
+    p.add_stage("story", lambda item: [{"kind": "part", "key": (item["key"], 1)}, {"kind": "story", "key": item["key"]}])
+    p.add_stage("srt", lambda item: {**item, "srt": True}, after="story", consumes="part")
+    p.add_stage("render", lambda item: seen.append((item["kind"], item.get("srt", False))),
+                after=("story", "srt"), consumes={"story": "story", "srt": "part"})
+    p.run("story", [{"key": "a"}])
+    assert sorted(seen) == [("part", True), ("story", False)]
+
+
+def test_a_failing_item_is_recorded_and_the_rest_continue():
+    def flaky(item):
+        if item["key"] == 2:
+            raise RuntimeError("boom")
+        return item
+
+    p = Pipeline()
+    p.add_stage("src", flaky, workers=2)
+    results = p.run("src", [{"key": k} for k in range(4)])
+    assert sorted(r["key"] for r in results) == [0, 1, 3]
+    [(stage, item, error)] = p.errors
+    assert stage == "src" and item["key"] == 2 and str(error) == "boom"
+
+
+def test_full_downstream_queue_blocks_the_producer():
+    release = threading.Event()
+    produced = []
+    p = Pipeline()
+    p.add_stage("fast", lambda item: produced.append(item["key"]) or item)
+    p.add_stage("slow", lambda item: release.wait() and item, after="fast", maxsize=2)
+    p.start()
+
+    def feed():
+        for k in range(10):
+            p.submit("fast", {"key": k})
+        p.close("fast")
+
+    feeder = threading.Thread(target=feed)
+    feeder.start()
+    time.sleep(0.3)
+    # "slow" holds one item and has two queued; "fast" is blocked handing over the fourth.
+    assert produced == [0, 1, 2, 3]
+    assert p.backlog(["slow"]) == 2
+    release.set()
+    feeder.join()
+    assert sorted(r["key"] for r in p.join()) == list(range(10))
+
+
+def test_on_result_receives_sink_items():
+    got = []
+    p = Pipeline(on_result=got.append)
+    p.add_stage("src", lambda item: item)
+    assert p.run("src", [{"key": 1}]) == []
+    assert got == [{"key": 1}]
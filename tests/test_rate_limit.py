@@ -0,0 +1,123 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+import rate_limit
+from rate_limit import AdaptiveConcurrency, Limiter, parse_retry_after
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(rate_limit, "BACKOFF_BASE", 0.02)
+
+
+def throttling_handler(state, capacity=3, retry_after="0.2"):
+    """Serves `capacity` requests at once and answers 429 + Retry-After beyond that."""
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                over = state["active"] >= capacity
+                if over:
+                    state["throttled"] += 1
+                else:
+                    state["active"] += 1
+                    state["peak"] = max(state["peak"], state["active"])
+            if over:
+                self.send_response(429)
+                self.send_header("Retry-After", retry_after)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            time.sleep(0.05)
+            with lock:
+                state["active"] -= 1
+                state["served"] += 1
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def test_429s_halve_concurrency_and_every_request_succeeds(fake_server):
+    state = {"active": 0, "peak": 0, "throttled": 0, "served": 0}
+    url = fake_server(throttling_handler(state)) + "/"
+    lim = Limiter("fake.get", rate=50, burst=10, concurrency=8, max_attempts=10)
+    session = requests.Session()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        codes = list(pool.map(lambda _: lim.request(session, "GET", url, timeout=5).status_code, range(20)))
+    assert codes == [200] * 20
+    assert state["served"] == 20
+    assert state["throttled"] > 0
+    assert lim.concurrency.limit < 8
+
+
+def test_retry_after_pauses_the_whole_endpoint():
+    lim = Limiter("fake.pause", rate=100, burst=10, concurrency=4)
+    lim.pause(0.3)
+    started = time.monotonic()
+    assert lim.call(lambda: "ok") == "ok"
+    assert time.monotonic() - started >= 0.25
+
+
+def test_concurrency_never_exceeds_the_ceiling():
+    lim = Limiter("fake.ceiling", rate=1000, burst=100, concurrency=2, max_concurrency=3)
+    state = {"active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.01)
+        with lock:
+            state["active"] -= 1
+        return "ok"
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        results = list(pool.map(lambda _: lim.call(work), range(60)))
+    assert results == ["ok"] * 60
+    assert state["peak"] <= 3
+    assert lim.concurrency.limit == 3   # grew additively up to the ceiling, never past it
+
+
+def test_throttling_halves_at_most_once_per_cooldown():
+    aimd = AdaptiveConcurrency(8, cooldown=60)
+    for _ in range(3):
+        aimd.acquire()
+    for _ in range(3):
+        aimd.release("throttled")
+    assert aimd.limit == 4
+    assert aimd.in_flight == 0
+
+
+def test_non_idempotent_calls_are_not_repeated_after_a_server_error():
+    calls = []
+
+    class ServerError(Exception):
+        status_code = 500
+
+    def post():
+        calls.append(1)
+        raise ServerError("boom")
+
+    lim = Limiter("fake.post", rate=100, burst=10, concurrency=2)
+    with pytest.raises(ServerError):
+        lim.call(post, idempotent=False)
+    assert len(calls) == 1
+
+
+def test_parse_retry_after():
+    assert parse_retry_after({"retry-after-ms": "250"}) == 0.25
+    assert parse_retry_after({"Retry-After": "3"}) == 3.0
+    assert parse_retry_after({}) is None
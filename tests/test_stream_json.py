@@ -0,0 +1,68 @@
+import json
+import random
+
+from stream_json import ArrayStreamParser
+
+DOC = json.dumps({
+    "title": "not the array",
+    "parts": [
+        "You stand at the gate, \"blade\" drawn — [the] {gods} watch.",
+        "Back\\slash, tab\t and unicode é ✓",
+        {"part": 2, "tags": ["#myth", "#rome"], "nested": {"deep": [1, {"x": "]"}]}},
+        42,
+        -1.5e3,
+        True,
+        None,
+        "",
+    ],
+    "after": ["ignored"],
+}, ensure_ascii=False)
+EXPECTED = json.loads(DOC)["parts"]
+
+
+def parse(chunks) -> list:
+    parser = ArrayStreamParser("parts")
+    items = []
+    for chunk in chunks:
+        items += parser.feed(chunk)
+    assert parser.done
+    assert parser.count == len(items)
+    return items
+
+
+def test_whole_document():
+    assert parse([DOC]) == EXPECTED
+
+
+def test_one_character_at_a_time():
+    assert parse(DOC) == EXPECTED
+
+
+def test_every_single_split():
+    for cut in range(1, len(DOC)):
+        assert parse([DOC[:cut], DOC[cut:]]) == EXPECTED, f"split at {cut}: {DOC[cut - 5:cut]!r}|{DOC[cut:cut + 5]!r}"
+
+
+def test_random_chunkings():
+    rng = random.Random(7)
+    for _ in range(200):
+        cuts = sorted(rng.sample(range(1, len(DOC)), rng.randint(2, 12)))
+        chunks = [DOC[a:b] for a, b in zip([0] + cuts, cuts + [len(DOC)])]
+        assert parse(chunks) == EXPECTED
+
+
+def test_items_are_returned_as_soon_as_they_close():
+    parser = ArrayStreamParser("parts")
+    assert parser.feed('{"parts": ["one", "tw') == ["one"]
+    assert parser.feed('o"') == ["two"]
+    assert parser.feed(", 12") == []          # a bare number may still be growing
+    assert parser.feed("3, {\"a\": [1") == [123]
+    assert parser.feed("]}]") == [{"a": [1]}]
+    assert parser.done
+    assert parser.feed(', "more": ["x"]}') == []
+
+
+def test_missing_key_yields_nothing():
+    parser = ArrayStreamParser("parts")
+    assert parser.feed('{"stories": ["a", "b"]}') == []
+    assert not parser.done and parser.count == 0
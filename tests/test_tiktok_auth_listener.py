@@ -0,0 +1,112 @@
+import json
+import socket
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import tiktok_auth_listener
+from tiktok_auth_listener import CallbackListener, LoginError, exchange_code, login
+from tiktok_tokens import TokenManager
+
+
+@pytest.fixture
+def token_endpoint(fake_server):
+    """Fake /v2/oauth/token/: accepts code "good-code"; returns (url, received forms)."""
+    forms = []
+
+    class Token(BaseHTTPRequestHandler):
+        def do_POST(self):
+            form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+            forms.append({k: v[0] for k, v in form.items()})
+            ok = forms[-1].get("code") == "good-code"
+            body = json.dumps({"access_token": "act.fake", "refresh_token": "rft.fake", "expires_in": 86400}
+                              if ok else {"error": "invalid_grant", "error_description": "bad code"}).encode()
+            self.send_response(200 if ok else 400)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return fake_server(Token) + "/v2/oauth/token/", forms
+
+
+@pytest.fixture
+def redirect_uri():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}/oauth/callback"
+
+
+def callback(redirect_uri, **params) -> int:
+    query = "&".join(f"{k}={v}" for k, v in params.items())
+    try:
+        with urllib.request.urlopen(f"{redirect_uri}?{query}", timeout=5) as r:
+            return r.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def exchanger(token_url):
+    def exchange(code, redirect_uri):
+        return exchange_code(code, redirect_uri, token_url, client_key="fake-key", client_secret="fake-secret")
+    return exchange
+
+
+def test_callback_with_the_wrong_state_is_ignored(token_endpoint, redirect_uri):
+    token_url, forms = token_endpoint
+    listener = CallbackListener(redirect_uri, exchanger(token_url)).start()
+    assert callback(redirect_uri, code="good-code", state="forged") == 400
+    with pytest.raises(LoginError, match="no TikTok login"):
+        listener.wait(timeout=0.3)
+    assert forms == []
+
+
+def test_login_exchanges_the_code_and_stores_tokens(token_endpoint, redirect_uri, tmp_path):
+    token_url, forms = token_endpoint
+    tokens = TokenManager(lambda _: {}, tmp_path / "token.json")
+    statuses = []
+
+    def browser(url):
+        # The user approves: TikTok redirects back with the listener's own state.
+        state = parse_qs(urlparse(url).query)["state"][0]
+        threading.Thread(target=lambda: statuses.append(callback(redirect_uri, code="good-code", state=state)),
+                         daemon=True).start()
+
+    login(tokens, "fake-key", timeout=10, redirect_uri=redirect_uri, exchange=exchanger(token_url), open_url=browser)
+
+    assert forms == [{"client_key": "fake-key", "client_secret": "fake-secret", "code": "good-code",
+                      "grant_type": "authorization_code", "redirect_uri": redirect_uri}]
+    assert tokens.is_fresh() and tokens.snapshot.access_token == "act.fake"
+    assert json.loads((tmp_path / "token.json").read_text())["refresh_token"] == "rft.fake"
+
+
+def test_rejected_code_fails_the_login(token_endpoint, redirect_uri):
+    token_url, _ = token_endpoint
+    listener = CallbackListener(redirect_uri, exchanger(token_url)).start()
+    assert callback(redirect_uri, code="stale-code", state=listener.state) == 500
+    with pytest.raises(LoginError, match="bad code"):
+        listener.wait(timeout=5)
+
+
+def test_declined_consent_fails_the_login(redirect_uri):
+    listener = CallbackListener(redirect_uri, exchange=lambda *a: pytest.fail("nothing to exchange")).start()
+    assert callback(redirect_uri, error="access_denied", state=listener.state) == 400
+    with pytest.raises(LoginError, match="access_denied"):
+        listener.wait(timeout=5)
+
+
+def test_authorize_url_carries_the_state_and_redirect(redirect_uri):
+    listener = CallbackListener(redirect_uri)
+    query = parse_qs(urlparse(listener.authorize_url("fake-key")).query)
+    assert query["state"] == [listener.state]
+    assert query["redirect_uri"] == [redirect_uri]
+    assert query["client_key"] == ["fake-key"]
+    assert query["scope"] == [tiktok_auth_listener.SCOPES]
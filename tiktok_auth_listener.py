@@ -0,0 +1,150 @@
+import os
+import time
+import secrets
+import threading
+import webbrowser
+from urllib.parse import urlencode, urlparse, parse_qs
+
+# ─── Local OAuth callback listener ────────────────────────────────────────────
+# Replaces pasting token JSON into the terminal. A small HTTP server on this host
+# receives TikTok's redirect (`?code=...&state=...`), exchanges the code at
+# /v2/oauth/token/ and writes the tokens through the TokenManager, so every worker
+# and process sees them. The redirect URI (default http://localhost:8100/oauth/callback)
+# must be registered for the TikTok app; on a headless host, forward the port
+# (`ssh -L 8100:localhost:8100 host`) and open the printed URL locally.
+
+AUTH_PORT = int(os.getenv("TIKTOK_AUTH_PORT", 8100))
+REDIRECT_URI = os.getenv("TIKTOK_LOCAL_REDIRECT_URI", f"http://localhost:{AUTH_PORT}/oauth/callback")
+AUTHORIZE_URL = os.getenv("TIKTOK_AUTHORIZE_URL", "https://www.tiktok.com/v2/auth/authorize/")
+SCOPES = os.getenv("TIKTOK_SCOPES", "user.info.basic,video.upload,video.publish")
+CLIENT_SECRET = os.getenv("TIKTOK_CLIENT_SECRET")
+
+_PAGE = "<html><body style='font-family:sans-serif'><h2>{}</h2><p>{}</p></body></html>"
+
+
+class LoginError(Exception):
+    pass
+
+
+def exchange_code(code: str, redirect_uri: str, token_url: str = None, client_key: str = None,
+                  client_secret: str = None) -> dict:
+    """Trade an authorization code for tokens: {access_token, refresh_token, expires_in, ...}."""
+    from upload_handlers import CLIENT_KEY, TIKTOK_API_BASE, http_session
+    from rate_limit import limiter
+    # Codes are single-use, so this POST is only retried when TikTok provably rejected it unprocessed.
+    resp = limiter("tiktok", "oauth").request(
+        http_session(), "POST", token_url or f"{TIKTOK_API_BASE}/v2/oauth/token/",
+        data={"client_key": client_key or CLIENT_KEY, "client_secret": client_secret or CLIENT_SECRET,
+              "code": code, "grant_type": "authorization_code", "redirect_uri": redirect_uri},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    body = resp.json()
+    data = body.get("data") or body
+    if not resp.ok or "access_token" not in data:
+        raise LoginError(f"token exchange failed ({resp.status_code}): "
+                         f"{data.get('error_description') or data.get('error') or body}")
+    return data
+
+
+class CallbackListener:
+    """One-shot HTTP server waiting for the OAuth redirect; `wait()` returns the exchanged tokens."""
+
+    def __init__(self, redirect_uri: str = REDIRECT_URI, exchange=exchange_code):
+        self.redirect_uri = redirect_uri
+        self.exchange = exchange
+        self.state = secrets.token_urlsafe(16)
+        self.tokens = None
+        self.error = None
+        self._done = threading.Event()
+        self._server = None
+
+    def start(self):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        listener = self
+        target = urlparse(self.redirect_uri)
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != target.path:
+                    self.send_error(404)
+                    return
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if query.get("state") != listener.state:
+                    # Not our login (stale tab or forged request): ignore it and keep waiting.
+                    return self._page(400, "Login link expired", "Start the login again from the terminal.")
+                if "error" in query:
+                    listener._finish(error=LoginError(query.get("error_description") or query["error"]))
+                    return self._page(400, "TikTok login was declined", query.get("error_description", ""))
+                try:
+                    tokens = listener.exchange(query.get("code", ""), listener.redirect_uri)
+                except Exception as e:
+                    listener._finish(error=e)
+                    return self._page(500, "Token exchange failed", str(e))
+                listener._finish(tokens=tokens)
+                self._page(200, "✅ TikTok connected", "You can close this tab; uploads continue in the terminal.")
+
+            def _page(self, status, title, text):
+                body = _PAGE.format(title, text).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((target.hostname or "localhost", target.port or 80), Handler)
+        threading.Thread(target=self._server.serve_forever, name="tiktok-auth-listener", daemon=True).start()
+        return self
+
+    def _finish(self, tokens=None, error=None):
+        self.tokens, self.error = tokens, error
+        self._done.set()
+
+    def authorize_url(self, client_key: str) -> str:
+        return AUTHORIZE_URL + "?" + urlencode({
+            "client_key": client_key, "response_type": "code", "scope": SCOPES,
+            "redirect_uri": self.redirect_uri, "state": self.state,
+        })
+
+    def wait(self, timeout: float = None) -> dict:
+        try:
+            if not self._done.wait(timeout):
+                raise LoginError(f"no TikTok login within {timeout:.0f}s")
+            if self.error is not None:
+                raise self.error
+            return self.tokens
+        finally:
+            self.close()
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def login(tokens, client_key: str, timeout: float = None, open_url=webbrowser.open,
+          redirect_uri: str = REDIRECT_URI, exchange=exchange_code):
+    """
+    Run the browser login through a local callback and store the tokens in `tokens` (a TokenManager).
+    `open_url(url)` shows the authorize page (None just prints it).
+    """
+    listener = CallbackListener(redirect_uri, exchange).start()
+    url = listener.authorize_url(client_key)
+    print("\n🔐 TikTok login required. Open this URL to authorize (waiting for the callback on "
+          f"{listener.redirect_uri}):\n   {url}")
+    if open_url:
+        open_url(url)
+    data = listener.wait(timeout)
+    tokens.set_tokens(data["access_token"], data["refresh_token"], int(time.time()) + int(data.get("expires_in", 86400)))
+    print("✅ TikTok authentication complete!")
+    return data
+
+
+if __name__ == "__main__":
+    from upload_handlers import CLIENT_KEY, token_manager, start_auto_refresher
+    login(token_manager(), CLIENT_KEY)
+    start_auto_refresher()
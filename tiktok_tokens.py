@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from collections import namedtuple
+from fs_utils import file_lock, try_file_lock, atomic_write_text
+
+# ─── TikTok token manager ──────────────────────────────────────────────────────
+# Tokens live in ~/.tiktok_token.json and may be shared by several render/upload
+# processes. Rules:
+#   • Reads are lock-free: the current tokens are an immutable snapshot swapped
+#     in by reference, and the hot upload path only touches the disk when the
+#     snapshot is close to expiry.
+#   • Refreshes happen under an exclusive file lock and re-read the store first,
+#     so if another process already rotated the refresh token we reuse its result
+#     instead of spending (and invalidating) the old one.
+#   • Writes are atomic (temp file + rename), so readers never see half a file.
+#   • Only one background refresher runs per host: it holds a non-blocking lock on
+#     a sentinel file for as long as it lives; other processes just re-read the
+#     store when their snapshot ages out.
+
+TokenSnapshot = namedtuple("TokenSnapshot", "access_token refresh_token expires_at mtime")
+
+TOKEN_STORE = Path(os.getenv('TIKTOK_TOKEN_STORE', Path.home() / '.tiktok_token.json'))
+REFRESH_MARGIN = 120   # refresh this many seconds before expiry
+
+
+class TokenManager:
+    def __init__(self, refresh_fn, store: Path = TOKEN_STORE, margin: float = REFRESH_MARGIN):
+        """`refresh_fn(refresh_token)` calls the provider and returns {access_token, refresh_token, expires_in}."""
+        self.refresh_fn = refresh_fn
+        self.store = Path(store)
+        self.margin = margin
+        self._lock_path = self.store.with_name(self.store.name + '.lock')
+        self._refresher_path = self.store.with_name(self.store.name + '.refresher')
+        self._thread_lock = threading.Lock()
+        self._refresher = None
+        self._snap = self._read_store() or TokenSnapshot(
+            os.getenv('TIKTOK_ACCESS_TOKEN'),
+            os.getenv('TIKTOK_REFRESH_TOKEN'),
+            int(os.getenv('TIKTOK_EXPIRES_AT', 0)),
+            None,
+        )
+
+    # ── reads ──
+    @property
+    def snapshot(self) -> TokenSnapshot:
+        return self._snap
+
+    def is_fresh(self, snap: TokenSnapshot = None) -> bool:
+        snap = snap or self._snap
+        return bool(snap.access_token) and time.time() < snap.expires_at - self.margin
+
+    def access_token(self) -> str:
+        """Hot path: no locks and no I/O while the cached token is comfortably valid."""
+        snap = self._snap
+        if self.is_fresh(snap):
+            return snap.access_token
+        self._reload_if_changed()
+        if not self.is_fresh() and self._snap.refresh_token:
+            self.refresh()
+        return self._snap.access_token
+
+    def reload(self) -> TokenSnapshot:
+        """Pick up tokens another worker or process has written, without refreshing."""
+        self._reload_if_changed()
+        return self._snap
+
+    def _read_store(self):
+        try:
+            mtime = self.store.stat().st_mtime_ns
+            data = json.loads(self.store.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        return TokenSnapshot(data.get('access_token'), data.get('refresh_token'), int(data.get('expires_at', 0)), mtime)
+
+    def _reload_if_changed(self):
+        try:
+            mtime = self.store.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._snap.mtime:
+            with file_lock(self._lock_path, shared=True):
+                snap = self._read_store()
+            if snap:
+                self._snap = snap
+
+    # ── writes ──
+    def _write(self, access_token, refresh_token, expires_at):
+        atomic_write_text(self.store, json.dumps({
+            "access_token":  access_token,
+            "refresh_token": refresh_token,
+            "expires_at":    expires_at
+        }), mode=0o600)
+        self._snap = self._read_store()
+
+    def set_tokens(self, access_token: str, refresh_token: str, expires_at: int):
+        with self._thread_lock, file_lock(self._lock_path):
+            self._write(access_token, refresh_token, int(expires_at))
+
+    def drop_refresh_token(self, stale: str):
+        """Forget a refresh token the provider rejected (unless it was rotated meanwhile)."""
+        with self._thread_lock, file_lock(self._lock_path):
+            snap = self._read_store() or self._snap
+            if snap.refresh_token == stale:
+                self._write(snap.access_token, None, snap.expires_at)
+            else:
+                self._snap = snap
+
+    def save(self):
+        snap = self._snap
+        self.set_tokens(snap.access_token, snap.refresh_token, snap.expires_at)
+
+    def refresh(self, force: bool = False) -> TokenSnapshot:
+        """Rotate the tokens unless another thread or process already did."""
+        with self._thread_lock, file_lock(self._lock_path):
+            on_disk = self._read_store()
+            if on_disk:
+                self._snap = on_disk
+            if self.is_fresh() and not force:
+                return self._snap
+            if not self._snap.refresh_token:
+                raise RuntimeError("No TikTok refresh token available")
+            data = self.refresh_fn(self._snap.refresh_token)
+            self._write(data["access_token"], data["refresh_token"], int(time.time()) + int(data["expires_in"]))
+        expiry = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self._snap.expires_at))
+        print(f"[TikTok] Token refreshed; next expiry at {expiry}")
+        return self._snap
+
+    # ── background refresher ──
+    def start_refresher(self):
+        """Idempotent: at most one thread per process, and only one process per host refreshes."""
+        with self._thread_lock:
+            if self._refresher and self._refresher.is_alive():
+                return
+            self._refresher = threading.Thread(target=self._refresh_loop, name="tiktok-refresher", daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        fd = None
+        while True:
+            if fd is None:
+                fd = try_file_lock(self._refresher_path)
+                if fd is None:
+                    # Another process is the refresher; check again later in case it exits.
+                    time.sleep(60)
+                    continue
+            self._reload_if_changed()
+            wait = self._snap.expires_at - self.margin - time.time()
+            if wait > 0:
+                time.sleep(min(wait, 300))
+                continue
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️  Auto‐refresh failed: {e}")
+                time.sleep(60)
@@ -0,0 +1,308 @@
+import os
+import json
+import time
+import bisect
+import threading
+import functools
+import itertools
+import subprocess
+from collections import deque
+from fs_utils import atomic_write_text
+
+# ─── Tracing & metrics ─────────────────────────────────────────────────────────
+# Timing spans for every step of a run (story, TTS, transcription, SRT, probe,
+# render, metadata, upload), nested per thread. Finished spans are kept in a
+# bounded ring (so a daemon doesn't grow without limit) and folded into per-span
+# histograms. Two exports:
+#   • a JSON trace in Chrome trace-event format (open in chrome://tracing or
+#     https://ui.perfetto.dev) — TRACE_FILE;
+#   • Prometheus text exposition — METRICS_FILE, and served on METRICS_PORT if set.
+# `run_ffmpeg` adds `-progress` to an ffmpeg command and turns its key=value
+# stream into live fps / speed / ETA lines and gauges.
+
+TRACE_FILE = os.getenv("TRACE_FILE", "trace.json")
+METRICS_FILE = os.getenv("METRICS_FILE", "metrics.prom")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", 20000))
+PROGRESS_INTERVAL = float(os.getenv("FFMPEG_PROGRESS_INTERVAL", 2.0))
+METRIC_PREFIX = "brainrot"
+
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.errors = 0
+
+
+class Tracer:
+    def __init__(self, max_spans: int = MAX_SPANS):
+        self.spans = deque(maxlen=max_spans)
+        self.histograms = {}
+        self.gauges = {}
+        self.active = {}
+        self._ids = itertools.count(1)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._epoch = time.time() - time.perf_counter()
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def start(self, name: str, **attrs) -> dict:
+        stack = self._stack()
+        span = {"id": next(self._ids), "name": name, "parent": stack[-1]["id"] if stack else None,
+                "thread": threading.current_thread().name, "start": time.perf_counter(), "attrs": attrs}
+        stack.append(span)
+        with self._lock:
+            self.active[name] = self.active.get(name, 0) + 1
+        return span
+
+    def finish(self, span: dict, error: BaseException = None, duration: float = None):
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        span["duration"] = time.perf_counter() - span["start"] if duration is None else duration
+        if error is not None:
+            span["error"] = f"{type(error).__name__}: {error}"
+        with self._lock:
+            self.active[span["name"]] -= 1
+            self.spans.append(span)
+            hist = self.histograms.setdefault(span["name"], _Histogram())
+            hist.counts[bisect.bisect_left(BUCKETS, span["duration"])] += 1
+            hist.sum += span["duration"]
+            hist.count += 1
+            hist.errors += error is not None
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def clear_gauges(self, **labels):
+        wanted = tuple(sorted(labels.items()))
+        with self._lock:
+            for key in [k for k in self.gauges if k[1] == wanted]:
+                del self.gauges[key]
+
+    # ── exports ──
+    def chrome_trace(self) -> dict:
+        with self._lock:
+            spans = list(self.spans)
+        threads = {}
+        events = []
+        for s in spans:
+            tid = threads.setdefault(s["thread"], len(threads) + 1)
+            args = {k: str(v) for k, v in s["attrs"].items()}
+            if "error" in s:
+                args["error"] = s["error"]
+            events.append({"name": s["name"], "ph": "X", "pid": os.getpid(), "tid": tid,
+                           "ts": round((self._epoch + s["start"]) * 1e6), "dur": round(s["duration"] * 1e6),
+                           "args": args})
+        events += [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                   for name, tid in threads.items()]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def prometheus_text(self) -> str:
+        m = f"{METRIC_PREFIX}_span_seconds"
+        lines = [f"# HELP {m} Duration of pipeline steps.", f"# TYPE {m} histogram"]
+        with self._lock:
+            for name, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS + ("+Inf",), h.counts):
+                    cumulative += n
+                    lines.append(f'{m}_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{m}_sum{{span="{name}"}} {h.sum:.6f}')
+                lines.append(f'{m}_count{{span="{name}"}} {h.count}')
+            e = f"{METRIC_PREFIX}_span_errors_total"
+            lines += [f"# HELP {e} Pipeline steps that raised.", f"# TYPE {e} counter"]
+            lines += [f'{e}{{span="{name}"}} {h.errors}' for name, h in sorted(self.histograms.items())]
+            a = f"{METRIC_PREFIX}_span_active"
+            lines += [f"# HELP {a} Pipeline steps currently running.", f"# TYPE {a} gauge"]
+            lines += [f'{a}{{span="{name}"}} {n}' for name, n in sorted(self.active.items())]
+            for (name, labels), value in sorted(self.gauges.items()):
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self, trace_file=TRACE_FILE, metrics_file=METRICS_FILE):
+        """Write the JSON trace and the metrics file (either may be disabled with an empty path)."""
+        if trace_file:
+            atomic_write_text(trace_file, json.dumps(self.chrome_trace()))
+        if metrics_file:
+            atomic_write_text(metrics_file, self.prometheus_text())
+
+
+tracer = Tracer()
+
+
+class span:
+    """`with span("render", part=idx):` — time a block (also usable as a decorator via `traced`)."""
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self._span = tracer.start(self.name, **self.attrs)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        tracer.finish(self._span, exc)
+        return False
+
+
+def traced(name: str):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def traced_iter(name: str, iterable, **attrs):
+    """
+    Span over a streamed producer that only counts time spent inside it, not time the
+    consumer spends between items; records time-to-first-item as an attribute.
+    """
+    s = tracer.start(name, **attrs)
+    tracer._stack().remove(s)   # the consumer's own spans must not nest under it
+    busy = 0.0
+    error = None
+    it = iter(iterable)
+    try:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                busy += time.perf_counter() - t0
+                break
+            busy += time.perf_counter() - t0
+            s["attrs"].setdefault("first_item_s", round(busy, 3))
+            s["attrs"]["items"] = s["attrs"].get("items", 0) + 1
+            yield item
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        tracer.finish(s, error if not isinstance(error, GeneratorExit) else None, duration=busy)
+
+
+# ─── Metrics endpoint ──────────────────────────────────────────────────────────
+_server = None
+
+
+def serve_metrics(port: int = METRICS_PORT):
+    """Serve /metrics (Prometheus text) and /trace (JSON) from a background thread; no-op if port is 0."""
+    global _server
+    if not port or _server is not None:
+        return _server
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics"):
+                body, ctype = tracer.prometheus_text().encode(), "text/plain; version=0.0.4"
+            elif self.path.startswith("/trace"):
+                body, ctype = json.dumps(tracer.chrome_trace()).encode(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    _server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"📊 Metrics on http://localhost:{port}/metrics")
+    return _server
+
+
+# ─── ffmpeg progress ───────────────────────────────────────────────────────────
+def _seconds(value: str) -> float:
+    """ffmpeg reports out_time_us / out_time_ms in microseconds (both), or 'N/A'."""
+    try:
+        return int(value) / 1e6
+    except ValueError:
+        return None
+
+
+def _feed_stdin(proc, data: bytes):
+    try:
+        proc.stdin.buffer.write(data)   # stdin is a text-mode pipe like stdout; write the raw bytes
+    except BrokenPipeError:
+        pass   # ffmpeg exited early; its exit code reports why
+    finally:
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+def run_ffmpeg(cmd: list, duration: float = None, label: str = "ffmpeg", stdin_data: bytes = None):
+    """
+    Run an ffmpeg command with `-progress pipe:1`, printing fps / speed / ETA every
+    PROGRESS_INTERVAL seconds and exporting them as gauges while it runs.
+    `stdin_data` is written to ffmpeg's stdin (for a `-i pipe:0` input) from a helper thread;
+    without it stdin is /dev/null, so ffmpeg never reads keystrokes meant for a login prompt.
+    Raises subprocess.CalledProcessError like `subprocess.run(check=True)`.
+    """
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True, bufsize=1,
+                            stdin=subprocess.PIPE if stdin_data is not None else subprocess.DEVNULL)
+    feeder = None
+    if stdin_data is not None:
+        feeder = threading.Thread(target=_feed_stdin, args=(proc, stdin_data), name=f"ffmpeg-stdin-{label}", daemon=True)
+        feeder.start()
+    block = {}
+    last_print = 0.0
+    try:
+        for line in proc.stdout:
+            key, _, value = line.strip().partition("=")
+            if key != "progress":
+                block[key] = value
+                continue
+            done = _seconds(block.get("out_time_us", block.get("out_time_ms", "N/A")))
+            try:
+                fps = float(block.get("fps", 0))
+            except ValueError:
+                fps = 0.0
+            try:
+                speed = float(block.get("speed", "0x").rstrip("x"))
+            except ValueError:
+                speed = 0.0
+            eta = None
+            if duration and done is not None and speed > 0:
+                eta = max(0.0, (duration - done) / speed)
+            tracer.set_gauge("render_fps", fps, part=label)
+            tracer.set_gauge("render_speed", speed, part=label)
+            if eta is not None:
+                tracer.set_gauge("render_eta_seconds", eta, part=label)
+            now = time.monotonic()
+            if value == "end" or now - last_print >= PROGRESS_INTERVAL:
+                last_print = now
+                pct = f"{min(100.0, 100 * done / duration):5.1f}% " if duration and done is not None else ""
+                eta_text = f" | ETA {eta:.0f}s" if eta is not None else ""
+                print(f"🎬 {label}: {pct}| {fps:.0f} fps | {speed:.2f}x{eta_text}")
+            block = {}
+    finally:
+        proc.stdout.close()
+        code = proc.wait()
+        if feeder is not None:
+            feeder.join()
+        tracer.clear_gauges(part=label)
+    if code != 0:
+        raise subprocess.CalledProcessError(code, cmd)
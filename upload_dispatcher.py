@@ -0,0 +1,146 @@
+import os
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, Future
+from upload_handlers import upload_tiktok, upload_youtube_short, tiktok_publish_tracker
+from job_store import default_store
+from tracing import span
+
+# ─── Multi-platform upload dispatcher ─────────────────────────────────────────
+# Fans each video out to every platform at once. Each platform has its own pool
+# (so its concurrency cap is independent) and one platform failing never blocks
+# or cancels the other. Every video gets a single report:
+#   {"video": path, "youtube": {"ok": True, "response": ...}, "tiktok": {"ok": False, "error": "..."}}
+# Upload state is recorded in the job store, so a platform that already has a
+# video is skipped on reruns instead of receiving a duplicate. A video may also be
+# a {variant: path} map of per-platform renders; each platform then uploads its
+# own variant, or "default" when it has none.
+
+PLATFORM_UPLOADERS = {
+    "youtube": upload_youtube_short,
+    "tiktok": upload_tiktok,
+}
+DEFAULT_CAPS = {
+    "youtube": int(os.getenv("YOUTUBE_UPLOAD_CONCURRENCY", 2)),
+    "tiktok": int(os.getenv("TIKTOK_UPLOAD_CONCURRENCY", 3)),
+}
+
+
+class UploadDispatcher:
+    def __init__(self, platforms=("youtube", "tiktok"), caps=None):
+        caps = {**DEFAULT_CAPS, **(caps or {})}
+        self.platforms = tuple(platforms)
+        self._pools = {
+            p: ThreadPoolExecutor(max_workers=caps[p], thread_name_prefix=f"upload-{p}")
+            for p in self.platforms
+        }
+        if "tiktok" in self.platforms:
+            # The tracker is process-wide; add_listener ignores a listener it already has.
+            tiktok_publish_tracker().add_listener(_record_publish_event)
+
+    def _run(self, platform, video, meta_file):
+        # Nothing may escape: `submit` only resolves once every platform has reported.
+        part = None
+        try:
+            video_path = video_for(video, platform)
+            store = default_store()
+            part = store.part_for_video(video_path)
+            if part and store.is_uploaded(*part, platform):
+                return {"ok": True, "skipped": True}
+            with span(f"upload.{platform}", video=Path(video_path).name):
+                response = PLATFORM_UPLOADERS[platform](str(video_path), str(meta_file))
+        except Exception as e:
+            if part:
+                _mark(store, part, platform, "failed", error=str(e))
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        if part:
+            _mark(store, part, platform, "uploaded", remote_id=_remote_id(platform, response))
+        return {"ok": True, "response": response}
+
+    def submit(self, video, meta_file) -> Future:
+        """Start uploading one video (path or {variant: path}) everywhere; the future resolves to its report."""
+        report = {"video": str(video_for(video, "default"))}
+        done = Future()
+        remaining = [len(self.platforms)]
+        lock = threading.Lock()
+
+        def collect(platform, fut):
+            try:
+                report[platform] = fut.result()
+            except BaseException as e:   # e.g. the pool was shut down mid-flight
+                report[platform] = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            with lock:
+                remaining[0] -= 1
+                finished = remaining[0] == 0
+            if finished:
+                print_report(report)
+                done.set_result(report)
+
+        for p in self.platforms:
+            fut = self._pools[p].submit(self._run, p, video, meta_file)
+            fut.add_done_callback(lambda f, p=p: collect(p, f))
+        return done
+
+    def dispatch(self, videos) -> list:
+        """Upload every (video_path, meta_file) pair; returns one report per video, in order."""
+        futures = [self.submit(v, m) for v, m in videos]
+        return [f.result() for f in futures]
+
+    def shutdown(self):
+        for pool in self._pools.values():
+            pool.shutdown(wait=True)
+
+
+def video_for(video, platform: str):
+    """The file a platform uploads: its own variant of a {variant: path} map, else the default one."""
+    if not isinstance(video, dict):
+        return video
+    return video.get(platform) or video.get("default") or next(iter(video.values()))
+
+
+def _mark(store, part, platform, status, **kwargs):
+    """Record an upload outcome; a store error is reported, not raised into the upload pool."""
+    try:
+        store.mark_upload(*part, platform, status, **kwargs)
+    except Exception as e:
+        print(f"⚠️  Could not record {platform} upload of part {part}: {e}")
+
+
+def _remote_id(platform: str, response) -> str:
+    if not isinstance(response, dict):
+        return None
+    return response.get("id") if platform == "youtube" else response.get("publish_id")
+
+
+def _record_publish_event(event: dict):
+    status = {"complete": "published", "failed": "failed"}.get(event["event"], "uploaded")
+    default_store().mark_remote("tiktok", event["publish_id"], status, error=(event.get("status") or {}).get("fail_reason"))
+
+
+def print_report(report: dict):
+    name = Path(report["video"]).name
+    parts = []
+    for platform, result in report.items():
+        if platform == "video":
+            continue
+        if result.get("skipped"):
+            parts.append(f"{platform} ⏭ already uploaded")
+        else:
+            parts.append(f"{platform} {'✅' if result['ok'] else '❌ ' + result['error']}")
+    print(f"📤 {name}: " + " | ".join(parts))
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_dispatcher() -> UploadDispatcher:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = UploadDispatcher()
+        return _default
+
+
+def dispatch_uploads(videos) -> list:
+    return default_dispatcher().dispatch(videos)
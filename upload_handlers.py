@@ -1,56 +1,159 @@
 import os
 import re
 import json
-import requests
 import time
 import threading
 import webbrowser
 from pathlib import Path
 from dotenv import load_dotenv
+import chunked_upload
+import tiktok_tokens
+from functools import lru_cache
+from job_store import default_store
+from publish_tracker import PublishTracker
+from rate_limit import LimitedSession, limiter
 
 # Load environment variables from .env
 load_dotenv()
 
 # ─── Token persistence ─────────────────────────────────────────────────────────
-TOKEN_STORE = Path.home() / '.tiktok_token.json'
+# Tokens are owned by a process-safe TokenManager (see tiktok_tokens.py), shared
+# by every worker thread and every process on this host.
+TOKEN_STORE = tiktok_tokens.TOKEN_STORE
 CLIENT_KEY  = os.getenv('TIKTOK_CLIENT_KEY')
 
-# Load stored tokens or environment
-if TOKEN_STORE.exists():
-    data = json.loads(TOKEN_STORE.read_text())
-    access_token  = data.get('access_token')
-    refresh_token = data.get('refresh_token')
-    expires_at    = data.get('expires_at', 0)
-else:
-    access_token  = os.getenv('TIKTOK_ACCESS_TOKEN')
-    refresh_token = os.getenv('TIKTOK_REFRESH_TOKEN')
-    expires_at    = int(os.getenv('TIKTOK_EXPIRES_AT', 0))
-
-TIKTOK_API_BASE = 'https://open.tiktokapis.com'
+# ─── Pooled HTTP ───────────────────────────────────────────────────────────────
+# One keep-alive session for every TikTok / discovery call, sized for the
+# upload dispatcher's concurrency, instead of a fresh connection per request.
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 16))
+_http_lock = threading.Lock()
+_http_session = None
+
+
+def http_session():
+    """The shared requests.Session (requests itself is imported on first use)."""
+    global _http_session
+    with _http_lock:
+        if _http_session is None:
+            import requests
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _http_session = session
+        return _http_session
+
+
+TIKTOK_API_BASE = os.getenv('TIKTOK_API_BASE', 'https://open.tiktokapis.com')
 REFRESH_URL     = f"{TIKTOK_API_BASE}/v2/oauth/refresh_token/"
 LOGIN_URL       = os.getenv('TIKTOK_LOGIN_URL', 'https://<your-site>/.netlify/functions/login')
 
 # ─── Authentication Helper ─────────────────────────────────────────────────────
-def ensure_tiktok_auth():
+_tokens = None
+
+
+def token_manager() -> tiktok_tokens.TokenManager:
+    global _tokens
+    with _http_lock:
+        if _tokens is None:
+            _tokens = tiktok_tokens.TokenManager(_request_token_refresh, TOKEN_STORE)
+        return _tokens
+
+
+def tiktok_access_token() -> str:
+    """Current access token for API calls (lock-free unless it is about to expire)."""
+    return token_manager().access_token()
+
+
+TIKTOK_AUTH_TIMEOUT = float(os.getenv('TIKTOK_AUTH_TIMEOUT', 0))   # 0 = TikTok uploads wait indefinitely
+_login_lock = threading.Lock()
+_login_thread = None
+_login_done = threading.Event()
+_login_error = None
+
+
+def ensure_tiktok_auth(block: bool = True) -> bool:
     """
     Ensure we have a valid TikTok access token: 
     - If still unexpired, do nothing.
     - Else if we have a refresh_token, rotate it.
-    - Otherwise kick off a manual login in the browser.
+    - Otherwise start a browser login in the background (local OAuth callback when
+      TIKTOK_CLIENT_SECRET is set, pasting token JSON otherwise). With block=False
+      this returns at once and only TikTok uploads wait (see wait_for_tiktok_auth).
+    Returns True if a valid token is available now.
     """
-    global access_token, refresh_token, expires_at
+    tokens = token_manager()
+    if tokens.is_fresh(tokens.reload()):
+        return True
 
-    now = time.time()
-    if access_token and now < expires_at:
-        return
-
-    if refresh_token and CLIENT_KEY:
+    stale = tokens.snapshot.refresh_token
+    if stale and CLIENT_KEY:
         print("🔄 Refreshing TikTok access token…")
-        refresh_access_token()
-        start_auto_refresher()  # make sure the background thread is running
-        return
+        try:
+            refresh_access_token()
+        except Exception as e:
+            # Revoked or expired refresh token: forget it and log in again like a first run.
+            print(f"⚠️  TikTok token refresh failed ({e}); a new login is needed")
+            tokens.drop_refresh_token(stale)
+        else:
+            start_auto_refresher()  # make sure the background thread is running
+            return True
+
+    started = _start_login()
+    if block:
+        return wait_for_tiktok_auth()
+    if started:
+        print("⏳ TikTok login pending; rendering continues and TikTok uploads wait for it")
+    return False
+
+
+def wait_for_tiktok_auth(timeout: float = TIKTOK_AUTH_TIMEOUT) -> bool:
+    """Block the calling thread until a TikTok token is available (starting a login if needed)."""
+    tokens = token_manager()
+    if ensure_tiktok_auth(block=False):
+        return True
+    deadline = time.monotonic() + timeout if timeout else None
+    while not _login_done.wait(5):
+        if tokens.is_fresh(tokens.reload()):   # another process may have logged in meanwhile
+            return True
+        if deadline and time.monotonic() > deadline:
+            raise TimeoutError(f"TikTok login still pending after {timeout:.0f}s")
+    if _login_error is not None:
+        raise RuntimeError(f"TikTok login failed: {_login_error}")
+    return True
+
+
+def _start_login() -> bool:
+    """Start one login attempt per process; concurrent callers share it. True if this call started it."""
+    global _login_thread
+    with _login_lock:
+        if _login_thread is not None and _login_thread.is_alive():
+            return False
+        _login_done.clear()
+        _login_thread = threading.Thread(target=_login, name="tiktok-login", daemon=True)
+        _login_thread.start()
+        return True
+
+
+def _login():
+    global _login_error
+    _login_error = None
+    try:
+        import tiktok_auth_listener
+        if CLIENT_KEY and tiktok_auth_listener.CLIENT_SECRET:
+            tiktok_auth_listener.login(token_manager(), CLIENT_KEY, timeout=TIKTOK_AUTH_TIMEOUT or None)
+        else:
+            _paste_login()
+        start_auto_refresher()
+    except Exception as e:
+        _login_error = e
+        print(f"❌ TikTok login failed: {e}")
+    finally:
+        _login_done.set()
 
-    # Manual flow:
+
+def _paste_login():
+    """Fallback without a client secret: log in through LOGIN_URL and paste the token JSON."""
     print("\n🔐 TikTok manual authentication required:")
     print(f"→ Opening your browser to: {LOGIN_URL}")
     webbrowser.open(LOGIN_URL)
@@ -65,139 +168,178 @@ def ensure_tiktok_auth():
     except EOFError:
         pass
 
-    try:
-        tokens = json.loads("\n".join(token_lines))
-        for key in ("access_token", "refresh_token", "expires_at"):
-            if key not in tokens:
-                raise KeyError(f"Missing '{key}' in token data")
-        access_token  = tokens["access_token"]
-        refresh_token = tokens["refresh_token"]
-        expires_at    = int(tokens["expires_at"])
-        save_tokens()
-        print("✅ TikTok authentication complete!")
-        start_auto_refresher()
-    except Exception as e:
-        print(f"❌ Failed to process token data: {e}")
-        raise
+    data = json.loads("\n".join(token_lines))
+    for key in ("access_token", "refresh_token", "expires_at"):
+        if key not in data:
+            raise KeyError(f"Missing '{key}' in token data")
+    token_manager().set_tokens(data["access_token"], data["refresh_token"], int(data["expires_at"]))
+    print("✅ TikTok authentication complete!")
 
 
 # ─── Token Persistence ──────────────────────────────────────────────────────────
 def save_tokens():
-    """Write current tokens + expiry out to disk."""
-    TOKEN_STORE.write_text(json.dumps({
-        "access_token":  access_token,
-        "refresh_token": refresh_token,
-        "expires_at":    expires_at
-    }))
+    """Write current tokens + expiry out to disk (atomically, under the store lock)."""
+    token_manager().save()
 
 
-def refresh_access_token():
-    """
-    Hit TikTok’s refresh endpoint to rotate both access & refresh tokens.
-    """
-    global access_token, refresh_token, expires_at
-    resp = requests.post(
-        REFRESH_URL,
+def _request_token_refresh(refresh_token: str) -> dict:
+    """Hit TikTok’s refresh endpoint; returns the new access/refresh tokens and expires_in."""
+    # Refresh tokens rotate, so this POST is only retried when TikTok provably rejected it unprocessed.
+    resp = limiter("tiktok", "oauth").request(
+        http_session(), "POST", REFRESH_URL,
         data={ "client_key": CLIENT_KEY, "refresh_token": refresh_token },
         headers={ "Content-Type": "application/x-www-form-urlencoded" }
     )
     resp.raise_for_status()
-    data = resp.json().get("data", {})
-    access_token  = data["access_token"]
-    refresh_token = data["refresh_token"]
-    expires_at    = int(time.time()) + data["expires_in"]
-    save_tokens()
-    print(f"[TikTok] Token refreshed; next expiry at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(expires_at))}")
+    return resp.json().get("data", {})
 
 
-# ─── Background Auto‐Refresh ────────────────────────────────────────────────────
-def _auto_refresher():
-    """Sleep until 60s before expiry, then refresh, looping forever."""
-    while True:
-        wait = expires_at - time.time() - 60
-        if wait > 0:
-            time.sleep(wait)
-        try:
-            refresh_access_token()
-        except Exception as e:
-            print(f"⚠️  Auto‐refresh failed: {e}")
-            time.sleep(60)
+def refresh_access_token():
+    """
+    Rotate both access & refresh tokens, unless another worker or process just did.
+    """
+    token_manager().refresh()
 
 
+# ─── Background Auto‐Refresh ────────────────────────────────────────────────────
 def start_auto_refresher():
-    """Spawn the daemon thread if we have a refresh_token already."""
-    if refresh_token and CLIENT_KEY:
-        t = threading.Thread(target=_auto_refresher, daemon=True)
-        t.start()
+    """Start the refresher if we have a refresh_token; safe to call any number of times."""
+    tokens = token_manager()
+    if tokens.snapshot.refresh_token and CLIENT_KEY:
+        tokens.start_refresher()
 
 
-# ─── TikTok Upload Function ────────────────────────────────────────────────────
-def upload_tiktok(video_path: str, json_path: str):
-    """
-    Upload a single video (partN.mp4) to TikTok using the direct‐post API.
-    """
-    ensure_tiktok_auth()
-
-    # 1) Determine which “part” we’re uploading
-    fname = os.path.basename(video_path)
-    m = re.search(r"part(\d+)", fname)
+# ─── Metadata lookup ───────────────────────────────────────────────────────────
+def _part_number(video_path) -> int:
+    # Extract part number from filename like "uuid_part1.mp4"
+    m = re.search(r"part(\d+)", os.path.basename(video_path))
     if not m:
-        raise ValueError(f"Cannot extract part number from '{fname}'")
-    part = int(m.group(1))
+        raise ValueError(f"Cannot extract part number from '{os.path.basename(video_path)}'")
+    return int(m.group(1))
 
-    # 2) Load metadata (caption + hashtags)
+
+@lru_cache(maxsize=64)
+def _metadata_by_part(json_path: str, mtime_ns: int) -> dict:
     with open(json_path) as f:
         data = json.load(f)
-    entry = next((v for v in data.get("videos", []) if v.get("part") == part), None)
-    if not entry or "tiktok" not in entry:
-        raise KeyError(f"No TikTok metadata for part {part}")
-    tk = entry["tiktok"]
-    caption = tk.get("caption", "") + " " + " ".join(tk.get("hashtags", []))
+    return {v.get("part"): v for v in data.get("videos", [])}
+
+
+def part_metadata(video_path: str, json_path: str = None) -> dict:
+    """
+    Metadata entry for a video: an indexed lookup in the job store, falling back to
+    the metadata JSON (parsed once per file version) for videos the store doesn't know.
+    """
+    entry = default_store().part_metadata(video_path)
+    if entry is None and json_path:
+        entry = _metadata_by_part(str(json_path), os.stat(json_path).st_mtime_ns).get(_part_number(video_path))
+    return entry
+
 
-    # 3) INIT: get publish_id + upload_url
+# ─── TikTok Upload Function ────────────────────────────────────────────────────
+def _init_tiktok_upload(video_path: str, caption: str) -> dict:
+    """Register a FILE_UPLOAD post and return fresh chunked-upload state."""
     size = os.path.getsize(video_path)
+    chunk_size, chunk_count = chunked_upload.plan_chunks(size)
     init_url = f"{TIKTOK_API_BASE}/v2/post/publish/video/init/"
-    init_resp = requests.post(
-        init_url,
-        headers={ "Authorization": f"Bearer {access_token}", "Content-Type": "application/json" },
+    init_resp = limiter("tiktok", "init").request(
+        http_session(), "POST", init_url,
+        headers={ "Authorization": f"Bearer {tiktok_access_token()}", "Content-Type": "application/json" },
         json={
             "post_info":   { "title": caption, "privacy_level": "PUBLIC_TO_EVERYONE" },
-            "source_info": { "source": "FILE_UPLOAD", "video_size": size, "chunk_size": size, "total_chunk_count": 1 }
+            "source_info": { "source": "FILE_UPLOAD", "video_size": size, "chunk_size": chunk_size, "total_chunk_count": chunk_count }
         }
     )
     if init_resp.status_code != 200:
         print(f"❌ TikTok init failed ({init_resp.status_code}): {init_resp.text}")
         init_resp.raise_for_status()
     init_data = init_resp.json()["data"]
-    publish_id, upload_url = init_data["publish_id"], init_data["upload_url"]
-
-    # 4) PUT: upload the MP4
-    with open(video_path, "rb") as fp:
-        chunk = fp.read()
-    put_resp = requests.put(
-        upload_url,
-        headers={ "Content-Type": "video/mp4", "Content-Range": f"bytes 0-{len(chunk)-1}/{len(chunk)}" },
-        data=chunk
-    )
-    if put_resp.status_code != 200:
-        print(f"❌ TikTok upload failed ({put_resp.status_code}): {put_resp.text}")
-        put_resp.raise_for_status()
-
-    # 5) POLL status
-    status_resp = requests.get(
-        f"{TIKTOK_API_BASE}/v2/post/publish/get_status/",
-        headers={ "Authorization": f"Bearer {access_token}" },
+    return chunked_upload.new_state(video_path, init_data["publish_id"], init_data["upload_url"], chunk_size, chunk_count)
+
+
+def tiktok_chunk_session() -> LimitedSession:
+    # Chunk PUTs carry an explicit Content-Range, so repeating one is safe.
+    return LimitedSession(http_session(), limiter("tiktok", "chunk"), idempotent=True)
+
+
+def upload_tiktok(video_path: str, json_path: str, wait: bool = False):
+    """
+    Upload a single video (partN.mp4) to TikTok using the direct‐post API.
+    Returns as soon as the bytes are sent; the publish outcome is tracked in the
+    background (see tiktok_publish_tracker). With wait=True, block for the final status.
+    """
+    from requests import HTTPError
+    # Only this upload thread waits for a pending login; renders and YouTube uploads carry on.
+    wait_for_tiktok_auth()
+
+    # 1) Determine which “part” we’re uploading
+    fname = os.path.basename(video_path)
+
+    # 2) Load metadata (caption + hashtags)
+    entry = part_metadata(video_path, json_path)
+    if not entry or "tiktok" not in entry:
+        raise KeyError(f"No TikTok metadata for {fname}")
+    tk = entry["tiktok"]
+    caption = tk.get("caption", "") + " " + " ".join(tk.get("hashtags", []))
+
+    # 3) INIT: get publish_id + upload_url (skipped when resuming an interrupted upload)
+    state = chunked_upload.load_state(video_path)
+    resumed = state is not None
+    if resumed:
+        print(f"↻ Resuming TikTok upload at chunk {state['next_chunk'] + 1}/{state['total_chunk_count']}")
+    else:
+        state = _init_tiktok_upload(video_path, caption)
+
+    # 4) PUT: upload the MP4 chunk by chunk
+    try:
+        chunked_upload.upload_chunks(video_path, state, session=tiktok_chunk_session())
+    except HTTPError:
+        if not resumed:
+            raise
+        # The saved upload URL may have been rejected; start a fresh transfer once.
+        print("↻ Resumed TikTok upload rejected; restarting from the first chunk")
+        chunked_upload.clear_state(video_path)
+        state = _init_tiktok_upload(video_path, caption)
+        chunked_upload.upload_chunks(video_path, state, session=tiktok_chunk_session())
+    publish_id = state["publish_id"]
+
+    # 5) Hand the publish over to the background status tracker; the worker is free now
+    fut = tiktok_publish_tracker().register(publish_id, label=fname)
+    if wait:
+        return fut.result()["status"]
+    print(f"✅ TikTok upload sent; tracking publish {publish_id}")
+    return {"publish_id": publish_id, "status": "SUBMITTED"}
+
+
+def get_tiktok_publish_status(publish_id: str) -> dict:
+    """One status request for a publish; used by the background tracker."""
+    status_resp = limiter("tiktok", "status").request(
+        http_session(), "GET", f"{TIKTOK_API_BASE}/v2/post/publish/get_status/",
+        headers={ "Authorization": f"Bearer {tiktok_access_token()}" },
         params={ "publish_id": publish_id }
     )
     status_resp.raise_for_status()
-    status = status_resp.json().get("data")
-    print(f"✅ TikTok publish status: {status}")
-    return status
+    return status_resp.json().get("data")
+
+
+_publish_tracker = None
+
+
+def tiktok_publish_tracker() -> PublishTracker:
+    global _publish_tracker
+    with _http_lock:
+        if _publish_tracker is None:
+            _publish_tracker = PublishTracker(
+                get_tiktok_publish_status,
+                max_pollers=int(os.getenv('TIKTOK_STATUS_POLLERS', 4)),
+            )
+        return _publish_tracker
 
 # ─── YouTube Shorts ────────────────────────────────────────────────────────────
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+# The Google client stack (googleapiclient, google-auth, oauthlib, httplib2) is
+# imported inside the functions below, so TikTok-only and non-upload code paths
+# never pay for it.
+from fs_utils import atomic_write_text
 
 # ─── YouTube Configuration ─────────────────────────────────────────────────────
 SCRIPT_DIR = Path(__file__).parent.absolute()
@@ -207,17 +349,78 @@ YOUTUBE_SCOPES = [
     'https://www.googleapis.com/auth/youtube.readonly'
 ]
 YOUTUBE_API_SERVICE = ('youtube', 'v3')
+YOUTUBE_TOKEN_STORE = Path(os.getenv('YOUTUBE_TOKEN_STORE', Path.home() / '.youtube_token.json'))
+YOUTUBE_DISCOVERY_URL = os.getenv('YOUTUBE_DISCOVERY_URL', 'https://www.googleapis.com/discovery/v1/apis/youtube/v3/rest')
+YOUTUBE_DISCOVERY_CACHE = Path(os.getenv('YOUTUBE_DISCOVERY_CACHE', Path.home() / '.cache' / 'brainrot-automator' / 'youtube_v3.json'))
+YOUTUBE_CHUNK_SIZE = int(os.getenv('YOUTUBE_CHUNK_SIZE', 8 * 1024 * 1024))  # must be a multiple of 256 KiB
+
+# One authorised client per process, shared by every upload in a batch.
+_youtube_lock = threading.Lock()
+_youtube_client = None
+_youtube_creds = None
+# httplib2 connections are not thread-safe, so concurrent uploads each get their own.
+_youtube_thread = threading.local()
+
+
+def _load_youtube_credentials():
+    """Stored credentials, refreshed if expired; the browser flow only runs when there are none."""
+    from google.auth.exceptions import RefreshError
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    creds = None
+    if YOUTUBE_TOKEN_STORE.exists():
+        creds = Credentials.from_authorized_user_file(str(YOUTUBE_TOKEN_STORE), YOUTUBE_SCOPES)
+    if creds and creds.valid:
+        return creds
+    if creds and creds.expired and creds.refresh_token:
+        try:
+            creds.refresh(Request())
+        except RefreshError as e:
+            print(f"⚠️  YouTube token refresh failed ({e}); re-authenticating")
+            creds = None
+    if not creds or not creds.valid:
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        flow = InstalledAppFlow.from_client_secrets_file(str(YOUTUBE_CLIENT_SECRETS_FILE), YOUTUBE_SCOPES)
+        creds = flow.run_local_server(port=0)
+    atomic_write_text(YOUTUBE_TOKEN_STORE, creds.to_json(), mode=0o600)
+    return creds
+
+
+def _youtube_discovery_document() -> str:
+    """The YouTube v3 discovery document, fetched once and then read from the local cache."""
+    if YOUTUBE_DISCOVERY_CACHE.exists():
+        return YOUTUBE_DISCOVERY_CACHE.read_text()
+    resp = http_session().get(YOUTUBE_DISCOVERY_URL, timeout=30)
+    resp.raise_for_status()
+    atomic_write_text(YOUTUBE_DISCOVERY_CACHE, resp.text)
+    return resp.text
 
 
 def _get_youtube_client():
-    flow = InstalledAppFlow.from_client_secrets_file(str(YOUTUBE_CLIENT_SECRETS_FILE), YOUTUBE_SCOPES)
-    creds = flow.run_local_server(port=0)
-    youtube = build(YOUTUBE_API_SERVICE[0], YOUTUBE_API_SERVICE[1], credentials=creds)
-    channel = youtube.channels().list(part='snippet', mine=True).execute().get('items', [])
-    if channel:
-        info = channel[0]['snippet']
-        print(f"Connected to YouTube channel: {info['title']}")
-    return youtube
+    global _youtube_client, _youtube_creds
+    with _youtube_lock:
+        if _youtube_client is not None:
+            return _youtube_client
+        from googleapiclient.discovery import build_from_document
+        creds = _youtube_creds = _load_youtube_credentials()
+        youtube = build_from_document(_youtube_discovery_document(), credentials=creds)
+        channel = youtube.channels().list(part='snippet', mine=True).execute().get('items', [])
+        if channel:
+            info = channel[0]['snippet']
+            print(f"Connected to YouTube channel: {info['title']}")
+        _youtube_client = youtube
+        return youtube
+
+
+def _youtube_http():
+    """Per-thread authorised transport for request execution."""
+    http = getattr(_youtube_thread, 'http', None)
+    if http is None:
+        import httplib2
+        import google_auth_httplib2
+        _get_youtube_client()
+        http = _youtube_thread.http = google_auth_httplib2.AuthorizedHttp(_youtube_creds, http=httplib2.Http())
+    return http
 
 
 def check_youtube_channel():
@@ -229,25 +432,22 @@ def check_youtube_channel():
 
 def upload_youtube_short(video_path: str, json_path: str):
     fname = os.path.basename(video_path)
-    # Extract part number from filename like "uuid_part1.mp4"
-    part = int(re.search(r'part(\d+)', fname).group(1))
-    with open(json_path) as f:
-        data = json.load(f)
-    entry = next((v for v in data['videos'] if v.get('part') == part), None)
+    entry = part_metadata(video_path, json_path)
     if not entry or 'youtube_shorts' not in entry:
-        raise KeyError(f"No YouTube metadata for part {part}")
+        raise KeyError(f"No YouTube metadata for {fname}")
     meta = entry['youtube_shorts']
     youtube = _get_youtube_client()
     body = {
         'snippet': { 'title': meta['title'], 'description': meta['description'], 'tags': meta.get('tags', []), 'categoryId': '22' },
         'status': { 'privacyStatus': 'public' }
     }
-    media = MediaFileUpload(video_path, chunksize=-1, resumable=True)
+    from googleapiclient.http import MediaFileUpload
+    media = MediaFileUpload(video_path, chunksize=YOUTUBE_CHUNK_SIZE, resumable=True)
     req = youtube.videos().insert(part=','.join(body.keys()), body=body, media_body=media)
     print("Uploading to YouTube…")
     resp = None
     while resp is None:
-        status, resp = req.next_chunk()
+        status, resp = req.next_chunk(http=_youtube_http())
         if status:
             print(f"  {int(status.progress() * 100)}% done")
     print(f"Uploaded! Video ID: {resp['id']}")